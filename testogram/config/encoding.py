@@ -0,0 +1,31 @@
+"""
+Content-coding negotiation for views that compress their own responses.
+"""
+
+
+def accepted_encodings(header):
+    """``{coding: q}`` from an ``Accept-Encoding`` header value."""
+    encodings = {}
+    for item in header.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        encodings[coding.lower()] = q
+    return encodings
+
+
+def accepts_encoding(request, coding):
+    """
+    Whether the client accepts ``coding``: listed with a non-zero q, or not
+    listed while ``*`` is (``gzip;q=0`` and ``*;q=0`` refuse it).
+    """
+    encodings = accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    return encodings.get(coding, encodings.get("*", 0.0)) > 0
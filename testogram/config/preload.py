@@ -0,0 +1,29 @@
+"""
+Warm-up for servers that load the application before forking workers
+(e.g. ``gunicorn --preload``). Everything imported here is shared between
+workers copy-on-write instead of being imported again in each of them.
+"""
+
+import gc
+
+from django.urls import get_resolver
+from rest_framework.settings import api_settings
+
+from config.lazy import LazyView
+
+
+def preload():
+    get_resolver().reverse_dict
+    for view in LazyView.registry:
+        view.load()
+    for name in (
+        'DEFAULT_AUTHENTICATION_CLASSES',
+        'DEFAULT_RENDERER_CLASSES',
+        'DEFAULT_PARSER_CLASSES',
+        'DEFAULT_PAGINATION_CLASS',
+        'DEFAULT_FILTER_BACKENDS',
+    ):
+        getattr(api_settings, name)
+    # объекты, созданные до fork, больше не трогает сборщик мусора, и
+    # страницы с ними не копируются в воркерах
+    gc.freeze()
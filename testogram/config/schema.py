@@ -0,0 +1,104 @@
+"""
+OpenAPI schema that is generated once per code version instead of on every
+request. The schema is read from the file written by ``manage.py
+build_schema`` when it exists, otherwise generated on the first request;
+either way it is memoized per process together with its rendered and
+gzipped forms.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from drf_spectacular.generators import SchemaGenerator
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+
+from config.encoding import accepts_encoding
+
+_lock = threading.Lock()
+_schemas = {}
+_rendered = {}
+
+
+@lru_cache(maxsize=None)
+def code_version():
+    if settings.CODE_VERSION:
+        return settings.CODE_VERSION
+    digest = hashlib.sha1()
+    for path in sorted(settings.BASE_DIR.rglob("*.py")):
+        digest.update(path.read_bytes())
+    return f"{settings.SPECTACULAR_SETTINGS['VERSION']}-{digest.hexdigest()[:12]}"
+
+
+def schema_path(version=None):
+    return settings.SCHEMA_CACHE_DIR / f"openapi-{version or code_version()}.json"
+
+
+def generate_schema():
+    return SchemaGenerator().get_schema(request=None, public=True)
+
+
+def get_schema():
+    version = code_version()
+    if version not in _schemas:
+        with _lock:
+            if version not in _schemas:
+                path = schema_path(version)
+                if path.exists():
+                    _schemas[version] = json.loads(path.read_text())
+                else:
+                    _schemas[version] = generate_schema()
+    return _schemas[version]
+
+
+def get_rendered(renderer):
+    key = (code_version(), type(renderer))
+    if key not in _rendered:
+        content = renderer.render(get_schema(), renderer.media_type, {})
+        if isinstance(content, str):
+            content = content.encode(renderer.charset or "utf-8")
+        etag = hashlib.sha1(content).hexdigest()
+        _rendered[key] = {
+            "identity": (content, f'"{etag}"'),
+            "gzip": (gzip.compress(content), f'"{etag}-gzip"'),
+        }
+    return _rendered[key]
+
+
+def clear_cache():
+    _schemas.clear()
+    _rendered.clear()
+    code_version.cache_clear()
+
+
+class CachedSpectacularAPIView(SpectacularAPIView):
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        if request.GET.get("lang"):
+            return super().get(request, *args, **kwargs)
+
+        renderer = request.accepted_renderer
+        encoding = "gzip" if accepts_encoding(request, "gzip") else "identity"
+        content, etag = get_rendered(renderer)[encoding]
+
+        if etag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", "")):
+            response = HttpResponseNotModified()
+        else:
+            content_type = renderer.media_type
+            if renderer.charset:
+                content_type += f"; charset={renderer.charset}"
+            response = HttpResponse(content, content_type=content_type)
+            response["Content-Disposition"] = (
+                f'inline; filename="{self._get_filename(request, None)}"'
+            )
+            if encoding == "gzip":
+                response["Content-Encoding"] = "gzip"
+        response["ETag"] = etag
+        response["Vary"] = "Accept, Accept-Encoding"
+        return response
@@ -0,0 +1,14 @@
+"""
+Settings package for testogram project.
+
+The variant is selected by the TESTOGRAM_ENV environment variable:
+``dev`` (default) or ``prod``. A variant can also be used directly with
+DJANGO_SETTINGS_MODULE=config.settings.<variant>.
+"""
+
+import os
+
+if os.environ.get('TESTOGRAM_ENV', 'dev') == 'prod':
+    from config.settings.prod import *  # noqa: F401,F403
+else:
+    from config.settings.dev import *  # noqa: F401,F403
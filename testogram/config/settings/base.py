@@ -0,0 +1,335 @@
+"""
+Base Django settings for testogram project, shared by dev and prod.
+
+Generated by 'django-admin startproject' using Django 5.0.1.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.0/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/5.0/ref/settings/
+"""
+
+import os
+from datetime import timedelta
+from importlib.util import find_spec
+from pathlib import Path
+
+# Build paths inside the project like this: BASE_DIR / 'subdir'.
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/5.0/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = 'django-insecure-o+_#2ocwzjv3^nr%@q%6o&^cdnz%x=0n^(&5@a7((lczaes2nm'
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = False
+
+ALLOWED_HOSTS = []
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'general',
+    'rangefilter',
+    'admin_auto_filters',
+    'django_admin_listfilter_dropdown',
+    'rest_framework',
+    'drf_spectacular',
+    'rest_framework_simplejwt',
+    'django_filters',
+]
+
+MIDDLEWARE = [
+    'general.middleware.ServerTimingMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'general.middleware.ReplicaStickinessMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ADMIN_APPS = [
+    'django.contrib.admin',
+    'rangefilter',
+    'admin_auto_filters',
+    'django_admin_listfilter_dropdown',
+]
+
+ROOT_URLCONF = 'config.urls'
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'config.wsgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/5.0/ref/settings/#databases
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('TESTOGRAM_DB', BASE_DIR / 'db.sqlite3'),
+        # файловая тестовая БД: in-memory shared cache не даёт проверить
+        # конкурентную запись из нескольких потоков
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    },
+    # реплика только для чтения; используется, если указана в DATABASE_REPLICAS
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('TESTOGRAM_REPLICA_DB', BASE_DIR / 'db_replica.sqlite3'),
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db_replica.sqlite3',
+        },
+    },
+}
+
+# Чаты и сообщения раскладываются по шардам CHAT_SHARDS (general.sharding).
+# По умолчанию шард один — основная база; TESTOGRAM_CHAT_SHARDS=N выносит
+# их в N отдельных файлов SQLite. После смены числа шардов чаты переносит
+# rebalance_chats.
+CHAT_SHARD_COUNT = int(os.environ.get('TESTOGRAM_CHAT_SHARDS', 0))
+
+CHAT_SHARDS = [f'chats_{i}' for i in range(CHAT_SHARD_COUNT)] or ['default']
+
+for _index, _alias in enumerate(CHAT_SHARDS):
+    if _alias != 'default':
+        DATABASES[_alias] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / f'db_chats_{_index}.sqlite3',
+            'TEST': {
+                'NAME': BASE_DIR / f'test_db_chats_{_index}.sqlite3',
+            },
+        }
+
+DATABASE_ROUTERS = ['general.sharding.ShardRouter', 'general.db.ReplicaRouter']
+
+DATABASE_REPLICAS = [
+    alias for alias in os.environ.get('TESTOGRAM_DB_REPLICAS', '').split(',') if alias
+]
+
+# сколько секунд после записи чтения пользователя идут в основную базу
+DATABASE_REPLICA_STICKY_SECONDS = 5
+
+# Профиль SQLite для продакшена: WAL (читатели не блокируются писателем),
+# ослабленный fsync, mmap и кэш страниц, ожидание блокировки вместо ошибки
+# и переиспользование соединений между запросами.
+SQLITE_PRODUCTION_OPTIONS = {
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA mmap_size=268435456;'
+        'PRAGMA cache_size=-64000;'
+        'PRAGMA busy_timeout=5000;'
+        'PRAGMA temp_store=MEMORY;'
+    ),
+    'transaction_mode': 'IMMEDIATE',
+}
+
+
+# Password validation
+# https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
+
+AUTH_USER_MODEL = 'general.User'
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/5.0/topics/i18n/
+
+LANGUAGE_CODE = 'ru'
+
+TIME_ZONE = 'Europe/Moscow'
+
+USE_I18N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/5.0/howto/static-files/
+
+STATIC_URL = 'static/'
+
+# Default primary key field type
+# https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
+
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'PAGE_SIZE': 10,
+    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_AUTHENTICATION_CLASSES': (
+        'general.authentication.CachedJWTAuthentication',
+    ),
+    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    'DEFAULT_RENDERER_CLASSES': (
+        'general.api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'general.api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    'DATETIME_FORMAT': "%Y-%m-%dT%H:%M:%S",
+}
+
+# MessagePack для мобильных клиентов, если установлен msgpack
+if find_spec('msgpack'):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] += ('general.api.renderers.MessagePackRenderer',)
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] += ('general.api.parsers.MessagePackParser',)
+
+SPECTACULAR_SETTINGS = {
+    'TITLE': 'Testogram API',
+    'DESCRIPTION': 'Your Testogram description',
+    'VERSION': '1.0.0',
+    'SERVE_INCLUDE_SCHEMA': False,
+    # OTHER SETTINGS
+}
+
+# версия кода для кэшей, которые надо сбрасывать при деплое (например,
+# OpenAPI-схемы); по умолчанию вычисляется по исходникам
+CODE_VERSION = os.environ.get('TESTOGRAM_CODE_VERSION', '')
+
+SCHEMA_CACHE_DIR = BASE_DIR / 'schema'
+
+# кэш пользователей для CachedJWTAuthentication
+JWT_USER_CACHE_SIZE = 10_000
+JWT_USER_CACHE_TTL = 60
+
+# превышение query_budgets вьюсета: исключение или предупреждение в лог;
+# тестовый раннер включает строгий режим
+QUERY_BUDGET_STRICT = False
+
+TEST_RUNNER = 'config.test_runner.TestRunner'
+
+# потолок длительности одной транзакции фонового удаления (general.deletion)
+DELETION_MAX_LOCK_SECONDS = 0.05
+
+# буфер просмотров постов (general.counters): окно, в котором повторный
+# просмотр того же пользователя не считается, период записи в базу и
+# сколько пар (пост, пользователь) помнить для этого окна
+POST_VIEWS_WINDOW = 30 * 60
+POST_VIEWS_FLUSH_INTERVAL = 10
+POST_VIEWS_MAX_VIEWERS = 100_000
+
+# рейтинг постов ?ordering=trending (general.trending): вес реакции и
+# комментария, период полураспада в секундах и порог, ниже которого пост
+# выпадает из ленты
+TRENDING_REACTION_WEIGHT = 1.0
+TRENDING_COMMENT_WEIGHT = 3.0
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_MIN_SCORE = 0.05
+
+# лента уведомлений (general.activity): однотипные события об одном объекте
+# склеиваются, пока между ними не больше этого числа секунд
+ACTIVITY_COALESCE_WINDOW = 60 * 60
+
+# пакетные запросы /api/batch/ (general.api.batch): подзапросов в пакете и
+# потоков для parallel
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = 4
+
+# доля запросов, для которых ServerTimingMiddleware собирает замеры
+SERVER_TIMING_SAMPLE_RATE = float(os.environ.get('TESTOGRAM_SERVER_TIMING_SAMPLE_RATE', 1))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # строки замеров ServerTimingMiddleware; в dev хватает заголовка
+        'general.timing': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+SIMPLE_JWT = {
+    "ACCESS_TOKEN_LIFETIME": timedelta(minutes=5),
+    "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
+    "ROTATE_REFRESH_TOKENS": False,
+    "BLACKLIST_AFTER_ROTATION": False,
+    "UPDATE_LAST_LOGIN": False,
+
+    "ALGORITHM": "HS256",
+    "SIGNING_KEY": SECRET_KEY,
+    "VERIFYING_KEY": "",
+    "AUDIENCE": None,
+    "ISSUER": None,
+    "JSON_ENCODER": None,
+    "JWK_URL": None,
+    "LEEWAY": 0,
+
+    "AUTH_HEADER_TYPES": ("Bearer",),
+    "AUTH_HEADER_NAME": "HTTP_AUTHORIZATION",
+    "USER_ID_FIELD": "id",
+    "USER_ID_CLAIM": "user_id",
+    "USER_AUTHENTICATION_RULE": "rest_framework_simplejwt.authentication.default_user_authentication_rule",
+
+    "AUTH_TOKEN_CLASSES": ("rest_framework_simplejwt.tokens.AccessToken",),
+    "TOKEN_TYPE_CLAIM": "token_type",
+    "TOKEN_USER_CLASS": "rest_framework_simplejwt.models.TokenUser",
+
+    "JTI_CLAIM": "jti",
+
+    "SLIDING_TOKEN_REFRESH_EXP_CLAIM": "refresh_exp",
+    "SLIDING_TOKEN_LIFETIME": timedelta(minutes=5),
+    "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
+
+    "TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
+    "TOKEN_VERIFY_SERIALIZER": "rest_framework_simplejwt.serializers.TokenVerifySerializer",
+    "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
+    "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
+    "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer",
+}
\ No newline at end of file
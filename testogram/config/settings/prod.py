@@ -0,0 +1,52 @@
+"""
+Production settings: no debug tooling on the request path, no browsable API
+and the production SQLite profile.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from config.settings.base import *  # noqa: F401,F403
+
+DEBUG = False
+
+# ключ из base закоммичен в репозиторий, а им ещё и подписываются JWT
+SECRET_KEY = os.environ.get('TESTOGRAM_SECRET_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('TESTOGRAM_SECRET_KEY must be set in production.')
+
+ALLOWED_HOSTS = [
+    host for host in os.environ.get('TESTOGRAM_ALLOWED_HOSTS', '').split(',') if host
+]
+
+# админка нужна не на каждом воркере API; без неё не грузятся и приложения
+# фильтров для неё
+if os.environ.get('TESTOGRAM_ENABLE_ADMIN', '1') == '0':
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in ADMIN_APPS]
+
+for _alias in {'default', *CHAT_SHARDS}:
+    DATABASES[_alias].update({
+        'OPTIONS': SQLITE_PRODUCTION_OPTIONS,
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    })
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': tuple(
+        renderer for renderer in REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']
+        if renderer != 'rest_framework.renderers.BrowsableAPIRenderer'
+    ),
+}
+
+SERVER_TIMING_SAMPLE_RATE = float(
+    os.environ.get('TESTOGRAM_SERVER_TIMING_SAMPLE_RATE', 0.01)
+)
+
+LOGGING['loggers']['general.timing']['level'] = 'INFO'
+
+SIMPLE_JWT = {
+    **SIMPLE_JWT,
+    "SIGNING_KEY": SECRET_KEY,
+}
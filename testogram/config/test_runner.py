@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    В тестах превышение бюджета запросов вьюсета (query_budgets) роняет
+    тест, а не пишет предупреждение в лог. Несброшенные просмотры постов
+    забываются до выхода: иначе atexit записал бы их в рабочую базу.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.query_budget_strict = settings.QUERY_BUDGET_STRICT
+        settings.QUERY_BUDGET_STRICT = True
+
+    def teardown_test_environment(self, **kwargs):
+        from general.counters import post_views
+
+        post_views.clear()
+        settings.QUERY_BUDGET_STRICT = self.query_budget_strict
+        super().teardown_test_environment(**kwargs)
@@ -14,28 +14,27 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.conf import settings
 from django.urls import include,path
-from config import settings
-from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-    TokenVerifyView
-)
+from config.lazy import lazy_view
 
+# drf_spectacular и simplejwt импортируются при первом запросе к ним
 urlpatterns = [
-    path('admin/', admin.site.urls),
-    path('api/schema/',SpectacularAPIView.as_view(),name='schema'),
+    path('api/schema/',lazy_view('config.schema.CachedSpectacularAPIView'),name='schema'),
     path('api/', include('general.api.urls')),
-    path('api/schema/swagger-ui/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
-    path('api/schema/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-    path('api/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
+    path('api/schema/swagger-ui/', lazy_view('drf_spectacular.views.SpectacularSwaggerView', url_name='schema'), name='swagger-ui'),
+    path('api/schema/redoc/', lazy_view('drf_spectacular.views.SpectacularRedocView', url_name='schema'), name='redoc'),
+    path('api/token/', lazy_view('rest_framework_simplejwt.views.TokenObtainPairView'), name='token_obtain_pair'),
+    path('api/token/refresh/', lazy_view('rest_framework_simplejwt.views.TokenRefreshView'), name='token_refresh'),
+    path('api/token/verify/', lazy_view('rest_framework_simplejwt.views.TokenVerifyView'), name='token_verify'),
 ]
 
 
 
-if settings.DEBUG:
+if "django.contrib.admin" in settings.INSTALLED_APPS:
+    from django.contrib import admin
+
+    urlpatterns += [path('admin/', admin.site.urls)]
+
+if "debug_toolbar" in settings.INSTALLED_APPS:
     urlpatterns += [path("__debug__/", include("debug_toolbar.urls"))]
\ No newline at end of file
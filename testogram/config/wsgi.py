@@ -2,6 +2,8 @@
 WSGI config for testogram project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
+With TESTOGRAM_PRELOAD=1 the URLconf and lazily loaded views are imported
+right away, for servers that load the app before forking workers.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/wsgi/
@@ -14,3 +16,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+if os.environ.get('TESTOGRAM_PRELOAD') == '1':
+    from config.preload import preload
+
+    preload()
@@ -0,0 +1,55 @@
+"""
+Лента уведомлений пользователя: комментарии и реакции к его постам,
+добавление в друзья и сообщения в его чатах.
+
+События пишутся в Activity при самой записи (record), а не собираются при
+чтении из комментариев, реакций и чатов. Однотипные события об одном
+объекте склеиваются: у строки (получатель, вид, объект) растёт events и
+меняется последний автор, пока с прошлого события прошло не больше
+ACTIVITY_COALESCE_WINDOW секунд, — «5 новых реакций» остаётся одной
+строкой. events считает события, а не людей: реакция, снятая и
+поставленная снова, — два события. Каждое событие выдаёт строке новый seq, и опрос ленты —
+один диапазонный запрос по индексу activity_inbox_idx: seq > курсора.
+"""
+
+import datetime
+
+from django.conf import settings
+from django.db import connections, router
+from django.utils import timezone
+
+from general.models import Activity
+
+
+def record(recipient_id, kind, actor_id, target_id=0):
+    """Добавляет событие в ленту получателя; свои действия в ленту не попадают."""
+    if recipient_id == actor_id:
+        return
+    using = router.db_for_write(Activity)
+    table = Activity._meta.db_table
+    now = timezone.now()
+    since = now - datetime.timedelta(seconds=settings.ACTIVITY_COALESCE_WINDOW)
+    connection = connections[using]
+    # seq берётся как MAX(seq) + 1 в том же запросе: записи в SQLite идут по
+    # одной, поэтому seq растёт в порядке фиксации и опрос с курсором не
+    # пропустит событие, зафиксированное позже события с большим seq
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (recipient_id, kind, target_id, actor_id, events, seq, updated_at)
+            VALUES (%s, %s, %s, %s, 1, (SELECT COALESCE(MAX(seq), 0) + 1 FROM {table}), %s)
+            ON CONFLICT (recipient_id, kind, target_id) DO UPDATE SET
+                events = CASE WHEN {table}.updated_at >= %s THEN {table}.events + 1 ELSE 1 END,
+                actor_id = excluded.actor_id,
+                seq = excluded.seq,
+                updated_at = excluded.updated_at
+            """,
+            [
+                recipient_id,
+                kind,
+                target_id,
+                actor_id,
+                connection.ops.adapt_datetimefield_value(now),
+                connection.ops.adapt_datetimefield_value(since),
+            ],
+        )
@@ -4,14 +4,40 @@ from django.contrib.auth.models import Group
 from rangefilter.filters import DateRangeFilter
 from general.filters import AuthorFilter, PostFilter
 from django_admin_listfilter_dropdown.filters import ChoiceDropdownFilter
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from general.paginators import EstimatedCountPaginator
+from general import sync, tasks
 
 
 
 admin.site.unregister(Group)
+
+
+class SoftDeleteAdminMixin:
+    """
+    Удаление из админки мягкое: объект сразу скрывается, а зависимые строки
+    удаляет purge_deleted. Страница подтверждения не собирает каскад.
+    """
+
+    def delete_model(self, request, obj):
+        obj.soft_delete()
+        sync.record(obj, deleted=True)
+        tasks.purge_deleted.enqueue(f"{obj._meta.model_name}:{obj.pk}")
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            self.delete_model(request, obj)
+
+    def get_deleted_objects(self, objs, request):
+        model_count = {self.model._meta.verbose_name_plural: len(objs)}
+        return [str(obj) for obj in objs], model_count, set(), []
 # admin.site.register(User)
 
 @admin.register(User)
-class UserModelAdmin(admin.ModelAdmin):
+class UserModelAdmin(SoftDeleteAdminMixin, admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     list_display = (
         "id",
         "first_name",
@@ -46,7 +72,10 @@ class UserModelAdmin(admin.ModelAdmin):
 
 @admin.register(Reaction)
 class ReactionModelAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     list_display = ("id","author","post","value",)
+    list_select_related = ("author","post",)
     list_display_links = ("id","author",)
     list_filter = (
         PostFilter,
@@ -58,16 +87,23 @@ class ReactionModelAdmin(admin.ModelAdmin):
 
 @admin.register(Comment)
 class CommentModelAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     list_display = ("id","author","post","body","created_at",)
     list_display_links = ("id","body",)
+    list_select_related = ("author","post",)
     search_fields = ("author","post",)
-    list_filter = (AuthorFilter, PostFilter, "author","post",)
+    # "author"/"post" без автодополнения выводили в фильтр всех пользователей и посты
+    list_filter = (AuthorFilter, PostFilter,)
     raw_id_fields = (
         "author",
     )
 
 @admin.register(Post)
-class PostModelAdmin(admin.ModelAdmin):
+class PostModelAdmin(SoftDeleteAdminMixin, admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_select_related = ("author",)
     list_display = (
         "id",
         "author",
@@ -93,20 +129,26 @@ class PostModelAdmin(admin.ModelAdmin):
         return obj.body
 
     def get_comment_count(self,obj):
-        return obj.comments.count()
+        return obj.comment_count
 
     def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related("comments")
+        # подзапрос считается только для строк страницы, а не GROUP BY по всей таблице
+        comment_count = Comment.objects.filter(post=OuterRef("pk")).order_by().values("post").annotate(
+            count=Count("id"),
+        ).values("count")
+        return super().get_queryset(request).annotate(
+            comment_count=Coalesce(Subquery(comment_count), 0),
+        )
 
     # search_fields = ["author"]
     list_filter = (
         AuthorFilter,
         ("created_at", DateRangeFilter),
-        "author",
     )
 
     get_body.short_description = 'body'
     get_comment_count.short_description = 'comment_count'
+    get_comment_count.admin_order_field = 'comment_count'
 
 
 
@@ -0,0 +1,113 @@
+"""
+Пакетные запросы к API (/api/batch/).
+
+Подзапросы выполняются внутри одного HTTP-запроса теми же вьюсетами
+роутера general.api.urls, что и обычные запросы. Пользователь аутентифицируется один раз
+на сам пакет, и подзапросы получают его готовым, без повторного разбора
+JWT и поиска пользователя. По умолчанию подзапросы идут по очереди в этом
+же потоке и на тех же соединениях с базой, так что запись видна следующим
+подзапросам. С parallel независимые GET-подзапросы выполняются в пуле
+потоков: у каждого потока свои соединения, которые закрываются после
+подзапроса.
+"""
+
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+from general.api.budgets import QueryBudgetExceeded
+
+logger = logging.getLogger("general.batch")
+
+# заголовки тела пакета, которые у подзапроса свои
+REQUEST_ONLY_META = ("wsgi.input", "CONTENT_TYPE", "CONTENT_LENGTH", "QUERY_STRING")
+
+# префикс, под которым config/urls.py подключает general.api.urls; схема,
+# токены и админка вне роутера API и в пакете недоступны
+API_PREFIX = "/api/"
+API_URLCONF = "general.api.urls"
+
+
+def error(status, detail):
+    return {"status": status, "body": {"detail": detail}}
+
+
+def build_request(request, method, path, query, body):
+    data = b"" if body is None else json.dumps(body).encode()
+    environ = {key: value for key, value in request.META.items() if key not in REQUEST_ONLY_META}
+    environ.update({
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(data)),
+        "HTTP_ACCEPT": "application/json",
+        "wsgi.input": io.BytesIO(data),
+    })
+    sub_request = WSGIRequest(environ)
+    # DRF берёт готового пользователя вместо authentication_classes вьюсета
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+    return sub_request
+
+
+def dispatch(request, item):
+    """Выполняет один подзапрос {method, url, body}; возвращает {status, body}."""
+    url = urlsplit(item["url"])
+    if url.scheme or url.netloc:
+        return error(400, "Ожидается путь API без схемы и хоста.")
+    if not url.path.startswith(API_PREFIX):
+        return error(404, "Страница не найдена.")
+    try:
+        match = resolve(url.path[len(API_PREFIX) - 1:], urlconf=API_URLCONF)
+    except Resolver404:
+        return error(404, "Страница не найдена.")
+    if match.url_name == "batch-list":
+        return error(400, "Вложенные пакеты не поддерживаются.")
+
+    sub_request = build_request(request, item["method"], url.path, url.query, item.get("body"))
+    try:
+        response = match.func(sub_request, *match.args, **match.kwargs)
+        if response.streaming:
+            return error(400, "Потоковые ответы в пакете не поддерживаются.")
+        if hasattr(response, "render"):
+            response.render()
+    except QueryBudgetExceeded:
+        # строгий режим бюджетов должен ронять тест, а не превращаться в 500
+        raise
+    except Exception:
+        # ошибка одного подзапроса не отменяет остальные
+        logger.exception("batch sub-request %s %s failed", item["method"], item["url"])
+        return error(500, "Внутренняя ошибка сервера.")
+
+    content = response.content
+    if content and response.get("Content-Type", "").startswith("application/json"):
+        body = json.loads(content)
+    else:
+        body = content.decode() or None
+    return {"status": response.status_code, "body": body}
+
+
+def dispatch_in_thread(request, item):
+    try:
+        return dispatch(request, item)
+    finally:
+        # соединения потока пула иначе остались бы открытыми до его завершения
+        connections.close_all()
+
+
+def run(request, items, parallel=False):
+    """Ответы на подзапросы items в том же порядке."""
+    if not parallel or len(items) < 2:
+        return [dispatch(request, item) for item in items]
+    workers = min(settings.BATCH_MAX_WORKERS, len(items))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(partial(dispatch_in_thread, request), items))
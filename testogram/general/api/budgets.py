@@ -0,0 +1,61 @@
+"""
+Бюджеты запросов к БД по действиям вьюсета.
+
+Вьюсет объявляет query_budgets = {действие: максимум запросов за один
+запрос к API}. Действия, которые ходят на шарды чатов, добавляют в
+shard_query_budgets число запросов на каждый шард помимо основной базы.
+Превышение с QUERY_BUDGET_STRICT (его включает тестовый
+раннер) — исключение, иначе предупреждение в лог general.budgets.
+"""
+
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger("general.budgets")
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMixin:
+    query_budgets = {}
+    shard_query_budgets = {}
+
+    def dispatch(self, request, *args, **kwargs):
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = super().dispatch(request, *args, **kwargs)
+        self.check_query_budget(counter.count)
+        return response
+
+    def check_query_budget(self, count):
+        budget = self.query_budgets.get(self.action)
+        if budget is None:
+            return
+        shards = len(set(settings.CHAT_SHARDS) - {DEFAULT_DB_ALIAS})
+        budget += self.shard_query_budgets.get(self.action, 0) * shards
+        if count <= budget:
+            return
+        view = type(self).__name__
+        message = f"{view}.{self.action}: {count} queries, budget {budget}"
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(
+            message,
+            extra={"view": view, "action": self.action, "queries": count, "budget": budget},
+        )
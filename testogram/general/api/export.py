@@ -0,0 +1,61 @@
+import zlib
+
+from django.db.models import Q
+
+from general import sharding
+from general.api.renderers import FastJSONRenderer
+from general.api.serializers import (
+    ChatSerializer,
+    CommentSerializer,
+    MessageSerializer,
+    NestedPostListSerializer,
+    ReactionSerializer,
+)
+from general.models import Chat, Comment, Message, Post, Reaction
+
+
+def export_sections(user):
+    yield "post", NestedPostListSerializer, Post.objects.filter(author=user)
+    yield "comment", CommentSerializer, Comment.objects.filter(author=user).select_related("author")
+    yield "reaction", ReactionSerializer, Reaction.objects.filter(author=user)
+    # чаты и сообщения — отдельной выборкой с каждого шарда
+    for alias in sharding.shards():
+        chats = sharding.on_shard(Chat.objects, alias)
+        yield "chat", ChatSerializer, chats.filter(Q(user_1=user) | Q(user_2=user))
+    for alias in sharding.shards():
+        messages = sharding.on_shard(Message.objects, alias)
+        yield "message", MessageSerializer, messages.filter(author=user)
+
+
+def export_user_data(user, context, chunk_size):
+    """
+    Построчно (NDJSON) отдаёт все данные пользователя. Каждая выборка
+    читается через iterator(chunk_size), и в памяти одновременно не больше
+    одной пачки строк, сериализованной одним вызовом many=True.
+    """
+    renderer = FastJSONRenderer()
+    for kind, serializer_class, queryset in export_sections(user):
+        chunk = []
+        for obj in queryset.order_by("pk").iterator(chunk_size=chunk_size):
+            chunk.append(obj)
+            if len(chunk) == chunk_size:
+                yield serialize_chunk(renderer, kind, serializer_class, chunk, context)
+                chunk = []
+        if chunk:
+            yield serialize_chunk(renderer, kind, serializer_class, chunk, context)
+
+
+def serialize_chunk(renderer, kind, serializer_class, chunk, context):
+    data = serializer_class(chunk, many=True, context=context).data
+    return b"".join(
+        renderer.render({"type": kind, "data": item}) + b"\n" for item in data
+    )
+
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
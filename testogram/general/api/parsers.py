@@ -0,0 +1,40 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+from general.api.renderers import FastJSONRenderer, MessagePackRenderer, msgpack, orjson
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSONParser на orjson. orjson принимает только UTF-8 и не пропускает
+    NaN/Infinity, как и JSONParser в строгом режиме; для других кодировок
+    и без orjson работает стандартный парсер.
+    """
+
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8' or not self.strict:
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class MessagePackParser(BaseParser):
+    """
+    application/msgpack; Timestamp распаковывается в aware datetime (UTC).
+    """
+
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), timestamp=3, strict_map_key=False)
+        except (ValueError, TypeError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as exc:
+            # TypeError — нехешируемый ключ словаря, например массив
+            raise ParseError('MessagePack parse error - %s' % str(exc))
@@ -0,0 +1,81 @@
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson с тем же выводом, что и у стандартного: компактные
+    разделители, кириллица без экранирования, экранированные U+2028/U+2029.
+    Даты и прочие нестандартные типы кодирует JSONEncoder из DRF. С отступами
+    и без orjson работает стандартный рендерер.
+
+    Отличия — только у float: значение то же, но запись может быть другой
+    (1e16 вместо 1e+16, 1e-7 вместо 1e-07), а NaN и бесконечности orjson
+    пишет как null, тогда как стандартный рендерер (strict) на них падает.
+    """
+
+    options = (
+        orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if orjson else 0
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        try:
+            ret = orjson.dumps(data, default=JSONEncoder().default, option=self.options)
+        except orjson.JSONEncodeError:
+            # например, целые вне 64 бит
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    application/msgpack для мобильных клиентов. Даты приходят из
+    сериализаторов объектами datetime (см. native_datetime) и пакуются
+    расширением Timestamp: 6 байт вместо 20 байт строки.
+    """
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    native_datetime = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=JSONEncoder().default, datetime=True)
+
+
+class NDJSONRenderer(FastJSONRenderer):
+    """
+    application/x-ndjson: потоковые выгрузки отдают StreamingHttpResponse
+    сами, а через рендерер проходят только ошибки, одной строкой.
+    """
+
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(data, accepted_media_type, renderer_context) + b'\n'
@@ -1,8 +1,80 @@
-from general.models import Chat, Comment, Message, Reaction, User, Post
+import datetime
+from general import activity, sharding, sync, timing
+from general.counters import post_views
+from general.models import Activity, Chat, Comment, Message, Reaction, User, Post
 from rest_framework import serializers
-from django.db.models import Q
+from rest_framework.settings import api_settings
+from rest_framework.validators import UniqueValidator
+from django.conf import settings
+from django.db import models
+from django.utils.functional import cached_property
+
+
+class DateTimeField(serializers.DateTimeField):
+    """
+    Для рендереров с native_datetime (msgpack) отдаёт сам datetime, чтобы
+    рендерер упаковал его компактно, а не строкой DATETIME_FORMAT.
+    """
+
+    def to_representation(self, value):
+        request = self.context.get("request")
+        renderer = getattr(request, "accepted_renderer", None)
+        if isinstance(value, datetime.datetime) and getattr(renderer, "native_datetime", False):
+            value = self.enforce_timezone(value)
+            output_format = getattr(self, "format", api_settings.DATETIME_FORMAT)
+            # точность как у строкового формата
+            if output_format and "%f" not in output_format:
+                value = value.replace(microsecond=0)
+            return value
+        return super().to_representation(value)
+
+
+class ModelSerializer(serializers.ModelSerializer):
+    """
+    Базовый сериализатор API. Если вьюсет передал в context sparse_fields
+    (general.api.sparse), корневой сериализатор отдаёт только запрошенные
+    поля, а вложенные сериализаторы не из expand заменяет их id.
+    """
+
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.DateTimeField: DateTimeField,
+    }
+
+    @cached_property
+    def fields(self):
+        fields = super().fields
+        sparse_fields = self.context.get("sparse_fields")
+        parent = self.parent.parent if isinstance(self.parent, serializers.ListSerializer) else self.parent
+        if sparse_fields is None or parent is not None:
+            return fields
+        requested, expand = sparse_fields
+        for name, field in list(fields.items()):
+            if name not in requested:
+                del fields[name]
+            elif name not in expand and isinstance(field, serializers.BaseSerializer):
+                # id связанных строк есть в самой строке (или в prefetch), без JOIN
+                source = {} if field.source == name else {"source": field.source}
+                fields[name] = serializers.PrimaryKeyRelatedField(
+                    many=isinstance(field, serializers.ListSerializer),
+                    read_only=True,
+                    **source,
+                )
+        return fields
+
+    def to_representation(self, instance):
+        timings = timing.current()
+        if timings is None or timings.serializing:
+            return super().to_representation(instance)
+        timings.serializing = True
+        try:
+            with timings.measure("serialize"):
+                return super().to_representation(instance)
+        finally:
+            timings.serializing = False
 
-class UserRegisterationSerializer(serializers.ModelSerializer):
+
+class UserRegisterationSerializer(ModelSerializer):
     class Meta:
         model = User
         fields = (
@@ -12,6 +84,17 @@ class UserRegisterationSerializer(serializers.ModelSerializer):
           "first_name",
           "last_name",
         )
+        extra_kwargs = {
+            # имя занято, пока строку мягко удалённого пользователя не удалил purge_user
+            "username": {"validators": [
+                User.username_validator,
+                UniqueValidator(
+                    queryset=User.all_objects.all(),
+                    message=User._meta.get_field("username").error_messages["unique"],
+                ),
+            ]},
+        }
+
     def create(self, validated_data):
         user = User.objects.create(
           username=validated_data['username'],
@@ -24,7 +107,7 @@ class UserRegisterationSerializer(serializers.ModelSerializer):
 
         return user
 
-class UserListSerializer(serializers.ModelSerializer):
+class UserListSerializer(ModelSerializer):
     is_friend = serializers.SerializerMethodField()
     class Meta:
       model = User
@@ -37,13 +120,15 @@ class UserListSerializer(serializers.ModelSerializer):
       )
 
     def get_is_friend(self, obj) -> bool:
+       if hasattr(obj, 'is_friend'):
+           return obj.is_friend
        current_user = self.context['request'].user
        return current_user in obj.friends.all()
 
 
 
 
-class NestedPostListSerializer(serializers.ModelSerializer):
+class NestedPostListSerializer(ModelSerializer):
     class Meta:
         model = Post
         fields = (
@@ -53,7 +138,7 @@ class NestedPostListSerializer(serializers.ModelSerializer):
             "created_at",
         )
 
-class UserRetrieveSerializer(serializers.ModelSerializer):
+class UserRetrieveSerializer(ModelSerializer):
     is_friend = serializers.SerializerMethodField()
     friend_count  = serializers.SerializerMethodField()
     posts = NestedPostListSerializer(many=True)
@@ -76,12 +161,12 @@ class UserRetrieveSerializer(serializers.ModelSerializer):
     def get_friend_count(self, obj)->int:
         return obj.friends.count()
 
-class UserShortSerializer(serializers.ModelSerializer):
+class UserShortSerializer(ModelSerializer):
     class Meta:
         model = User
         fields = ("id", "first_name", "last_name")
 
-class PostListSerializer(serializers.ModelSerializer):
+class PostListSerializer(ModelSerializer):
     author = UserShortSerializer()
     body = serializers.SerializerMethodField()
 
@@ -100,9 +185,10 @@ class PostListSerializer(serializers.ModelSerializer):
             return obj.body[:125] + "..."
         return obj.body
 
-class PostRetrieveSerializer(serializers.ModelSerializer):
+class PostRetrieveSerializer(ModelSerializer):
     author = UserShortSerializer()
     my_reaction = serializers.SerializerMethodField()
+    views = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
@@ -112,6 +198,7 @@ class PostRetrieveSerializer(serializers.ModelSerializer):
           "title",
           "body",
           "my_reaction",
+          "views",
           "created_at"
         )
 
@@ -119,7 +206,11 @@ class PostRetrieveSerializer(serializers.ModelSerializer):
         reaction = self.context['request'].user.reactions.filter(post=obj).last()
         return reaction.value if reaction else ""
 
-class PostCreateUpdateSerializer(serializers.ModelSerializer):
+    def get_views(self, obj)->int:
+        # вместе с ещё не записанными просмотрами этого процесса
+        return obj.views + post_views.pending_views(obj.pk)
+
+class PostCreateUpdateSerializer(ModelSerializer):
     author = serializers.HiddenField(default=serializers.CurrentUserDefault(),)
     class Meta:
         model = Post
@@ -131,7 +222,7 @@ class PostCreateUpdateSerializer(serializers.ModelSerializer):
         )
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(ModelSerializer):
     author = serializers.HiddenField(default=serializers.CurrentUserDefault(),)
 
     def get_fields(self):
@@ -150,7 +241,7 @@ class CommentSerializer(serializers.ModelSerializer):
             "created_at",
         )
 
-class ReactionSerializer(serializers.ModelSerializer):
+class ReactionSerializer(ModelSerializer):
     author = serializers.HiddenField(default=serializers.CurrentUserDefault(),)
 
     class Meta:
@@ -158,23 +249,32 @@ class ReactionSerializer(serializers.ModelSerializer):
         fields = ("id", "author", "post", "value",)
 
     def create(self, validated_data):
-        reaction = Reaction.objects.filter(
+        reaction = Reaction.objects.toggle(
+            author=validated_data["author"],
             post=validated_data["post"],
-            author=validated_data["author"]
-        ).last()
-        if not reaction:
-            return Reaction.objects.create(**validated_data)
-        if reaction.value == validated_data["value"]:
-            reaction.value = None
-        else:
-            reaction.value = validated_data["value"]
+            value=validated_data.get("value"),
+        )
+        sync.record(reaction, deleted=reaction.value is None)
+        # снятая реакция из ленты автора поста не убирается
+        if reaction.value is not None:
+            activity.record(
+                reaction.post.author_id,
+                Activity.Kinds.REACTION,
+                validated_data["author"].pk,
+                reaction.post_id,
+            )
+        return reaction
 
-        reaction.save()
 
-        return reaction
+class ReactorSerializer(ModelSerializer):
+    author = UserShortSerializer()
+
+    class Meta:
+        model = Reaction
+        fields = ("author", "value",)
 
 
-class ChatSerializer(serializers.ModelSerializer):
+class ChatSerializer(ModelSerializer):
     user_1 = serializers.HiddenField(
         default=serializers.CurrentUserDefault(),
     )
@@ -184,32 +284,19 @@ class ChatSerializer(serializers.ModelSerializer):
         fields = ("id", "user_1", "user_2")
 
     def create(self, validated_data):
-        request_user = validated_data["user_1"]
-        second_user = validated_data["user_2"]
-
-        chat = Chat.objects.filter(
-            Q(user_1=request_user, user_2=second_user)
-            | Q(user_1=second_user, user_2=request_user)
-        ).first()
-        if not chat:
-            chat = Chat.objects.create(
-                user_1=request_user,
-                user_2=second_user,
-            )
-
-        return chat
+        return sharding.get_or_create_chat(validated_data["user_1"], validated_data["user_2"])
 
     def to_representation(self, obj):
         representation = super().to_representation(obj)
         representation["user_2"] = (
-            obj.user_1.pk
-            if obj.user_2 == self.context["request"].user
-            else obj.user_2.pk
+            obj.user_1_id
+            if obj.user_2_id == self.context["request"].user.pk
+            else obj.user_2_id
         )
         return representation
 
 
-class MessageListSerializer(serializers.ModelSerializer):
+class MessageListSerializer(ModelSerializer):
     message_author = serializers.CharField()
 
     class Meta:
@@ -217,10 +304,10 @@ class MessageListSerializer(serializers.ModelSerializer):
         fields = ("id", "content", "message_author", "created_at")
 
 
-class ChatListSerializer(serializers.ModelSerializer):
+class ChatListSerializer(ModelSerializer):
     companion_name = serializers.SerializerMethodField()
     last_message_content = serializers.SerializerMethodField()
-    last_message_datetime = serializers.DateTimeField()
+    last_message_datetime = DateTimeField()
 
     class Meta:
         model = Chat
@@ -239,15 +326,31 @@ class ChatListSerializer(serializers.ModelSerializer):
         return f"{companion.first_name} {companion.last_name}"
 
 
-class MessageSerializer(serializers.ModelSerializer):
+class ChatPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Ищет чат сразу на его шарде, а не в базе по умолчанию."""
+
+    def to_internal_value(self, data):
+        try:
+            chat_id = int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        queryset = sharding.on_shard(self.get_queryset(), sharding.shard_for_chat(chat_id))
+        chat = queryset.filter(pk=chat_id).first()
+        if chat is None:
+            self.fail("does_not_exist", pk_value=data)
+        return chat
+
+
+class MessageSerializer(ModelSerializer):
     author = serializers.HiddenField(
         default=serializers.CurrentUserDefault(),
     )
+    chat = ChatPrimaryKeyRelatedField(queryset=Chat.objects.all())
 
     def validate(self, attrs):
         chat = attrs["chat"]
         author = attrs["author"]
-        if chat.user_1 != author and chat.user_2 != author:
+        if chat.user_1_id != author.pk and chat.user_2_id != author.pk:
             raise serializers.ValidationError("Вы не являетесь участником этого чата.")
         return super().validate(attrs)
 
@@ -255,3 +358,58 @@ class MessageSerializer(serializers.ModelSerializer):
         model = Message
         fields = ("id", "author", "content", "chat", "created_at")
 
+
+
+class ActivitySerializer(ModelSerializer):
+    actor = UserShortSerializer()
+
+    class Meta:
+        model = Activity
+        fields = ("seq", "kind", "target_id", "events", "actor", "updated_at")
+
+
+class SyncPostSerializer(ModelSerializer):
+    class Meta:
+        model = Post
+        fields = ("id", "author", "title", "body", "created_at")
+
+
+class SyncCommentSerializer(ModelSerializer):
+    class Meta:
+        model = Comment
+        fields = ("id", "author", "post", "body", "created_at")
+
+
+class SyncReactionSerializer(ModelSerializer):
+    class Meta:
+        model = Reaction
+        fields = ("id", "author", "post", "value")
+
+
+class SyncChatSerializer(ModelSerializer):
+    class Meta:
+        model = Chat
+        fields = ("id", "user_1", "user_2")
+
+
+class SyncMessageSerializer(ModelSerializer):
+    class Meta:
+        model = Message
+        fields = ("id", "chat", "author", "content", "created_at")
+
+
+class BatchItemSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=("GET", "POST", "PUT", "PATCH", "DELETE"))
+    url = serializers.CharField()
+    body = serializers.JSONField(required=False)
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchItemSerializer(many=True, allow_empty=False, max_length=settings.BATCH_MAX_REQUESTS)
+    parallel = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        # параллельно — только чтения: порядок записей важен
+        if attrs["parallel"] and any(item["method"] != "GET" for item in attrs["requests"]):
+            raise serializers.ValidationError("Параллельно выполняются только GET-подзапросы.")
+        return attrs
@@ -0,0 +1,112 @@
+"""
+Разреженные ответы: ?fields=id,title и ?expand=author.
+
+fields оставляет в ответе только перечисленные поля, expand — вложенные
+объекты, которые нужно отдать целиком; остальные вложенные при этом
+отдаются одним id. По тем же полям сужается и выборка: only() читает
+только нужные столбцы (и столбцы развёрнутых связей из select_related),
+а select_related и prefetch_related ненужных связей отбрасываются.
+Без fields и expand ответ и выборка прежние.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.utils.functional import cached_property
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+def split_names(value):
+    return {name.strip() for name in (value or "").split(",") if name.strip()}
+
+
+def model_columns(model, names):
+    """Имена из names, которые — столбцы model (в том числе внешние ключи)."""
+    columns = set()
+    for name in names:
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        if field.concrete and not field.many_to_many:
+            columns.add(name)
+    return columns
+
+
+def field_source(name, field):
+    # метод сериализатора читает одноимённый столбец, если он есть
+    return name if isinstance(field, serializers.SerializerMethodField) else field.source
+
+
+def prefetch_root(lookup):
+    lookup = lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+    return lookup.split("__")[0]
+
+
+def narrow_queryset(queryset, serializer, ordering=()):
+    """
+    queryset, читающий только то, что нужно полям serializer, сортировке
+    и курсору пагинатора (ordering).
+    """
+    model = queryset.model
+    columns = {model._meta.pk.name}
+    columns |= model_columns(model, (name.lstrip("-") for name in (*queryset.query.order_by, *ordering)))
+    related, prefetches = set(), set()
+    for name, field in serializer.fields.items():
+        if isinstance(field, (serializers.ListSerializer, serializers.ManyRelatedField)):
+            prefetches.add(field.source)
+        elif isinstance(field, serializers.BaseSerializer):
+            related_model = model._meta.get_field(field.source).related_model
+            nested = model_columns(related_model, (sub.source for sub in field.fields.values()))
+            columns |= {field.source, *(f"{field.source}__{column}" for column in nested)}
+            related.add(field.source)
+        else:
+            columns |= model_columns(model, (field_source(name, field),))
+
+    queryset = queryset.prefetch_related(None).prefetch_related(*(
+        lookup for lookup in queryset._prefetch_related_lookups if prefetch_root(lookup) in prefetches
+    ))
+    # select_related первого уровня: вложенные связи здесь не используются
+    if isinstance(queryset.query.select_related, dict):
+        kept = [name for name in queryset.query.select_related if name in related]
+        queryset = queryset.select_related(None)
+        if kept:
+            # select_related() без аргументов включил бы все связи
+            queryset = queryset.select_related(*kept)
+    return queryset.only(*columns)
+
+
+class SparseFieldsMixin:
+    """Поддержка ?fields= и ?expand= для действий sparse_actions вьюсета."""
+
+    sparse_actions = ("list", "retrieve")
+
+    @cached_property
+    def sparse_fields(self):
+        """(запрошенные поля, развёрнутые поля) или None без параметров."""
+        params = self.request.query_params
+        if self.action not in self.sparse_actions or not ({"fields", "expand"} & set(params)):
+            return None
+        serializer = self.get_serializer_class()(context=super().get_serializer_context())
+        available = set(serializer.fields)
+        expand = split_names(params.get("expand"))
+        requested = (split_names(params.get("fields")) or available) | expand
+        unknown = requested - available
+        if unknown:
+            raise ValidationError({"fields": f"Неизвестные поля: {', '.join(sorted(unknown))}."})
+        return requested, expand
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.sparse_fields is not None:
+            context["sparse_fields"] = self.sparse_fields
+        return context
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.sparse_fields is None:
+            return queryset
+        ordering = getattr(self.paginator, "ordering", None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        return narrow_queryset(queryset, self.get_serializer(), ordering)
@@ -0,0 +1,158 @@
+import datetime
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from general.authentication import user_cache
+from general.deletion import BatchDeleter, purge_deleted
+from general.factories import ChatFactory, PostFactory, UserFactory
+from general.models import Activity, Reaction
+from general.paginators import ActivityPagination
+
+
+class ActivityTestCase(APITestCase):
+    def setUp(self):
+        self.owner = UserFactory()
+        self.post = PostFactory(author=self.owner)
+        self.url = "/api/activity/"
+        print(self)
+
+    def act(self, user, method, url, data=None):
+        self.client.force_authenticate(user=user)
+        response = getattr(self.client, method)(url, data, format="json")
+        self.assertLess(response.status_code, 300, response.data)
+        return response
+
+    def react(self, user, value=Reaction.Values.HEART):
+        self.act(user, "post", "/api/reaction/", {"post": self.post.pk, "value": value})
+
+    def poll(self, after=None):
+        self.client.force_authenticate(user=self.owner)
+        params = {} if after is None else {"after": after}
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_events_from_all_sources(self):
+        other = UserFactory()
+        chat = ChatFactory(user_1=other, user_2=self.owner)
+        self.act(other, "post", "/api/comments/", {"post": self.post.pk, "body": "text"})
+        self.react(other)
+        self.act(other, "post", f"/api/users/{self.owner.pk}/add_friend/")
+        self.act(other, "post", "/api/messages/", {"chat": chat.pk, "content": "hi"})
+
+        data = self.poll()
+        self.assertEqual(
+            [(item["kind"], item["target_id"]) for item in data["results"]],
+            [
+                (Activity.Kinds.COMMENT, self.post.pk),
+                (Activity.Kinds.REACTION, self.post.pk),
+                (Activity.Kinds.FRIEND, 0),
+                (Activity.Kinds.MESSAGE, chat.pk),
+            ],
+        )
+        self.assertEqual(data["results"][0]["actor"]["id"], other.pk)
+        self.assertEqual(data["cursor"], data["results"][-1]["seq"])
+
+        # свои действия в ленту не попадают, снятая реакция тоже
+        self.react(self.owner)
+        self.react(other)
+        self.assertEqual(Activity.objects.filter(recipient=other).count(), 0)
+        self.assertEqual(self.poll(data["cursor"])["results"], [])
+
+    def test_similar_events_coalesced(self):
+        users = UserFactory.create_batch(5)
+        for user in users:
+            self.react(user)
+
+        (item,) = self.poll()["results"]
+        self.assertEqual(item["events"], 5)
+        self.assertEqual(item["actor"]["id"], users[-1].pk)
+
+        # после паузы дольше окна счёт начинается заново
+        Activity.objects.update(
+            updated_at=datetime.datetime.now(datetime.timezone.utc)
+            - datetime.timedelta(seconds=settings.ACTIVITY_COALESCE_WINDOW + 1),
+        )
+        self.react(users[0], Reaction.Values.SAD)
+        (item,) = self.poll()["results"]
+        self.assertEqual(item["events"], 1)
+
+    def test_poll_by_cursor(self):
+        first, second = UserFactory.create_batch(2)
+        self.react(first)
+        cursor = self.poll()["cursor"]
+
+        other_post = PostFactory(author=self.owner)
+        self.act(second, "post", "/api/reaction/", {"post": other_post.pk, "value": "heart"})
+        self.react(second)
+
+        with self.assertNumQueries(1):
+            data = self.poll(cursor)
+        # склеенное событие поднимается за курсор вместе с новым
+        self.assertEqual(
+            [(item["target_id"], item["events"]) for item in data["results"]],
+            [(other_post.pk, 1), (self.post.pk, 2)],
+        )
+        self.assertFalse(data["has_more"])
+
+        with mock.patch.object(ActivityPagination, "page_size", 1):
+            data = self.poll(cursor)
+            self.assertTrue(data["has_more"])
+            data = self.poll(data["cursor"])
+            self.assertFalse(data["has_more"])
+        self.assertEqual(data["results"][0]["target_id"], self.post.pk)
+
+        self.assertEqual(self.poll(data["cursor"]), {
+            "cursor": data["cursor"], "has_more": False, "results": [],
+        })
+
+    def test_poll_uses_index(self):
+        queryset = Activity.objects.filter(recipient=self.owner, seq__gt=10).order_by("seq")
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {queryset[:50].query}")
+            plan = " ".join(row[-1] for row in cursor.fetchall())
+        self.assertIn("activity_inbox_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_deleted_recipient_rejected(self):
+        self.addCleanup(user_cache.clear)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.owner)}")
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        # токен ещё действует, а пользователь уже удалён
+        self.owner.soft_delete()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_cursor(self):
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.get(self.url, {"after": "abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_deleted_actor(self):
+        other = UserFactory()
+        self.react(other)
+        other.soft_delete()
+        self.assertEqual(self.poll()["results"], [])
+
+        purge_deleted(BatchDeleter(progress=lambda *args: None))
+        self.assertFalse(Activity.objects.exists())
+
+    def test_purge_keeps_coalesced_events(self):
+        first, last = UserFactory.create_batch(2)
+        self.react(first)
+        self.react(last)
+        last.soft_delete()
+        purge_deleted(BatchDeleter(progress=lambda *args: None))
+
+        # событие первого автора остаётся, без удалённого последнего автора
+        (item,) = self.poll()["results"]
+        self.assertEqual((item["events"], item["actor"]), (1, None))
+
+        # следующее событие снова называет автора
+        self.react(first, Reaction.Values.SAD)
+        (item,) = self.poll()["results"]
+        self.assertEqual((item["events"], item["actor"]["id"]), (2, first.pk))
@@ -0,0 +1,59 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from general.factories import CommentFactory, PostFactory, UserFactory
+from general.models import Post
+from general.paginators import EstimatedCountPaginator
+
+
+class EstimatedCountPaginatorTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        PostFactory.create_batch(5)
+        print(self)
+
+    def test_exact_below_limit(self):
+        paginator = EstimatedCountPaginator(Post.objects.order_by("id"), 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(paginator.count, 5)
+
+    @patch.object(EstimatedCountPaginator, "exact_count_limit", 2)
+    def test_cached_above_limit(self):
+        queryset = Post.objects.order_by("id")
+        self.assertEqual(EstimatedCountPaginator(queryset, 2).count, 5)
+        PostFactory()
+        with self.assertNumQueries(1):
+            self.assertEqual(EstimatedCountPaginator(queryset, 2).count, 5)
+
+        filtered = queryset.filter(title__isnull=False)
+        self.assertEqual(EstimatedCountPaginator(filtered, 2).count, 6)
+
+    @patch.object(EstimatedCountPaginator, "exact_count_limit", 2)
+    def test_estimated_from_statistics(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        PostFactory.create_batch(3)
+        # без фильтров — оценка по sqlite_stat1, снятая до новых постов
+        self.assertEqual(EstimatedCountPaginator(Post.objects.order_by("id"), 2).count, 5)
+
+
+class PostAdminTestCase(TestCase):
+    def setUp(self):
+        self.admin = UserFactory(is_staff=True, is_superuser=True)
+        self.client.force_login(self.admin)
+        print(self)
+
+    def test_changelist_comment_count(self):
+        post = PostFactory()
+        CommentFactory.create_batch(3, post=post)
+        PostFactory.create_batch(5)
+
+        with self.assertNumQueries(4):
+            response = self.client.get("/admin/general/post/")
+        self.assertEqual(response.status_code, 200)
+        counts = {obj.pk: obj.comment_count for obj in response.context["cl"].result_list}
+        self.assertEqual(counts[post.pk], 3)
+        self.assertEqual(sum(counts.values()), 3)
@@ -0,0 +1,80 @@
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+from general.authentication import user_cache
+from general.factories import PostFactory, UserFactory
+from general.models import Activity, Reaction, SyncChange
+
+
+class CachedJWTAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.user = UserFactory()
+        self.token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        self.url = "/api/users/me/"
+        print(self)
+
+    def test_user_resolved_once_per_token(self):
+        # SELECT пользователя, друзья для is_friend, friend_count, посты
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, format="json")
+        self.assertEqual(response.data["id"], self.user.pk)
+
+    def test_new_token_is_resolved_again(self):
+        self.client.get(self.url, format="json")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        with self.assertNumQueries(4):
+            self.client.get(self.url, format="json")
+
+    def test_save_invalidates_cache(self):
+        self.client.get(self.url, format="json")
+        self.user.first_name = "Новое имя"
+        self.user.save()
+        response = self.client.get(self.url, format="json")
+        self.assertEqual(response.data["first_name"], "Новое имя")
+
+    def test_deactivated_user_rejected(self):
+        self.client.get(self.url, format="json")
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cache_is_bounded(self):
+        cache_size = user_cache.max_size
+        user_cache.max_size = 2
+        self.addCleanup(setattr, user_cache, "max_size", cache_size)
+        for user_id in range(3):
+            user_cache.set(user_id, "jti", self.user)
+        self.assertIsNone(user_cache.get(0, "jti"))
+        self.assertIsNotNone(user_cache.get(2, "jti"))
+
+    def test_reaction_with_cached_user(self):
+        post = PostFactory()
+        data = {"post": post.pk, "value": Reaction.Values.SMILE}
+        self.client.get(self.url, format="json")
+        # пользователь уже в кэше, SELECT пользователя нет: пост, сам
+        # toggle, журнал синхронизации и событие ленты
+        with self.assertNumQueries(7):
+            response = self.client.post("/api/reaction/", data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Reaction.objects.get().author, self.user)
+
+    def test_reaction_of_deleted_user_rejected(self):
+        post = PostFactory()
+        data = {"post": post.pk, "value": Reaction.Values.SMILE}
+        inactive = UserFactory(is_active=False)
+        self.user.soft_delete()
+        # токены выданы до удаления и отключения и ещё действуют
+        for user in (self.user, inactive):
+            self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+            response = self.client.post("/api/reaction/", data=data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(Reaction.objects.exists())
+        self.assertFalse(SyncChange.objects.exists())
+        self.assertFalse(Activity.objects.exists())
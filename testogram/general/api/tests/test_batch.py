@@ -0,0 +1,139 @@
+import json
+from unittest import mock
+
+from django.conf import settings
+from django.test import TransactionTestCase
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from general.api.budgets import QueryBudgetExceeded
+from general.api.views import PostViewSet
+from general.authentication import CachedJWTAuthentication, user_cache
+from general.factories import ChatFactory, PostFactory, UserFactory
+from general.models import Post
+
+
+class BatchTestCase(APITestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.user = UserFactory()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        self.url = "/api/batch/"
+        print(self)
+
+    def batch(self, *requests, parallel=False):
+        response = self.client.post(
+            self.url, {"requests": list(requests), "parallel": parallel}, format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response.data["responses"]
+
+    def test_responses_match_separate_requests(self):
+        post = PostFactory()
+        ChatFactory(user_1=self.user)
+        urls = ["/api/users/me/", "/api/posts/", f"/api/posts/{post.pk}/", "/api/chats/"]
+        expected = [json.loads(self.client.get(url).content) for url in urls]
+
+        responses = self.batch(*({"method": "GET", "url": url} for url in urls))
+        self.assertEqual([item["status"] for item in responses], [200] * 4)
+        # просмотр поста второй раз не считается
+        self.assertEqual([item["body"] for item in responses], expected)
+
+    def test_user_authenticated_once(self):
+        urls = ["/api/users/me/", "/api/posts/", "/api/activity/", "/api/sync/"]
+        with mock.patch.object(
+            CachedJWTAuthentication, "authenticate", autospec=True,
+            side_effect=CachedJWTAuthentication.authenticate,
+        ) as authenticate:
+            responses = self.batch(*({"method": "GET", "url": url} for url in urls))
+        self.assertEqual([item["status"] for item in responses], [200] * 4)
+        self.assertEqual(authenticate.call_count, 1)
+
+    def test_writes_visible_to_next_requests(self):
+        responses = self.batch(
+            {"method": "POST", "url": "/api/posts/", "body": {"title": "title", "body": "body"}},
+            {"method": "POST", "url": "/api/posts/", "body": {"title": ""}},
+            {"method": "GET", "url": "/api/posts/?page=1"},
+        )
+        created, invalid, listed = responses
+        self.assertEqual(created["status"], status.HTTP_201_CREATED)
+        self.assertEqual(invalid["status"], status.HTTP_400_BAD_REQUEST)
+        self.assertIn("title", invalid["body"])
+        self.assertEqual(listed["body"]["count"], 1)
+        self.assertEqual(Post.objects.get().author, self.user)
+
+    def test_sub_request_errors(self):
+        responses = self.batch(
+            {"method": "GET", "url": "/api/unknown/"},
+            {"method": "GET", "url": "https://example.com/api/posts/"},
+            {"method": "POST", "url": "/api/batch/", "body": {"requests": []}},
+            {"method": "DELETE", "url": "/api/posts/"},
+            # вне роутера API: схема, токены, админка
+            {"method": "GET", "url": "/api/schema/"},
+            {"method": "POST", "url": "/api/token/", "body": {"username": "u", "password": "p"}},
+            {"method": "GET", "url": "/admin/"},
+        )
+        self.assertEqual(
+            [item["status"] for item in responses],
+            [404, 400, 400, status.HTTP_405_METHOD_NOT_ALLOWED, 404, 404, 404],
+        )
+
+    def test_failed_sub_request_does_not_break_batch(self):
+        with (
+            mock.patch.object(PostViewSet, "list", side_effect=RuntimeError("boom")),
+            self.assertLogs("general.batch", "ERROR"),
+        ):
+            responses = self.batch(
+                {"method": "GET", "url": "/api/posts/"},
+                {"method": "GET", "url": "/api/users/me/"},
+            )
+        self.assertEqual([item["status"] for item in responses], [500, 200])
+
+    def test_budget_exceeded_not_swallowed(self):
+        budgets = {**PostViewSet.query_budgets, "list": 0}
+        with (
+            self.settings(QUERY_BUDGET_STRICT=True),
+            mock.patch.object(PostViewSet, "query_budgets", budgets),
+            self.assertRaises(QueryBudgetExceeded),
+        ):
+            self.batch({"method": "GET", "url": "/api/posts/"})
+
+    def test_invalid_batch(self):
+        parallel_write = {
+            "requests": [{"method": "POST", "url": "/api/posts/", "body": {}}],
+            "parallel": True,
+        }
+        read = {"method": "GET", "url": "/api/posts/"}
+        too_many = {"requests": [read] * (settings.BATCH_MAX_REQUESTS + 1)}
+        for data in ({"requests": []}, too_many, parallel_write):
+            response = self.client.post(self.url, data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.credentials()
+        response = self.client.post(self.url, {"requests": [read]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ParallelBatchTestCase(TransactionTestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.user = UserFactory()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        print(self)
+
+    def test_parallel_reads(self):
+        PostFactory.create_batch(12)
+        urls = ["/api/users/me/", "/api/posts/", "/api/posts/?page=2", "/api/comments/", "/api/sync/"]
+        requests = [{"method": "GET", "url": url} for url in urls]
+
+        sequential = self.client.post("/api/batch/", {"requests": requests}, format="json")
+        parallel = self.client.post(
+            "/api/batch/", {"requests": requests, "parallel": True}, format="json",
+        )
+        self.assertEqual(parallel.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["status"] for item in parallel.data["responses"]], [200] * 5)
+        self.assertEqual(parallel.data, sequential.data)
@@ -2,7 +2,8 @@ import time
 from rest_framework.test import APITestCase
 from rest_framework import status
 from general.factories import  UserFactory,  ChatFactory, MessageFactory
-from general.models import Chat,  Message   
+from general.models import Chat,  IdSequence, Message
+from django.db import transaction
 from django.utils.timezone import make_naive
 
 class ChatTestCase(APITestCase):
@@ -197,3 +198,15 @@ class ChatTestCase(APITestCase):
 
 
         
+
+    def test_message_ids_after_rollback(self):
+        chat = ChatFactory(user_1=self.user)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            MessageFactory(author=self.user, chat=chat)
+            raise RuntimeError
+        self.assertEqual(IdSequence.objects.get(name="message").value, 0)
+
+        # блок из откаченной транзакции не используется: id выдан из нового
+        # резерва, и другой процесс его уже не получит
+        message = MessageFactory(author=self.user, chat=chat)
+        self.assertLessEqual(message.pk, IdSequence.objects.get(name="message").value)
@@ -0,0 +1,203 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from general.authentication import user_cache
+from general.deletion import BatchDeleter, purge_deleted
+from general.factories import (
+    ChatFactory,
+    CommentFactory,
+    MessageFactory,
+    PostFactory,
+    ReactionFactory,
+    UserFactory,
+)
+from general.models import Chat, Comment, Message, Post, Reaction, User
+
+
+class SoftDeleteTestCase(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        print(self)
+
+    def test_deleted_post_hidden(self):
+        post = PostFactory(author=self.user)
+        CommentFactory.create_batch(2, post=post)
+        ReactionFactory.create_batch(2, post=post)
+
+        response = self.client.delete(f"/api/posts/{post.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.assertEqual(self.client.get("/api/posts/").data["results"], [])
+        response = self.client.get(f"/api/posts/{post.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(f"/api/comments/?post__id={post.pk}")
+        self.assertEqual(response.data["results"], [])
+        # зависимые строки остаются до purge_deleted
+        self.assertIsNotNone(Post.all_objects.get(pk=post.pk).deleted_at)
+        self.assertEqual(Comment.objects.filter(post_id=post.pk).count(), 2)
+
+        purge_deleted(BatchDeleter(progress=lambda *args: None))
+        self.assertFalse(Post.all_objects.filter(pk=post.pk).exists())
+        self.assertFalse(Comment.objects.filter(post_id=post.pk).exists())
+        self.assertFalse(Reaction.objects.filter(post_id=post.pk).exists())
+
+    def test_deleted_user_hidden(self):
+        other = UserFactory()
+        other_post = PostFactory(author=other)
+        PostFactory(author=other)
+        ChatFactory(user_1=self.user, user_2=other)
+        self.user.friends.add(other)
+
+        other.soft_delete()
+
+        response = self.client.get("/api/users/")
+        self.assertNotIn(other.pk, [user["id"] for user in response.data["results"]])
+        response = self.client.get("/api/posts/")
+        self.assertEqual(response.data["results"], [])
+        response = self.client.get(f"/api/posts/{other_post.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get("/api/chats/").data["results"], [])
+
+    def test_deleted_user_token_rejected(self):
+        self.client.force_authenticate(user=None)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        self.assertEqual(self.client.get("/api/users/me/").status_code, status.HTTP_200_OK)
+
+        self.user.soft_delete()
+        response = self.client.get("/api/users/me/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        user_cache.clear()
+
+
+class PurgeDeletedTestCase(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.other = UserFactory()
+        self.other_post = PostFactory(author=self.other)
+        print(self)
+
+    def seed(self):
+        posts = PostFactory.create_batch(3, author=self.user)
+        for post in posts:
+            CommentFactory.create_batch(2, post=post)
+            ReactionFactory(post=post)
+        CommentFactory.create_batch(2, author=self.user, post=self.other_post)
+        ReactionFactory(author=self.user, post=self.other_post)
+        ReactionFactory(author=self.other, post=self.other_post)
+        chat = ChatFactory(user_1=self.other, user_2=self.user)
+        MessageFactory.create_batch(3, chat=chat, author=self.other)
+        MessageFactory.create_batch(3, author=self.user)
+        self.user.friends.add(self.other)
+
+    def assertPurged(self):
+        self.assertFalse(User.all_objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Post.all_objects.filter(author=self.user).exists())
+        self.assertFalse(Comment.objects.filter(author=self.user).exists())
+        self.assertFalse(Reaction.objects.filter(author=self.user).exists())
+        self.assertFalse(Message.objects.filter(author=self.user).exists())
+        self.assertFalse(Chat.objects.filter(user_2=self.user).exists())
+        self.assertFalse(self.other.friends.exists())
+        self.assertEqual(Message.objects.count(), 0)
+        self.other_post.refresh_from_db()
+        self.assertEqual(self.other_post.reactions_count, 1)
+        self.assertEqual(Reaction.objects.filter(post=self.other_post).count(), 1)
+
+    def test_purge_user(self):
+        self.seed()
+        self.user.soft_delete()
+
+        progress = []
+        deleter = purge_deleted(BatchDeleter(batch_size=2, progress=lambda *args: progress.append(args)))
+
+        self.assertPurged()
+        self.assertIn((f"user {self.user.pk}", 1, 1), progress)
+        self.assertEqual(progress[-1][0], f"user {self.user.pk}")
+        self.assertGreater(deleter.deleted, 20)
+        self.assertTrue(User.objects.filter(pk=self.other.pk).exists())
+
+    def test_resume_after_interruption(self):
+        self.seed()
+        self.user.soft_delete()
+
+        class Interrupted(Exception):
+            pass
+
+        def interrupt(label, done, total):
+            if "posts" in label:
+                raise Interrupted
+
+        with self.assertRaises(Interrupted):
+            purge_deleted(BatchDeleter(batch_size=1, max_batch_size=1, progress=interrupt))
+        # удалён один пост из трёх, предыдущие шаги доведены до конца
+        self.assertEqual(Post.all_objects.filter(author=self.user).count(), 2)
+        self.assertFalse(Comment.objects.filter(author=self.user).exists())
+        self.other_post.refresh_from_db()
+        self.assertEqual(self.other_post.reactions_count, 1)
+
+        purge_deleted(BatchDeleter(progress=lambda *args: None))
+        self.assertPurged()
+
+    def test_command(self):
+        self.seed()
+        self.user.soft_delete()
+        out = StringIO()
+        call_command("purge_deleted", "--max-lock-ms", "10", stdout=out)
+        self.assertPurged()
+        self.assertIn("longest batch", out.getvalue())
+
+
+class BatchDeleterTestCase(TestCase):
+    def setUp(self):
+        print(self)
+
+    def test_adapt(self):
+        deleter = BatchDeleter(max_lock_seconds=0.1, batch_size=100, max_batch_size=300)
+        for _ in range(5):
+            deleter.adapt(0.001)
+        self.assertEqual(deleter.batch_size, 300)
+        deleter.adapt(0.4)
+        self.assertEqual(deleter.batch_size, 37)
+        deleter.adapt(0.05)
+        self.assertEqual(deleter.batch_size, 37)
+        # после превышения пачка не вырастает обратно до размера, который
+        # его дал
+        for _ in range(5):
+            deleter.adapt(0.001)
+        self.assertEqual(deleter.batch_size, 150)
+        self.assertEqual(deleter.longest_batch, 0.4)
+
+    def test_batch_size_restarts_per_table(self):
+        user = UserFactory()
+        ReactionFactory.create_batch(5, author=user)
+        CommentFactory.create_batch(5, author=user)
+        sizes = []
+        deleter = BatchDeleter(batch_size=2, progress=lambda label, done, total: sizes.append((label, done)))
+        deleter.adapt(0.0)
+        self.assertEqual(deleter.batch_size, 4)
+        deleter.delete("reactions", Reaction.objects.filter(author=user))
+        deleter.delete("comments", Comment.objects.filter(author=user))
+        self.assertIn(("comments", 2), sizes)
+
+    def test_lock_time_within_ceiling(self):
+        users = UserFactory.create_batch(20)
+        user = users[0]
+        posts = PostFactory.create_batch(20, author=user)
+        for post in posts:
+            CommentFactory.create_batch(20, post=post)
+            for other in users[1:]:
+                ReactionFactory(author=other, post=post)
+        for post in PostFactory.create_batch(20):
+            ReactionFactory(author=user, post=post)
+            CommentFactory.create_batch(5, author=user, post=post)
+        user.friends.add(*users[1:])
+        user.soft_delete()
+
+        deleter = purge_deleted(BatchDeleter(progress=lambda *args: None))
+        self.assertGreater(deleter.deleted, 900)
+        self.assertLessEqual(deleter.longest_batch, deleter.max_lock_seconds)
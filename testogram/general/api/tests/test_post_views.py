@@ -0,0 +1,133 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from rest_framework.test import APITestCase
+
+from general.counters import ViewCounter, post_views
+from general.factories import PostFactory, UserFactory
+from general.models import Post
+
+
+class PostViewsTestCase(APITestCase):
+    def setUp(self):
+        post_views.clear()
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        self.post = PostFactory()
+        print(self)
+
+    def tearDown(self):
+        post_views.clear()
+
+    def test_retrieve_counts_view_without_write(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/api/posts/{self.post.pk}/")
+        self.assertEqual(response.data["views"], 1)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).views, 0)
+
+        # повтор того же пользователя внутри окна не считается
+        response = self.client.get(f"/api/posts/{self.post.pk}/")
+        self.assertEqual(response.data["views"], 1)
+
+        self.client.force_authenticate(user=UserFactory())
+        response = self.client.get(f"/api/posts/{self.post.pk}/")
+        self.assertEqual(response.data["views"], 2)
+
+        post_views.flush()
+        self.assertEqual(Post.objects.get(pk=self.post.pk).views, 2)
+        response = self.client.get(f"/api/posts/{self.post.pk}/")
+        self.assertEqual(response.data["views"], 2)
+
+    def test_flush_after_request_when_due(self):
+        self.client.get(f"/api/posts/{self.post.pk}/")
+        self.assertEqual(Post.objects.get(pk=self.post.pk).views, 0)
+
+        post_views.flushed_at -= settings.POST_VIEWS_FLUSH_INTERVAL
+        self.client.force_authenticate(user=UserFactory())
+        self.client.get(f"/api/posts/{self.post.pk}/")
+        self.assertEqual(Post.objects.get(pk=self.post.pk).views, 2)
+        self.assertEqual(post_views.pending_views(self.post.pk), 0)
+
+
+class ViewCounterTestCase(TestCase):
+    def setUp(self):
+        self.posts = PostFactory.create_batch(4)
+        print(self)
+
+    def test_one_update_per_distinct_count(self):
+        counter = ViewCounter(window=60, flush_interval=60, max_viewers=100)
+        for post, viewers in zip(self.posts, (3, 1, 3, 1)):
+            for viewer_id in range(viewers):
+                counter.add(post.pk, viewer_id)
+
+        with self.assertNumQueries(4):  # SAVEPOINT, два UPDATE, RELEASE
+            self.assertEqual(counter.flush(), 2)
+        self.assertEqual(
+            [post.views for post in Post.objects.order_by("pk")],
+            [3, 1, 3, 1],
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(counter.flush(), 0)
+
+    def test_window_and_viewer_limit(self):
+        counter = ViewCounter(window=0, flush_interval=60, max_viewers=100)
+        self.assertTrue(counter.add(self.posts[0].pk, 1))
+        self.assertTrue(counter.add(self.posts[0].pk, 1))
+
+        counter = ViewCounter(window=60, flush_interval=60, max_viewers=2)
+        for viewer_id in (1, 2, 3):
+            self.assertTrue(counter.add(self.posts[0].pk, viewer_id))
+        # первый зритель вытеснен и считается снова, третий ещё помнится
+        self.assertTrue(counter.add(self.posts[0].pk, 1))
+        self.assertFalse(counter.add(self.posts[0].pk, 3))
+        self.assertEqual(counter.pending_views(self.posts[0].pk), 4)
+
+    def test_failed_flush_keeps_views(self):
+        counter = ViewCounter(window=60, flush_interval=60, max_viewers=100)
+        counter.add(self.posts[0].pk, 1)
+        with (
+            connection.execute_wrapper(self.fail),
+            self.assertRaises(RuntimeError),
+            self.assertLogs("general.counters", "ERROR"),
+        ):
+            counter.flush()
+        self.assertEqual(counter.pending_views(self.posts[0].pk), 1)
+        counter.flush()
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).views, 1)
+
+    @staticmethod
+    def fail(execute, sql, params, many, context):
+        if sql.startswith("UPDATE"):
+            raise RuntimeError("database is locked")
+        return execute(sql, params, many, context)
+
+
+class ShutdownFlushTestCase(TransactionTestCase):
+    def setUp(self):
+        print(self)
+
+    def test_views_flushed_on_exit(self):
+        post = PostFactory()
+        # отдельный процесс-воркер на той же тестовой базе: набирает
+        # просмотры и завершается, не дождавшись периодической записи
+        script = textwrap.dedent(f"""
+            import django
+            django.setup()
+            from general.counters import post_views
+            for viewer_id in range(3):
+                post_views.add({post.pk}, viewer_id)
+            post_views.add({post.pk}, 0)
+        """)
+        subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "TESTOGRAM_DB": str(connection.settings_dict["NAME"])},
+            check=True,
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.views, 3)
@@ -1,5 +1,6 @@
 from rest_framework.test import APITestCase
 from rest_framework import status
+from general.counters import post_views
 from general.factories import PostFactory, UserFactory, ReactionFactory
 from general.models import Post, Reaction
 from django.utils.timezone import make_naive
@@ -9,6 +10,7 @@ class PostTestCase(APITestCase):
         self.user = UserFactory()
         self.client.force_authenticate(user=self.user)
         self.url = '/api/posts/'
+        post_views.clear()
         print(self)
 
     def test_create_post(self):
@@ -82,6 +84,7 @@ class PostTestCase(APITestCase):
             "title": post.title,
             "body": post.body,
             "my_reaction": reaction.value,
+            "views": 1,
             "created_at": make_naive(post.created_at).strftime("%Y-%m-%dT%H:%M:%S"),
             }
         self.assertDictEqual(expected_data, response.data)
@@ -179,3 +182,49 @@ class PostTestCase(APITestCase):
         response = self.client.delete(path=f"{self.url}{post.pk}/", format="json")
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+
+    def test_post_reactions(self):
+        post = PostFactory()
+        ReactionFactory.create_batch(3, post=post, value=Reaction.Values.HEART)
+        laugh = ReactionFactory(post=post, value=Reaction.Values.LAUGH)
+        ReactionFactory(post=post, value=None)
+        ReactionFactory(value=Reaction.Values.HEART)
+
+        with self.assertNumQueries(4):
+            response = self.client.get(path=f"{self.url}{post.pk}/reactions/", format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertDictEqual(response.data["counts"], {
+            Reaction.Values.SMILE: 0,
+            Reaction.Values.THUMB_UP: 0,
+            Reaction.Values.LAUGH: 1,
+            Reaction.Values.SAD: 0,
+            Reaction.Values.HEART: 3,
+        })
+        self.assertEqual(response.data["count"], 4)
+        self.assertDictEqual(response.data["results"][0], {
+            "author": {
+                "id": laugh.author.pk,
+                "first_name": laugh.author.first_name,
+                "last_name": laugh.author.last_name,
+            },
+            "value": Reaction.Values.LAUGH,
+        })
+
+    def test_post_reactions_batch(self):
+        post_1, post_2, post_3 = PostFactory.create_batch(3)
+        ReactionFactory.create_batch(2, post=post_1, value=Reaction.Values.SMILE)
+        ReactionFactory(post=post_2, value=Reaction.Values.SAD)
+
+        url = f"{self.url}reactions/?post_ids={post_1.pk},{post_2.pk},{post_3.pk}"
+        with self.assertNumQueries(1):
+            response = self.client.get(path=url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[post_1.pk][Reaction.Values.SMILE], 2)
+        self.assertEqual(response.data[post_2.pk][Reaction.Values.SAD], 1)
+        self.assertEqual(sum(response.data[post_3.pk].values()), 0)
+
+    def test_post_reactions_batch_invalid_ids(self):
+        response = self.client.get(path=f"{self.url}reactions/?post_ids=1,a", format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(path=f"{self.url}reactions/", format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,115 @@
+from unittest.mock import patch
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from general.api.budgets import QueryBudgetExceeded
+from general.api.urls import router
+from general.api.views import PostViewSet
+from general.authentication import user_cache
+from general.factories import (
+    ChatFactory,
+    CommentFactory,
+    MessageFactory,
+    PostFactory,
+    ReactionFactory,
+    UserFactory,
+)
+
+
+class QueryBudgetTestCase(APITestCase):
+    # объём данных растёт, а число запросов на GET-действие не должно
+    sizes = (1, 12)
+
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.user = UserFactory()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        self.posts = []
+        self.others = []
+        self.chats = []
+        print(self)
+
+    def seed(self, size):
+        others = UserFactory.create_batch(size)
+        self.user.friends.add(*others[::2])
+        posts = PostFactory.create_batch(size, author=self.user)
+        for other in others:
+            posts.append(PostFactory(author=other))
+            chat = ChatFactory(user_1=self.user, user_2=other)
+            MessageFactory.create_batch(2, chat=chat, author=self.user)
+            MessageFactory(chat=chat, author=other)
+            self.chats.append(chat)
+        for post in posts[:size]:
+            CommentFactory.create_batch(size, post=post)
+            for other in others:
+                ReactionFactory(author=other, post=post)
+        self.others += others
+        self.posts += posts
+
+    def routes(self):
+        for prefix, viewset, basename in router.registry:
+            for route in router.get_routes(viewset):
+                mapping = router.get_method_map(viewset, route.mapping)
+                for method, action in mapping.items():
+                    yield viewset, basename, route, method, action
+
+    def url(self, basename, route, action):
+        pks = {
+            "posts": self.posts[0].pk,
+            "users": self.others[0].pk,
+            "chats": self.chats[0].pk,
+        }
+        params = {
+            ("posts", "reactions_batch"): f"?post_ids={','.join(str(post.pk) for post in self.posts)}",
+            ("comments", "list"): f"?post__id={self.posts[0].pk}",
+        }
+        kwargs = {"pk": pks[basename]} if route.detail else {}
+        name = route.name.format(basename=basename)
+        return reverse(name, kwargs=kwargs) + params.get((basename, action), "")
+
+    def test_every_action_has_budget(self):
+        for viewset, basename, route, method, action in self.routes():
+            with self.subTest(viewset=viewset.__name__, action=action):
+                self.assertIn(action, viewset.query_budgets)
+
+    def test_get_actions_within_budget(self):
+        counts = {}
+        for size in self.sizes:
+            self.seed(size)
+            for viewset, basename, route, method, action in self.routes():
+                if method != "get":
+                    continue
+                url = self.url(basename, route, action)
+                user_cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+                counts.setdefault((viewset, action), []).append(len(queries))
+
+        for (viewset, action), action_counts in counts.items():
+            budget = viewset.query_budgets[action]
+            if budget is None:
+                continue
+            with self.subTest(viewset=viewset.__name__, action=action):
+                self.assertEqual(len(set(action_counts)), 1, action_counts)
+                self.assertLessEqual(action_counts[0], budget)
+
+    def test_strict_mode(self):
+        self.seed(1)
+        budgets = {**PostViewSet.query_budgets, "list": 1}
+        with self.settings(QUERY_BUDGET_STRICT=True):
+            with self.assertRaisesMessage(QueryBudgetExceeded, "PostViewSet.list: 3 queries, budget 1"):
+                with patch.object(PostViewSet, "query_budgets", budgets):
+                    self.client.get("/api/posts/")
+
+        with self.settings(QUERY_BUDGET_STRICT=False):
+            user_cache.clear()
+            with self.assertLogs("general.budgets", level="WARNING") as logs:
+                with patch.object(PostViewSet, "query_budgets", budgets):
+                    response = self.client.get("/api/posts/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(logs.records[0].queries, 3)
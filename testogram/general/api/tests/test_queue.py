@@ -0,0 +1,177 @@
+import datetime
+import threading
+from unittest import mock
+
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from general.factories import CommentFactory, PostFactory, UserFactory
+from general.models import Comment, Post, Task
+from general.queue import Worker, enqueue, task
+
+calls = []
+lock = threading.Lock()
+
+
+@task(name="tests.record")
+def record(value, extra=None):
+    with lock:
+        calls.append((value, extra, threading.current_thread().name))
+
+
+@task(name="tests.record_batch", batch=True)
+def record_batch(values):
+    with lock:
+        calls.append(sorted(values))
+
+
+@task(name="tests.fail", max_attempts=2, retry_delay=60)
+def fail():
+    raise ValueError("boom")
+
+
+class EnqueueTestCase(TestCase):
+    def setUp(self):
+        print(self)
+
+    def test_enqueue_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record.enqueue(1, extra="a")
+            self.assertFalse(Task.objects.exists())
+        task = Task.objects.get()
+        self.assertEqual(task.name, "tests.record")
+        self.assertEqual(task.payload, {"args": [1], "kwargs": {"extra": "a"}})
+
+    def test_rollback_drops_task(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    record.enqueue(1)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertFalse(Task.objects.exists())
+
+    def test_invalid_payload(self):
+        with self.assertRaises(TypeError):
+            record.enqueue(object())
+        with self.assertRaises(TypeError):
+            record_batch.enqueue(1, 2)
+
+
+class WorkerTestCase(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+        self.worker = Worker(threads=4)
+        self.addCleanup(self.worker.shutdown)
+        print(self)
+
+    def test_run_tasks(self):
+        for i in range(5):
+            enqueue("tests.record", i)
+
+        # захват и одно удаление выполненных, каждое в своей транзакции
+        with self.assertNumQueries(7):
+            self.assertEqual(self.worker.run_once(), 5)
+        self.assertEqual(sorted(value for value, extra, thread in calls), [0, 1, 2, 3, 4])
+        self.assertTrue(all(thread.startswith("task") for value, extra, thread in calls))
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(self.worker.run_once(), 0)
+
+    def test_batch(self):
+        for i in range(4):
+            record_batch.enqueue(i)
+        self.assertEqual(self.worker.run_once(), 4)
+        self.assertEqual(calls, [[0, 1, 2, 3]])
+        self.assertFalse(Task.objects.exists())
+
+    def test_retry(self):
+        fail.enqueue()
+        with self.assertLogs("general.queue", "WARNING"):
+            self.worker.run_once()
+        task = Task.objects.get()
+        self.assertEqual(task.attempts, 1)
+        self.assertEqual(task.status, Task.Statuses.PENDING)
+        self.assertGreater(task.run_at, timezone.now() + datetime.timedelta(seconds=50))
+        self.assertIn("ValueError: boom", task.last_error)
+        # до run_at задача не готова
+        self.assertEqual(self.worker.run_once(), 0)
+
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs("general.queue", "ERROR"):
+            self.worker.run_once()
+        task.refresh_from_db()
+        self.assertEqual(task.attempts, 2)
+        self.assertEqual(task.status, Task.Statuses.FAILED)
+        self.assertEqual(self.worker.run_once(), 0)
+
+    def test_unknown_task(self):
+        enqueue("tests.missing")
+        with self.assertLogs("general.queue", "ERROR"):
+            self.worker.run_once()
+        self.assertEqual(Task.objects.get().status, Task.Statuses.FAILED)
+
+    def test_expired_lease(self):
+        enqueue("tests.record", 1)
+        Task.objects.update(locked_until=timezone.now() + datetime.timedelta(seconds=60))
+        self.assertEqual(self.worker.run_once(), 0)
+        Task.objects.update(locked_until=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertEqual(self.worker.run_once(), 1)
+
+
+    def test_run_survives_locked_database(self):
+        enqueue("tests.record", 1)
+        locked = []
+
+        def lock_once(execute, sql, params, many, context):
+            if not locked and "general_task" in sql:
+                locked.append(sql)
+                raise OperationalError("database is locked")
+            return execute(sql, params, many, context)
+
+        class Stop(Exception):
+            pass
+
+        # пауза после ошибки, затем порция с задачей и пауза без задач
+        with (
+            connection.execute_wrapper(lock_once),
+            mock.patch("general.queue.time.sleep", side_effect=[None, Stop]) as sleep,
+            self.assertLogs("general.queue", "ERROR"),
+            self.assertRaises(Stop),
+        ):
+            self.worker.run(interval=0.5)
+        self.assertEqual(len(locked), 1)
+        self.assertEqual(sleep.call_args_list, [mock.call(0.5), mock.call(0.5)])
+        self.assertEqual([value for value, extra, thread in calls], [1])
+        self.assertFalse(Task.objects.exists())
+
+
+class PurgeTaskTestCase(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        print(self)
+
+    def test_post_delete_enqueues_purge(self):
+        post = PostFactory(author=self.user)
+        CommentFactory.create_batch(2, post=post)
+        other = PostFactory(author=self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f"/api/posts/{post.pk}/")
+            self.client.delete(f"/api/posts/{other.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Task.objects.filter(name="general.purge_deleted").count(), 2)
+
+        worker = Worker(threads=1)
+        # TestCase держит данные в незакоммиченной транзакции, поэтому
+        # задача выполняется в этом потоке, а не в пуле воркера
+        for function, tasks in worker.groups(worker.claim()):
+            function.execute(tasks)
+        worker.shutdown()
+        self.assertFalse(Post.all_objects.exists())
+        self.assertFalse(Comment.objects.exists())
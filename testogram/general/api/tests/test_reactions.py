@@ -1,3 +1,6 @@
+from threading import Thread
+from django.db import connection
+from django.test import TransactionTestCase
 from rest_framework.test import APITestCase
 from rest_framework import status
 from general.factories import PostFactory, UserFactory, ReactionFactory
@@ -65,3 +68,79 @@ class ReactionsTestCase(APITestCase):
         response = self.client.post(self.url, data=data, format="json")
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(Reaction.objects.count(), 0)
+
+    def test_reactions_count_follows_toggle(self):
+        data = {
+            "post": self.post.id,
+            "value": Reaction.Values.SMILE
+        }
+        self.client.post(self.url, data=data, format="json")
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.reactions_count, 1)
+
+        data["value"] = Reaction.Values.SAD
+        self.client.post(self.url, data=data, format="json")
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.reactions_count, 1)
+
+        self.client.post(self.url, data=data, format="json")
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.reactions_count, 0)
+        self.assertEqual(Reaction.objects.count(), 1)
+
+    def test_toggle_queries(self):
+        data = {
+            "post": self.post.id,
+            "value": Reaction.Values.SMILE
+        }
+        # SAVEPOINT, UPDATE счётчика, upsert, RELEASE + SELECT поста в
+        # валидации, журнал синхронизации и событие в ленте автора поста
+        with self.assertNumQueries(7):
+            response = self.client.post(self.url, data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        reaction = Reaction.objects.get()
+        self.assertDictEqual(
+            response.data,
+            {"id": reaction.pk, "post": self.post.pk, "value": Reaction.Values.SMILE},
+        )
+
+
+class ReactionsConcurrencyTestCase(TransactionTestCase):
+    threads = 16
+    toggles_per_thread = 25
+
+    def test_concurrent_toggles(self):
+        post = PostFactory()
+        users = UserFactory.create_batch(self.threads)
+        values = list(Reaction.Values)
+        errors = []
+
+        def hammer(user, offset):
+            try:
+                for i in range(self.toggles_per_thread):
+                    Reaction.objects.toggle(
+                        author=user,
+                        post=post,
+                        value=values[(offset + i // 2) % len(values)],
+                    )
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [
+            Thread(target=hammer, args=(user, offset))
+            for offset, user in enumerate(users)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertListEqual(errors, [])
+        self.assertEqual(Reaction.objects.filter(post=post).count(), self.threads)
+        post.refresh_from_db()
+        self.assertEqual(
+            post.reactions_count,
+            Reaction.objects.filter(post=post, value__isnull=False).count(),
+        )
@@ -0,0 +1,131 @@
+import datetime
+import io
+import json
+import uuid
+from decimal import Decimal
+import msgpack
+from django.test import SimpleTestCase
+from django.utils import timezone
+from django.utils.timezone import make_naive
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework import status
+from general.factories import ChatFactory, MessageFactory, UserFactory
+from general.models import Message
+from general.api.parsers import FastJSONParser
+from general.api.renderers import FastJSONRenderer
+
+
+class FastJSONTestCase(SimpleTestCase):
+    data = {
+        "id": 1,
+        "message_author": "Вы",
+        "content": "строка с \u2028 и \u2029, \"кавычками\" и \\ слэшем",
+        "created_at": "2024-05-22T13:41:00",
+        "naive": datetime.datetime(2024, 5, 22, 13, 41, 0, 123456),
+        "aware": timezone.now(),
+        "date": datetime.date(2024, 5, 22),
+        "decimal": Decimal("1.50"),
+        "uuid": uuid.uuid4(),
+        "lazy": gettext_lazy("Улыбка"),
+        "counts": {1: {"smile": 2}, 2: {"sad": 0}},
+        "results": [None, True, False, 0.5, -3, []],
+    }
+
+    def test_output_is_identical(self):
+        self.assertEqual(
+            FastJSONRenderer().render(self.data),
+            JSONRenderer().render(self.data),
+        )
+
+    def test_float_spelling(self):
+        data = {"values": [1e16, 1e-7, 0.1, 2.5e-300]}
+        fast = FastJSONRenderer().render(data)
+        self.assertEqual(fast, b'{"values":[1e16,1e-7,0.1,2.5e-300]}')
+        self.assertEqual(json.loads(fast), json.loads(JSONRenderer().render(data)))
+
+    def test_non_finite_floats_are_null(self):
+        data = {"values": [float("nan"), float("inf"), -float("inf")]}
+        self.assertEqual(FastJSONRenderer().render(data), b'{"values":[null,null,null]}')
+        with self.assertRaises(ValueError):
+            JSONRenderer().render(data)
+
+    def test_indent_falls_back(self):
+        media_type = "application/json; indent=4"
+        self.assertEqual(
+            FastJSONRenderer().render(self.data, media_type),
+            JSONRenderer().render(self.data, media_type),
+        )
+
+    def test_huge_int_falls_back(self):
+        data = {"big": 2 ** 70}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_parse(self):
+        content = JSONRenderer().render({"body": "комментарий", "post": 1})
+        self.assertEqual(
+            FastJSONParser().parse(io.BytesIO(content)),
+            JSONParser().parse(io.BytesIO(content)),
+        )
+
+    def test_parse_errors(self):
+        for content in (b"{", b'{"value": NaN}'):
+            with self.assertRaises(ParseError):
+                FastJSONParser().parse(io.BytesIO(content))
+
+
+class MessagePackTestCase(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        print(self)
+
+    def test_messages_as_msgpack(self):
+        chat = ChatFactory(user_1=self.user)
+        message = MessageFactory(author=self.user, chat=chat)
+        response = self.client.get(
+            f"/api/chats/{chat.pk}/messages/", HTTP_ACCEPT="application/msgpack"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        data = msgpack.unpackb(response.content, timestamp=3)
+        self.assertDictEqual(data[0], {
+            "id": message.pk,
+            "content": message.content,
+            "message_author": "Вы",
+            "created_at": message.created_at.replace(microsecond=0),
+        })
+
+    def test_json_is_default(self):
+        chat = ChatFactory(user_1=self.user)
+        message = MessageFactory(author=self.user, chat=chat)
+        response = self.client.get(f"/api/chats/{chat.pk}/messages/")
+        self.assertEqual(
+            response.json()[0]["created_at"],
+            make_naive(message.created_at).strftime("%Y-%m-%dT%H:%M:%S"),
+        )
+
+    def test_post_msgpack(self):
+        chat = ChatFactory(user_1=self.user)
+        response = self.client.post(
+            "/api/messages/",
+            data=msgpack.packb({"chat": chat.pk, "content": "новое сообщение"}),
+            content_type="application/msgpack",
+            HTTP_ACCEPT="application/msgpack",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        message = Message.objects.get()
+        self.assertEqual(message.content, "новое сообщение")
+        data = msgpack.unpackb(response.content, timestamp=3)
+        self.assertEqual(data["created_at"], message.created_at.replace(microsecond=0))
+
+    def test_invalid_msgpack(self):
+        # неизвестный байт, ключ-массив, лишние данные, незавершённый массив
+        for data in (b"\xc1", b"\x81\x90\x01", b"\x01\x02", b"\x93\x01"):
+            response = self.client.post(
+                "/api/messages/", data=data, content_type="application/msgpack",
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, data)
@@ -0,0 +1,93 @@
+from django.conf import settings
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from rest_framework import status
+from general.factories import PostFactory, UserFactory
+from general import db
+from general.models import Post, User
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTestCase(APITestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        self.url = "/api/posts/"
+        # реплика в тестах не синхронизируется с основной базой, поэтому
+        # по содержимому ответа видно, из какой базы он прочитан
+        self.replica_author = User.objects.db_manager("replica").create(username="replica")
+        self.replica_post = Post.objects.using("replica").create(
+            author=self.replica_author, title="from replica", body="body",
+        )
+        print(self)
+
+    def test_list_reads_from_replica(self):
+        PostFactory()
+        response = self.client.get(path=self.url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertListEqual(
+            [post["title"] for post in response.data["results"]],
+            ["from replica"],
+        )
+
+    def test_retrieve_reads_from_replica(self):
+        response = self.client.get(path=f"{self.url}{self.replica_post.pk}/", format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["title"], "from replica")
+
+    def test_write_goes_to_primary(self):
+        data = {"title": "new post", "body": "some text"}
+        response = self.client.post(path=self.url, data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Post.objects.using("default").filter(title="new post").exists())
+        self.assertFalse(Post.objects.using("replica").filter(title="new post").exists())
+
+    def test_reads_stick_to_primary_after_write(self):
+        data = {"title": "new post", "body": "some text"}
+        self.client.post(path=self.url, data=data, format="json")
+
+        response = self.client.get(path=self.url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertListEqual(
+            [post["title"] for post in response.data["results"]],
+            ["new post"],
+        )
+
+        self.client.cookies.pop(db.STICKY_COOKIE)
+        response = self.client.get(path=self.url, format="json")
+        self.assertListEqual(
+            [post["title"] for post in response.data["results"]],
+            ["from replica"],
+        )
+
+    def test_non_read_actions_use_primary(self):
+        response = self.client.get(path="/api/users/me/", format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["id"], self.user.pk)
+
+    def test_sticky_cookie(self):
+        data = {"title": "new post", "body": "some text"}
+        response = self.client.post(path=self.url, data=data, format="json")
+        cookie = response.cookies[db.STICKY_COOKIE]
+        self.assertTrue(cookie["httponly"])
+        self.assertEqual(cookie["max-age"], settings.DATABASE_REPLICA_STICKY_SECONDS)
+        signed = cookie.value
+
+        def titles():
+            response = self.client.get(path=self.url, format="json")
+            return [post["title"] for post in response.data["results"]]
+
+        # кука другого пользователя и поддельная кука не действуют
+        self.client.force_authenticate(user=UserFactory())
+        self.assertListEqual(titles(), ["from replica"])
+        self.client.force_authenticate(user=self.user)
+        self.client.cookies[db.STICKY_COOKIE] = str(self.user.pk)
+        self.assertListEqual(titles(), ["from replica"])
+
+        # просроченная подпись тоже
+        self.client.cookies[db.STICKY_COOKIE] = signed
+        self.assertListEqual(titles(), ["new post"])
+        with override_settings(DATABASE_REPLICA_STICKY_SECONDS=-1):
+            self.assertListEqual(titles(), ["from replica"])
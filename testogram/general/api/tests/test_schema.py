@@ -0,0 +1,104 @@
+import gzip
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from django.core.management import CommandError, call_command
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from rest_framework import status
+from general.factories import UserFactory
+from config import schema
+
+JSON = "application/vnd.oai.openapi+json"
+
+
+class LazyViewsTestCase(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.user.set_password("password")
+        self.user.save()
+        print(self)
+
+    def test_obtain_token(self):
+        data = {"username": self.user.username, "password": "password"}
+        response = self.client.post("/api/token/", data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("access", response.data)
+
+    def test_schema_includes_lazy_views(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/api/schema/", HTTP_ACCEPT="application/vnd.oai.openapi+json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        paths = response.json()["paths"]
+        self.assertIn("/api/token/", paths)
+        self.assertIn("/api/posts/", paths)
+
+    def test_importtime_failure(self):
+        with self.assertRaisesMessage(CommandError, "ModuleNotFoundError: No module named 'no_such_module'"):
+            call_command("importtime", "no_such_module", stdout=StringIO())
+
+
+class CachedSchemaTestCase(APITestCase):
+    def setUp(self):
+        schema.clear_cache()
+        self.addCleanup(schema.clear_cache)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.override = override_settings(SCHEMA_CACHE_DIR=Path(self.tmp.name))
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        self.client.force_authenticate(user=UserFactory())
+        self.url = "/api/schema/"
+        print(self)
+
+    def test_schema_generated_once(self):
+        response = self.client.get(self.url, HTTP_ACCEPT=JSON)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with mock.patch("config.schema.generate_schema", side_effect=AssertionError):
+            again = self.client.get(self.url, HTTP_ACCEPT=JSON)
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, again.content)
+        self.assertNotIn("/api/schema/", response.json()["paths"])
+
+    def test_etag(self):
+        response = self.client.get(self.url, HTTP_ACCEPT=JSON)
+        etag = response["ETag"]
+        response = self.client.get(self.url, HTTP_ACCEPT=JSON, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_gzip(self):
+        plain = self.client.get(self.url, HTTP_ACCEPT=JSON)
+        response = self.client.get(self.url, HTTP_ACCEPT=JSON, HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertNotEqual(response["ETag"], plain["ETag"])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+        for header in ("gzip;q=0", "br, gzip; q=0.0", "*;q=0", "identity"):
+            response = self.client.get(self.url, HTTP_ACCEPT=JSON, HTTP_ACCEPT_ENCODING=header)
+            self.assertFalse(response.has_header("Content-Encoding"), header)
+            self.assertEqual(response.content, plain.content)
+        response = self.client.get(self.url, HTTP_ACCEPT=JSON, HTTP_ACCEPT_ENCODING="br;q=1, *;q=0.5")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+    def test_served_from_built_file(self):
+        call_command("build_schema", stdout=StringIO())
+        path = schema.schema_path()
+        self.assertTrue(path.exists())
+        with mock.patch("config.schema.generate_schema", side_effect=AssertionError):
+            response = self.client.get(self.url, HTTP_ACCEPT=JSON)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertDictEqual(response.json(), json.loads(path.read_text()))
+
+    def test_new_code_version_invalidates(self):
+        with override_settings(CODE_VERSION="1"):
+            schema.clear_cache()
+            first = self.client.get(self.url, HTTP_ACCEPT=JSON)
+        with override_settings(CODE_VERSION="2"):
+            schema.clear_cache()
+            with mock.patch("config.schema.generate_schema", return_value={"openapi": "3.0.3"}) as generate:
+                second = self.client.get(self.url, HTTP_ACCEPT=JSON)
+        generate.assert_called_once()
+        self.assertNotEqual(first["ETag"], second["ETag"])
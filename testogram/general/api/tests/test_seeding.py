@@ -0,0 +1,82 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Count, F, Q
+from django.test import TestCase
+
+from general.models import Chat, Comment, Message, Post, Reaction, User
+from general.seeding import BulkSeeder
+
+
+class BulkSeederTestCase(TestCase):
+    def setUp(self):
+        self.seeder = BulkSeeder(seed=1, batch_size=7)
+        print(self)
+
+    def test_seed(self):
+        user_ids = self.seeder.users(20)
+        self.assertEqual(User.objects.count(), 20)
+        self.assertListEqual(user_ids, list(User.objects.order_by("id").values_list("id", flat=True)))
+        self.assertFalse(User.objects.get(pk=user_ids[0]).has_usable_password())
+
+        pairs = self.seeder.friendships(30)
+        self.assertEqual(len(pairs), 30)
+        self.assertEqual(User.friends.through.objects.count(), 60)
+        a, b = pairs[0]
+        self.assertTrue(User.objects.get(pk=a).friends.filter(pk=b).exists())
+
+        my_posts = self.seeder.posts(3, authors=user_ids[:1])
+        self.seeder.posts(40)
+        self.assertEqual(Post.objects.filter(author_id=user_ids[0], pk__in=my_posts).count(), 3)
+
+        self.seeder.comments(100)
+        self.assertEqual(Comment.objects.count(), 100)
+
+        self.seeder.reactions(150)
+        self.assertEqual(Reaction.objects.count(), 150)
+        mismatched = Post.objects.annotate(
+            counted=Count("reactions", filter=Q(reactions__value__isnull=False)),
+        ).exclude(reactions_count=F("counted"))
+        self.assertFalse(mismatched.exists())
+
+        chats = self.seeder.chats(10, with_user=user_ids[0])
+        self.assertEqual(len(chats), 10)
+        self.assertTrue(all(user_ids[0] in chat[1:] for chat in chats))
+
+        self.seeder.messages(50, every_chat=True)
+        self.assertEqual(Message.objects.count(), 50)
+        self.assertEqual(Chat.objects.filter(messages__isnull=True).count(), 0)
+        for message in Message.objects.select_related("chat"):
+            self.assertIn(message.author_id, (message.chat.user_1_id, message.chat.user_2_id))
+
+    def test_pools_reuse_existing_rows(self):
+        self.seeder.users(5)
+        seeder = BulkSeeder(seed=2)
+        seeder.posts(10)
+        self.assertEqual(User.objects.count(), 5)
+        self.assertLessEqual(Post.objects.values("author").distinct().count(), 5)
+
+    def test_unique_pairs_are_not_duplicated(self):
+        self.seeder.users(3)
+        self.seeder.chats(10)
+        self.seeder.chats(10)
+        self.assertEqual(Chat.objects.count(), 3)
+
+    def test_reproducible(self):
+        def seed():
+            seeder = BulkSeeder(seed=5)
+            seeder.users(10)
+            seeder.posts(10)
+            return list(Post.objects.order_by("id").values_list("title", "body", "author__first_name"))
+
+        first = seed()
+        Post.objects.all().delete()
+        User.objects.all().delete()
+        self.assertListEqual(seed(), first)
+
+    def test_command(self):
+        output = StringIO()
+        call_command("seed", users=10, friends=5, posts=10, messages=0, stdout=output)
+        self.assertEqual(User.objects.count(), 10)
+        self.assertEqual(Post.objects.count(), 10)
+        self.assertIn("friends:        10 rows", output.getvalue())
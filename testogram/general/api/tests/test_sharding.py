@@ -0,0 +1,228 @@
+import copy
+import tempfile
+from collections import Counter
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import SimpleTestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from general.deletion import BatchDeleter, purge_deleted
+from general.factories import UserFactory
+from general.models import Chat, ChatPair, Message
+from general.seeding import BulkSeeder
+from general.sharding import jump_hash, shard_for_chat
+
+
+class JumpHashTestCase(SimpleTestCase):
+    def setUp(self):
+        print(self)
+
+    def test_adding_bucket_moves_only_to_new_bucket(self):
+        for buckets in range(1, 8):
+            moved = 0
+            for key in range(5000):
+                before, after = jump_hash(key, buckets), jump_hash(key, buckets + 1)
+                if before != after:
+                    self.assertEqual(after, buckets)
+                    moved += 1
+            # переезжает примерно 1/(N+1) ключей
+            self.assertAlmostEqual(moved / 5000, 1 / (buckets + 1), delta=0.03)
+
+    def test_spread(self):
+        counts = Counter(jump_hash(key, 4) for key in range(8000))
+        self.assertEqual(set(counts), {0, 1, 2, 3})
+        self.assertLess(max(counts.values()) - min(counts.values()), 400)
+
+
+class ShardedChatsTestCase(APITestCase):
+    """Чаты на трёх отдельных файлах SQLite, пользователи — в основной базе."""
+
+    shards = ["test_chats_0", "test_chats_1", "test_chats_2"]
+
+    @classmethod
+    def setUpClass(cls):
+        # шарды заводятся здесь, а не в настройках: тест-раннер создаёт
+        # тестовые базы только для алиасов из settings.DATABASES
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        cls.enterClassContext(override_settings(CHAT_SHARDS=cls.shards))
+        for alias in cls.shards:
+            cls.add_shard(alias, Path(directory.name) / f"{alias}.sqlite3")
+        cls.databases = {DEFAULT_DB_ALIAS, *cls.shards}
+        super().setUpClass()
+
+    @classmethod
+    def add_shard(cls, alias, path):
+        connections.settings[alias] = {
+            **copy.deepcopy(connections.settings[DEFAULT_DB_ALIAS]),
+            "NAME": str(path),
+        }
+        cls.addClassCleanup(cls.remove_shard, alias)
+        call_command("migrate", database=alias, verbosity=0)
+
+    @classmethod
+    def remove_shard(cls, alias):
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        print(self)
+
+    def create_chats(self, count):
+        companions = UserFactory.create_batch(count)
+        chats = []
+        for companion in companions:
+            response = self.client.post("/api/chats/", {"user_2": companion.pk}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            chats.append(response.data["id"])
+        # последним пишем в первый чат, он должен оказаться первым в списке
+        for chat_id in reversed(chats):
+            response = self.client.post(
+                "/api/messages/", {"chat": chat_id, "content": f"hi {chat_id}"}, format="json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return chats, companions
+
+    def locations(self, model):
+        return {
+            pk: alias
+            for alias in self.shards
+            for pk in model.objects.using(alias).values_list("pk", flat=True)
+        }
+
+    def test_chats_placed_by_hash(self):
+        chats, companions = self.create_chats(12)
+
+        located = self.locations(Chat)
+        self.assertEqual(located, {chat_id: shard_for_chat(chat_id) for chat_id in chats})
+        self.assertGreater(len(set(located.values())), 1)
+        for message in self.locations(Message):
+            alias = self.locations(Message)[message]
+            chat_id = Message.objects.using(alias).get(pk=message).chat_id
+            self.assertEqual(alias, located[chat_id])
+        self.assertEqual(ChatPair.objects.count(), 12)
+
+        # повторное создание возвращает тот же чат
+        response = self.client.post("/api/chats/", {"user_2": companions[3].pk}, format="json")
+        self.assertEqual(response.data["id"], chats[3])
+        self.assertEqual(len(self.locations(Chat)), 12)
+
+    def test_list_merges_shards(self):
+        chats, companions = self.create_chats(12)
+
+        first = self.client.get("/api/chats/")
+        second = self.client.get("/api/chats/?page=2")
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data["count"], 12)
+        results = first.data["results"] + second.data["results"]
+        self.assertEqual([chat["id"] for chat in results], chats)
+        self.assertEqual(
+            results[0]["companion_name"],
+            f"{companions[0].first_name} {companions[0].last_name}",
+        )
+        self.assertEqual(results[0]["last_message_content"], f"hi {chats[0]}")
+
+    def test_list_hides_deleted_companions(self):
+        chats, companions = self.create_chats(4)
+        companions[1].soft_delete()
+
+        response = self.client.get("/api/chats/")
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual([chat["id"] for chat in response.data["results"]], [chats[0], *chats[2:]])
+        self.assertEqual(self.client.get(f"/api/chats/{chats[1]}/messages/").status_code, 404)
+
+    def test_messages_and_deletion(self):
+        chats, companions = self.create_chats(3)
+        chat_id = chats[1]
+        message = Message.objects.using(shard_for_chat(chat_id)).get(chat_id=chat_id)
+
+        response = self.client.get(f"/api/chats/{chat_id}/messages/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["id"] for item in response.data], [message.pk])
+        self.assertEqual(response.data[0]["message_author"], "Вы")
+
+        response = self.client.delete(f"/api/messages/{message.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertNotIn(message.pk, self.locations(Message))
+
+        response = self.client.delete(f"/api/chats/{chats[0]}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertNotIn(chats[0], self.locations(Chat))
+        self.assertEqual(len(self.locations(Message)), 1)
+
+        other = UserFactory()
+        self.client.force_authenticate(user=other)
+        response = self.client.get(f"/api/chats/{chats[2]}/messages/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rebalance(self):
+        with override_settings(CHAT_SHARDS=self.shards[:1]):
+            chats, companions = self.create_chats(10)
+            seeder = BulkSeeder()
+            seeder.messages(200, chats=seeder.chats(5, users=[self.user.pk, *[c.pk for c in companions]]))
+            listed = self.client.get("/api/chats/").data
+        messages = self.locations(Message)
+        self.assertEqual(set(self.locations(Chat).values()), {self.shards[0]})
+
+        output = StringIO()
+        call_command("rebalance_chats", "--batch-size", "7", stdout=output)
+        self.assertIn(f"{self.shards[0]} -> {self.shards[1]}", output.getvalue())
+
+        located = self.locations(Chat)
+        self.assertEqual(len(located), 15)
+        self.assertTrue(all(alias == shard_for_chat(pk) for pk, alias in located.items()))
+        # id сообщений не меняются, каждое лежит рядом со своим чатом
+        self.assertEqual(set(self.locations(Message)), set(messages))
+        for alias in self.shards:
+            chat_ids = set(Message.objects.using(alias).values_list("chat_id", flat=True))
+            self.assertTrue(chat_ids <= {pk for pk, chat_alias in located.items() if chat_alias == alias})
+
+        # после переноса список чатов тот же
+        self.assertEqual(self.client.get("/api/chats/").data, listed)
+
+        output = StringIO()
+        call_command("rebalance_chats", stdout=output)
+        self.assertEqual(output.getvalue(), "")
+
+    def test_sync_after_rebalance(self):
+        with override_settings(CHAT_SHARDS=self.shards[:1]):
+            token = self.client.get("/api/sync/").data["token"]
+            chats, companions = self.create_chats(6)
+        call_command("rebalance_chats", stdout=StringIO())
+
+        # перенесённые чаты записаны в журналы новых шардов, а не потеряны
+        response = self.client.get("/api/sync/", {"since": token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        changed = response.data["changed"]
+        self.assertEqual(sorted(chat["id"] for chat in changed["chats"]), sorted(chats))
+        self.assertEqual(sorted(message["chat"] for message in changed["messages"]), sorted(chats))
+        self.assertEqual(response.data["deleted"], {})
+
+        token = response.data["token"]
+        response = self.client.get("/api/sync/", {"since": token})
+        self.assertEqual(response.data["changed"], {})
+
+    def test_purge_user(self):
+        chats, companions = self.create_chats(6)
+        self.user.soft_delete()
+        purge_deleted(BatchDeleter(progress=lambda *args: None))
+        self.assertEqual(self.locations(Chat), {})
+        self.assertEqual(self.locations(Message), {})
+        self.assertFalse(ChatPair.objects.exists())
+
+    def test_seeder(self):
+        users = UserFactory.create_batch(10)
+        seeder = BulkSeeder()
+        chats = seeder.chats(20, users=[user.pk for user in users])
+        ids = seeder.messages(300, every_chat=True)
+
+        self.assertEqual(self.locations(Chat), {chat[0]: shard_for_chat(chat[0]) for chat in chats})
+        self.assertEqual(sorted(self.locations(Message)), ids)
+        self.assertEqual(ChatPair.objects.count(), 20)
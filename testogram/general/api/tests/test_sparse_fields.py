@@ -0,0 +1,83 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from general.factories import CommentFactory, PostFactory, UserFactory
+
+
+class SparseFieldsTestCase(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        self.author = UserFactory()
+        self.post = PostFactory(author=self.author)
+        print(self)
+
+    def get(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        sql = "\n".join(query["sql"] for query in queries)
+        return response.data, sql, len(queries)
+
+    def test_posts_only_requested_fields(self):
+        data, sql, _ = self.get("/api/posts/", {"fields": "id,title"})
+        self.assertEqual(data["results"], [{"id": self.post.pk, "title": self.post.title}])
+        self.assertNotIn('"general_post"."body"', sql)
+        self.assertNotIn('"general_user"."first_name"', sql)
+
+    def test_not_expanded_relation_is_id(self):
+        data, sql, _ = self.get("/api/posts/", {"fields": "id,author"})
+        self.assertEqual(data["results"], [{"id": self.post.pk, "author": self.author.pk}])
+        self.assertNotIn("first_name", sql)
+
+    def test_expanded_relation(self):
+        data, sql, _ = self.get(
+            f"/api/posts/{self.post.pk}/", {"fields": "id", "expand": "author"},
+        )
+        self.assertEqual(data, {
+            "id": self.post.pk,
+            "author": {
+                "id": self.author.pk,
+                "first_name": self.author.first_name,
+                "last_name": self.author.last_name,
+            },
+        })
+        self.assertIn("first_name", sql)
+        self.assertNotIn("password", sql)
+        self.assertNotIn('"general_post"."body"', sql)
+
+    def test_without_params_response_unchanged(self):
+        full, _, _ = self.get("/api/posts/", {})
+        expanded, _, _ = self.get("/api/posts/", {"expand": "author"})
+        self.assertEqual(expanded, full)
+
+    def test_skips_unrequested_prefetch(self):
+        PostFactory.create_batch(3, author=self.author)
+        url = f"/api/users/{self.author.pk}/"
+        full, _, full_count = self.get(url, {})
+        data, sql, count = self.get(url, {"fields": "id,first_name"})
+        self.assertEqual(data, {"id": self.author.pk, "first_name": self.author.first_name})
+        self.assertEqual(len(full["posts"]), 4)
+        self.assertLess(count, full_count)
+        self.assertNotIn('"general_post"', sql)
+
+        data, _, _ = self.get(url, {"fields": "id,posts"})
+        self.assertEqual(len(data["posts"]), 4)
+        self.assertIsInstance(data["posts"][0], int)
+
+    def test_comments_and_me(self):
+        comment = CommentFactory(post=self.post, author=self.author)
+        data, sql, _ = self.get("/api/comments/", {"fields": "id,post"})
+        self.assertEqual(data["results"], [{"id": comment.pk, "post": self.post.pk}])
+        self.assertNotIn('"general_user"."first_name"', sql)
+
+        data, _, _ = self.get("/api/users/me/", {"fields": "id,email"})
+        self.assertEqual(data, {"id": self.user.pk, "email": self.user.email})
+
+    def test_unknown_field(self):
+        for params in ({"fields": "id,password"}, {"expand": "body,nope"}):
+            response = self.client.get("/api/posts/", params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("fields", response.data)
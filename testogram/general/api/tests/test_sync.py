@@ -0,0 +1,151 @@
+from unittest import mock
+
+from django.db import connection
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from general import sync
+from general.api.views import SyncViewSet
+from general.authentication import user_cache
+from general.factories import ChatFactory, CommentFactory, PostFactory, UserFactory
+from general.models import Reaction, SyncChange
+
+
+class SyncTestCase(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.other = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        self.url = "/api/sync/"
+        print(self)
+
+    def sync(self, token, user=None):
+        self.client.force_authenticate(user=user or self.user)
+        response = self.client.get(self.url, {"since": token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def start(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data["changed"], {})
+        return response.data["token"]
+
+    def post(self, url, data):
+        response = self.client.post(url, data, format="json")
+        self.assertLess(response.status_code, 300, response.data)
+        return response.data
+
+    def test_changes_since_token(self):
+        PostFactory()
+        token = self.start()
+
+        post = self.post("/api/posts/", {"title": "title", "body": "body"})
+        comment = self.post("/api/comments/", {"post": post["id"], "body": "text"})
+        self.post("/api/reaction/", {"post": post["id"], "value": Reaction.Values.HEART})
+        chat = self.post("/api/chats/", {"user_2": self.other.pk})
+        message = self.post("/api/messages/", {"chat": chat["id"], "content": "hi"})
+
+        # журнал и по запросу на каждый вид строк
+        with self.assertNumQueries(6):
+            data = self.sync(token)
+        changed = data["changed"]
+        self.assertEqual(changed["posts"], [{
+            "id": post["id"],
+            "author": self.user.pk,
+            "title": "title",
+            "body": "body",
+            "created_at": changed["posts"][0]["created_at"],
+        }])
+        self.assertEqual([item["id"] for item in changed["comments"]], [comment["id"]])
+        self.assertEqual(changed["reactions"][0]["value"], Reaction.Values.HEART)
+        self.assertEqual(changed["chats"], [{"id": chat["id"], "user_1": self.user.pk, "user_2": self.other.pk}])
+        self.assertEqual([item["id"] for item in changed["messages"]], [message["id"]])
+        self.assertEqual(data["deleted"], {})
+        self.assertFalse(data["has_more"])
+
+        # следующий запрос отдаёт только новое: изменённый пост и надгробия
+        token = data["token"]
+        self.client.patch(f"/api/posts/{post['id']}/", {"title": "new"}, format="json")
+        self.client.delete(f"/api/comments/{comment['id']}/")
+        self.post("/api/reaction/", {"post": post["id"], "value": Reaction.Values.HEART})
+        self.client.delete(f"/api/messages/{message['id']}/")
+        data = self.sync(token)
+        self.assertEqual(list(data["changed"]), ["posts"])
+        self.assertEqual(data["changed"]["posts"][0]["title"], "new")
+        self.assertEqual(data["deleted"], {
+            "comments": [comment["id"]],
+            "reactions": [changed["reactions"][0]["id"]],
+            "messages": [message["id"]],
+        })
+
+        token = data["token"]
+        self.client.delete(f"/api/posts/{post['id']}/")
+        self.post("/api/messages/", {"chat": chat["id"], "content": "bye"})
+        self.client.delete(f"/api/chats/{chat['id']}/")
+        data = self.sync(token)
+        # сообщения удалённого чата клиент удаляет по надгробию чата
+        self.assertEqual(data["changed"], {})
+        self.assertEqual(data["deleted"], {"posts": [post["id"]], "chats": [chat["id"]]})
+        self.assertEqual(self.sync(data["token"])["deleted"], {})
+
+    def test_chats_visible_to_members_only(self):
+        token = self.start()
+        stranger = UserFactory()
+        chat = ChatFactory(user_1=self.other, user_2=stranger)
+        sync.record(chat)
+
+        self.assertEqual(self.sync(token)["changed"], {})
+        self.assertEqual(self.sync(token, user=stranger)["changed"]["chats"][0]["id"], chat.pk)
+
+    def test_comments_of_deleted_post_skipped(self):
+        token = self.start()
+        comment = CommentFactory()
+        sync.record(comment)
+        comment.post.soft_delete()
+        sync.record(comment.post, deleted=True)
+
+        data = self.sync(token)
+        self.assertEqual(data["changed"], {})
+        self.assertEqual(data["deleted"], {"posts": [comment.post_id]})
+
+    def test_pages(self):
+        token = self.start()
+        posts = PostFactory.create_batch(5)
+        for post in posts:
+            sync.record(post)
+        # повторное изменение не дублирует строку журнала, а сдвигает её в конец
+        sync.record(posts[0])
+
+        received = []
+        with mock.patch.object(SyncViewSet, "page_size", 2):
+            while True:
+                data = self.sync(token)
+                received += [post["id"] for post in data["changed"].get("posts", [])]
+                token = data["token"]
+                if not data["has_more"]:
+                    break
+        self.assertEqual(received, [post.pk for post in posts[1:]] + [posts[0].pk])
+        self.assertEqual(SyncChange.objects.count(), 5)
+
+    def test_invalid_token(self):
+        for token in ("abc", sync.encode_token(["default"]), sync.encode_token({"default": "1"})):
+            response = self.client.get(self.url, {"since": token})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_log_query_uses_index(self):
+        queryset = SyncChange.objects.filter(audience__in=[0, self.user.pk], seq__gt=10).order_by("seq")
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {queryset[:501].query}")
+            plan = " ".join(row[-1] for row in cursor.fetchall())
+        self.assertIn("sync_change_audience_idx", plan)
+
+    def test_deleted_user_rejected(self):
+        self.addCleanup(user_cache.clear)
+        self.client.force_authenticate(user=None)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        # токен ещё действует, а пользователь уже удалён
+        self.user.soft_delete()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
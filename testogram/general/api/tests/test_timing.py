@@ -0,0 +1,65 @@
+import re
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from general.factories import PostFactory, UserFactory
+
+
+class ServerTimingTestCase(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        self.url = "/api/posts/"
+        print(self)
+
+    def parse_header(self, response):
+        metrics = {}
+        for metric in response["Server-Timing"].split(", "):
+            name, *params = metric.split(";")
+            metrics[name] = dict(param.split("=", 1) for param in params)
+        return metrics
+
+    def test_header(self):
+        PostFactory.create_batch(3)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path=self.url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        metrics = self.parse_header(response)
+        self.assertListEqual(list(metrics), ["db", "serialize", "render", "total"])
+        self.assertEqual(metrics["db"]["desc"], f'"{len(queries)} queries"')
+        for name in metrics:
+            self.assertRegex(metrics[name]["dur"], r"^\d+\.\d$")
+        self.assertGreater(float(metrics["total"]["dur"]), 0)
+
+    def test_log_line(self):
+        post = PostFactory()
+        with self.assertLogs("general.timing", level="INFO") as logs:
+            self.client.get(path=f"{self.url}{post.pk}/", format="json")
+            self.client.get(path="/api/users/me/", format="json")
+
+        retrieve, me = logs.records
+        self.assertEqual(retrieve.timing["view"], "PostViewSet")
+        self.assertEqual(retrieve.timing["action"], "retrieve")
+        self.assertEqual(retrieve.timing["status"], 200)
+        self.assertEqual(me.timing["view"], "UserViewSet")
+        self.assertEqual(me.timing["action"], "me")
+        self.assertTrue(re.search(r"view=UserViewSet action=me queries=\d+", me.getMessage()))
+
+    def test_error_response(self):
+        self.client.logout()
+        with self.assertLogs("general.timing", level="INFO") as logs:
+            response = self.client.get(path=self.url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("Server-Timing", response)
+        self.assertEqual(logs.records[0].timing["status"], 401)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        response = self.client.get(path=self.url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("Server-Timing", response)
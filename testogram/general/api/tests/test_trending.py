@@ -0,0 +1,133 @@
+import datetime
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from general import trending
+from general.factories import PostFactory, UserFactory
+from general.models import JobRun, Post, Reaction
+
+
+class TrendingScoreTestCase(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        self.post = PostFactory()
+        print(self)
+
+    def score(self):
+        return Post.objects.get(pk=self.post.pk).trending_score
+
+    def test_reactions_and_comments_update_score(self):
+        data = {"post": self.post.pk, "value": Reaction.Values.HEART}
+        self.client.post("/api/reaction/", data, format="json")
+        self.assertEqual(self.score(), settings.TRENDING_REACTION_WEIGHT)
+
+        # смена значения реакции рейтинг не меняет, снятие — вычитает
+        self.client.post("/api/reaction/", {**data, "value": Reaction.Values.SAD}, format="json")
+        self.assertEqual(self.score(), settings.TRENDING_REACTION_WEIGHT)
+        self.client.post("/api/reaction/", {**data, "value": Reaction.Values.SAD}, format="json")
+        self.assertEqual(self.score(), 0)
+
+        response = self.client.post(
+            "/api/comments/", {"post": self.post.pk, "body": "text"}, format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.score(), settings.TRENDING_COMMENT_WEIGHT)
+
+    def test_removed_reaction_after_decay_keeps_score_non_negative(self):
+        data = {"post": self.post.pk, "value": Reaction.Values.HEART}
+        self.client.post("/api/reaction/", data, format="json")
+        Post.objects.filter(pk=self.post.pk).update(trending_score=0.3)
+        self.client.post("/api/reaction/", data, format="json")
+        self.assertEqual(self.score(), 0)
+
+    def test_trending_list(self):
+        posts = PostFactory.create_batch(25)
+        for score, post in enumerate(posts):
+            Post.objects.filter(pk=post.pk).update(trending_score=score % 12)
+        deleted = posts[-1]
+        deleted.soft_delete()
+
+        results, url = [], "/api/posts/?ordering=trending"
+        while url:
+            # без COUNT(*): только страница по курсору
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", response.data)
+            results += [post["id"] for post in response.data["results"]]
+            url = response.data["next"]
+
+        expected = sorted(
+            (post for post in posts[:-1] if Post.objects.get(pk=post.pk).trending_score > 0),
+            key=lambda post: (Post.objects.get(pk=post.pk).trending_score, post.pk),
+            reverse=True,
+        )
+        self.assertEqual(results, [post.pk for post in expected])
+        # у каждого рейтинга по два поста: курсор должен пройти и по равным
+        self.assertEqual(len(results), 22)
+
+    def test_trending_list_uses_index(self):
+        queryset = Post.objects.filter(trending_score__gt=0).order_by("-trending_score", "-id")
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {queryset[:10].query}")
+            plan = " ".join(row[-1] for row in cursor.fetchall())
+        self.assertIn("post_trending_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_unknown_ordering(self):
+        response = self.client.get("/api/posts/?ordering=title")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_default_list_unchanged(self):
+        response = self.client.get("/api/posts/")
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["results"][0]["id"], self.post.pk)
+
+
+class DecayTestCase(TestCase):
+    def setUp(self):
+        self.posts = PostFactory.create_batch(3)
+        for post, score in zip(self.posts, (8, 1, 0)):
+            Post.objects.filter(pk=post.pk).update(trending_score=score)
+        print(self)
+
+    def scores(self):
+        return [post.trending_score for post in Post.objects.order_by("pk")]
+
+    def test_decay_by_elapsed_time(self):
+        self.assertEqual(trending.decay(), 0)
+        self.assertEqual(self.scores(), [8, 1, 0])
+
+        JobRun.objects.filter(name="trending_decay").update(
+            last_run_at=timezone.now()
+            - datetime.timedelta(seconds=2 * settings.TRENDING_HALF_LIFE),
+        )
+        self.assertEqual(trending.decay(batch_size=1), 2)
+        first, second, third = self.scores()
+        self.assertAlmostEqual(first, 2, places=3)
+        self.assertAlmostEqual(second, 0.25, places=3)
+        self.assertEqual(third, 0)
+
+        # до порога TRENDING_MIN_SCORE рейтинг обнуляется
+        JobRun.objects.filter(name="trending_decay").update(
+            last_run_at=timezone.now()
+            - datetime.timedelta(seconds=3 * settings.TRENDING_HALF_LIFE),
+        )
+        trending.decay()
+        first, second, third = self.scores()
+        self.assertAlmostEqual(first, 0.25, places=3)
+        self.assertEqual(second, 0)
+
+    def test_command(self):
+        out = StringIO()
+        call_command("decay_trending", stdout=out)
+        call_command("decay_trending", "--half-life", "1", stdout=out)
+        self.assertIn("decayed 2 posts", out.getvalue())
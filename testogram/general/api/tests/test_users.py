@@ -1,9 +1,20 @@
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth.hashers import check_password
-from general.factories import PostFactory, UserFactory
-from general.models import User
+from general.factories import (
+    ChatFactory,
+    CommentFactory,
+    MessageFactory,
+    PostFactory,
+    ReactionFactory,
+    UserFactory,
+)
+from general.models import Reaction, User
 from django.utils.timezone import make_naive
+import gzip
+import json
+from unittest.mock import patch
+from general.api.views import UserViewSet
 
 class UserTestCase(APITestCase):
     def setUp(self):
@@ -48,7 +59,7 @@ class UserTestCase(APITestCase):
         users = UserFactory.create_batch(5)
         self.user.friends.add(users[-1])
 
-        with self.assertNumQueries(3):
+        with self.assertNumQueries(2):
             response = self.client.get(path=self.url, format="json")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data["results"]), 6)
@@ -96,6 +107,22 @@ class UserTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(User.objects.all().count(), 1)
 
+    def test_try_to_pass_username_of_deleted_user(self):
+        deleted = UserFactory()
+        deleted.soft_delete()
+        self.client.logout()
+        data = {
+            "username": deleted.username,
+            "password": "12345",
+            "email": "test_user_1@gmail.com",
+            "first_name": "John",
+            "last_name": "Smith",
+        }
+
+        response = self.client.post(path=self.url, data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("username", response.data)
+
 
     def test_user_add_friend(self):
         friend = UserFactory()
@@ -299,3 +326,79 @@ class UserTestCase(APITestCase):
         response = self.client.get(path=f'{self.url}me/', format="json")
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    def test_export(self):
+        post = PostFactory(author=self.user)
+        PostFactory()
+        comment = CommentFactory(author=self.user, post=post)
+        reaction = ReactionFactory(author=self.user, post=post, value=Reaction.Values.HEART)
+        companion = UserFactory()
+        chat = ChatFactory(user_1=companion, user_2=self.user)
+        messages = MessageFactory.create_batch(3, author=self.user, chat=chat)
+        MessageFactory(author=companion, chat=chat)
+
+        response = self.client.get(path=f'{self.url}me/export/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertNotIn("Content-Encoding", response)
+
+        lines = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        self.assertListEqual(
+            [(line["type"], line["data"]["id"]) for line in lines],
+            [
+                ("post", post.pk),
+                ("comment", comment.pk),
+                ("reaction", reaction.pk),
+                ("chat", chat.pk),
+            ] + [("message", message.pk) for message in messages],
+        )
+        self.assertDictEqual(
+            lines[0]["data"],
+            {
+                "id": post.pk,
+                "title": post.title,
+                "body": post.body,
+                "created_at": make_naive(post.created_at).strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+        )
+        self.assertEqual(lines[3]["data"]["user_2"], companion.pk)
+        self.assertEqual(lines[4]["data"]["content"], messages[0].content)
+
+    def test_export_chunks(self):
+        # у каждого сообщения из фабрики свой чат: 5 чатов и 5 сообщений
+        MessageFactory.create_batch(5, author=self.user)
+        with patch.object(UserViewSet, "export_chunk_size", 2):
+            response = self.client.get(path=f'{self.url}me/export/')
+            chunks = list(response.streaming_content)
+        self.assertListEqual(
+            [chunk.count(b"\n") for chunk in chunks],
+            [2, 2, 1, 2, 2, 1],
+        )
+
+    def test_export_gzip(self):
+        PostFactory.create_batch(3, author=self.user)
+        response = self.client.get(
+            path=f'{self.url}me/export/', HTTP_ACCEPT_ENCODING="gzip, deflate",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        content = gzip.decompress(b"".join(response.streaming_content))
+        self.assertEqual(
+            [json.loads(line)["type"] for line in content.splitlines()],
+            ["post"] * 3,
+        )
+
+        response = self.client.get(
+            path=f'{self.url}me/export/', HTTP_ACCEPT_ENCODING="gzip;q=0, deflate",
+        )
+        self.assertFalse(response.has_header("Content-Encoding"))
+        content = b"".join(response.streaming_content)
+        self.assertEqual(len(content.splitlines()), 3)
+
+    def test_unauthorized_export(self):
+        self.client.logout()
+        response = self.client.get(path=f'{self.url}me/export/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
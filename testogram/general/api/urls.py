@@ -1,5 +1,5 @@
 from rest_framework.routers import SimpleRouter
-from general.api.views import UserViewSet, PostViewSet, CommentsViewSet, ReactionViewSet, ChatViewSet, MessageViewSet
+from general.api.views import UserViewSet, PostViewSet, CommentsViewSet, ReactionViewSet, ChatViewSet, MessageViewSet, ActivityViewSet, SyncViewSet, BatchViewSet
 
 router = SimpleRouter()
 router.register(r'posts', PostViewSet, basename='posts')
@@ -8,5 +8,8 @@ router.register(r'chats', ChatViewSet, basename='chats')
 router.register(r'messages', MessageViewSet, basename='messages')
 router.register(r'reaction', ReactionViewSet, basename='reaction')
 router.register(r'users', UserViewSet, basename='users')
+router.register(r'activity', ActivityViewSet, basename='activity')
+router.register(r'sync', SyncViewSet, basename='sync')
+router.register(r'batch', BatchViewSet, basename='batch')
 
 urlpatterns = router.urls
\ No newline at end of file
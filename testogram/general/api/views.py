@@ -6,24 +6,73 @@ from general.api.serializers import (UserRegisterationSerializer,
                                      PostRetrieveSerializer,
                                      CommentSerializer,
                                      ReactionSerializer,
+                                     ReactorSerializer,
                                      ChatSerializer,
                                      MessageListSerializer,
                                      ChatListSerializer,
-                                     MessageSerializer)
+                                     MessageSerializer,
+                                     ActivitySerializer,
+                                     SyncPostSerializer,
+                                     SyncCommentSerializer,
+                                     SyncReactionSerializer,
+                                     SyncChatSerializer,
+                                     SyncMessageSerializer,
+                                     BatchSerializer)
 from rest_framework.viewsets import GenericViewSet, ModelViewSet
 from rest_framework.mixins import CreateModelMixin, ListModelMixin, RetrieveModelMixin, DestroyModelMixin
-from general.models import Chat, Message, User, Post, Comment
+from general.models import Activity, Chat, ChatPair, Message, User, Post, Comment, Reaction, SyncChange
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.request import Request
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import F, Case, When, CharField, Value, OuterRef, Subquery, Q
-
-
-class UserViewSet(CreateModelMixin,ListModelMixin,RetrieveModelMixin, GenericViewSet):
+from general import activity, db, sharding, sync, tasks, trending
+from general.counters import post_views
+from general.paginators import ActivityPagination, TrendingCursorPagination
+from general.api import batch
+from general.api.budgets import QueryBudgetMixin
+from general.api.export import export_user_data, gzip_stream
+from general.api.renderers import NDJSONRenderer
+from config.encoding import accepts_encoding
+from general.api.sparse import SparseFieldsMixin
+from django.db.models import OuterRef, Subquery, Q, Count, Exists
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.functional import cached_property
+
+
+class ReplicaReadMixin:
+    replica_actions = ("list", "retrieve")
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions and not db.is_sticky(request):
+            db.read_from_replica()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        db.read_from_replica(False)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class UserViewSet(SparseFieldsMixin, QueryBudgetMixin, ReplicaReadMixin, CreateModelMixin,ListModelMixin,RetrieveModelMixin, GenericViewSet):
     permission_classes = [IsAuthenticated]
+    sparse_actions = ("list", "retrieve", "friends", "me")
+    export_chunk_size = 2000
+    query_budgets = {
+        "list": 3,
+        "retrieve": 5,
+        "create": 3,
+        "me": 4,
+        # запросы выгрузки идут при чтении потока, уже после dispatch, и их
+        # число растёт с объёмом данных
+        "export": None,
+        "friends": 4,
+        "add_friend": 5,
+        "remove_friend": 3,
+    }
 
 
     @action(detail=False, methods=["get"], url_path="me")
@@ -32,6 +81,23 @@ class UserViewSet(CreateModelMixin,ListModelMixin,RetrieveModelMixin, GenericVie
         serializer = self.get_serializer(isinstance)
         return Response(serializer.data)
 
+    @action(detail=False, methods=["get"], url_path="me/export", renderer_classes=[NDJSONRenderer])
+    def export(self, request:Request):
+        stream = export_user_data(
+            request.user,
+            self.get_serializer_context(),
+            self.export_chunk_size,
+        )
+        filename = "export.ndjson"
+        if accepts_encoding(request, "gzip"):
+            response = StreamingHttpResponse(gzip_stream(stream), content_type=NDJSONRenderer.media_type)
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = StreamingHttpResponse(stream, content_type=NDJSONRenderer.media_type)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        response["Vary"] = "Accept-Encoding"
+        return response
+
     def get_serializer_class(self):
         if self.action == 'create':
             return UserRegisterationSerializer
@@ -59,14 +125,23 @@ class UserViewSet(CreateModelMixin,ListModelMixin,RetrieveModelMixin, GenericVie
         return Response(serializer.data)
 
     def get_queryset(self):
-        queryset = User.objects.all().prefetch_related('friends').order_by("-id")
-        # queryset = User.objects.all().order_by("-id")
+        queryset = User.objects.all().order_by("-id")
+        if self.request.user.is_authenticated:
+            queryset = queryset.annotate(is_friend=Exists(
+                User.friends.through.objects.filter(
+                    from_user=OuterRef("pk"),
+                    to_user=self.request.user.pk,
+                )
+            ))
+        if self.action == "retrieve":
+            queryset = queryset.prefetch_related("posts")
         return queryset
 
     @action(detail=True, methods=['post'])
     def add_friend(self,request, pk=None):
         user = self.get_object()
         request.user.friends.add(user)
+        activity.record(user.pk, Activity.Kinds.FRIEND, request.user.pk)
 
         return Response(f'Friend {user} added')
 
@@ -78,47 +153,174 @@ class UserViewSet(CreateModelMixin,ListModelMixin,RetrieveModelMixin, GenericVie
         return Response(f'Friend {user} removed')
 
 
-class PostViewSet(ModelViewSet):
+class PostViewSet(SparseFieldsMixin, QueryBudgetMixin, ReplicaReadMixin, ModelViewSet):
 
-    queryset = Post.objects.all().order_by("-id")
+    queryset = Post.objects.all().select_related("author").order_by("-id")
     permission_classes = [IsAuthenticated,]
+    max_batch_post_ids = 100
+    query_budgets = {
+        "list": 3,
+        "retrieve": 3,
+        "create": 2,
+        "update": 4,
+        "partial_update": 4,
+        "destroy": 5,
+        "reactions": 5,
+        "reactions_batch": 2,
+    }
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == "list" and self.trending:
+            # посты без рейтинга в ленту не попадают и не входят в индекс
+            queryset = queryset.filter(trending_score__gt=0)
+        return queryset
+
+    @cached_property
+    def trending(self):
+        ordering = self.request.query_params.get("ordering")
+        if not ordering:
+            return False
+        if ordering != "trending":
+            raise ValidationError({"ordering": "Поддерживается только ordering=trending."})
+        return True
+
+    @property
+    def paginator(self):
+        if self.action == "list" and self.trending:
+            if not hasattr(self, "_trending_paginator"):
+                self._trending_paginator = TrendingCursorPagination()
+            return self._trending_paginator
+        return super().paginator
 
     def get_serializer_class(self):
         if self.action == 'list':
             return PostListSerializer
         elif self.action == 'retrieve':
             return PostRetrieveSerializer
+        elif self.action == 'reactions':
+            return ReactorSerializer
         return PostCreateUpdateSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        # просмотр копится в памяти и пишется в базу пачкой после ответа
+        post_views.add(instance.pk, request.user.pk)
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
+
+    @staticmethod
+    def count_reactions(post_ids):
+        counts = {
+            post_id: {value: 0 for value in Reaction.Values.values}
+            for post_id in post_ids
+        }
+        rows = Reaction.objects.filter(
+            post_id__in=post_ids,
+            value__isnull=False,
+            author__deleted_at__isnull=True,
+        ).values_list("post_id", "value").annotate(count=Count("id")).order_by()
+        for post_id, value, count in rows:
+            counts[post_id][value] = count
+        return counts
+
+    @action(detail=True, methods=["get"])
+    def reactions(self, request, pk=None):
+        post = self.get_object()
+        counts = self.count_reactions([post.pk])[post.pk]
+        queryset = post.reactions.filter(
+            value__isnull=False,
+            author__deleted_at__isnull=True,
+        ).select_related("author").order_by("-id")
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            response = self.get_paginated_response(serializer.data)
+            response.data["counts"] = counts
+            return response
+
+        serializer = self.get_serializer(queryset, many=True)
+        return Response({"counts": counts, "results": serializer.data})
+
+    @action(detail=False, methods=["get"], url_path="reactions")
+    def reactions_batch(self, request):
+        try:
+            post_ids = {
+                int(post_id)
+                for post_id in request.query_params.get("post_ids", "").split(",")
+                if post_id
+            }
+        except ValueError:
+            raise ValidationError({"post_ids": "Ожидается список id через запятую."})
+        if not post_ids:
+            raise ValidationError({"post_ids": "Передайте хотя бы один id поста."})
+        if len(post_ids) > self.max_batch_post_ids:
+            raise ValidationError(
+                {"post_ids": f"Не больше {self.max_batch_post_ids} постов за запрос."}
+            )
+        return Response(self.count_reactions(sorted(post_ids)))
+
+    def perform_create(self, serializer):
+        post = serializer.save()
+        sync.record(post)
+
     def perform_update(self, serializer):
         instance = self.get_object()
         if instance.author != self.request.user:
             raise PermissionDenied("Вы не являетесь автором этого поста.")
-        serializer.save()
+        post = serializer.save()
+        sync.record(post)
 
     def perform_destroy(self, instance):
         if instance.author != self.request.user:
             raise PermissionDenied("Вы не являетесь автором этого поста.")
-        instance.delete()
-
-
-class CommentsViewSet(CreateModelMixin, DestroyModelMixin, ListModelMixin, GenericViewSet):
-    queryset = Comment.objects.all().order_by('-id')
+        # комментарии и реакции удалит purge_deleted пачками в воркере очереди
+        instance.soft_delete()
+        sync.record(instance, deleted=True)
+        tasks.purge_deleted.enqueue(f"post:{instance.pk}")
+
+
+class CommentsViewSet(SparseFieldsMixin, QueryBudgetMixin, ReplicaReadMixin, CreateModelMixin, DestroyModelMixin, ListModelMixin, GenericViewSet):
+    queryset = Comment.objects.filter(
+        author__deleted_at__isnull=True,
+        post__deleted_at__isnull=True,
+        post__author__deleted_at__isnull=True,
+    ).select_related('author').order_by('-id')
     permission_classes = [IsAuthenticated]
     serializer_class = CommentSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['post__id']
+    query_budgets = {
+        "list": 3,
+        "create": 5,
+        "destroy": 5,
+    }
+
+    def perform_create(self, serializer):
+        comment = serializer.save()
+        trending.bump(comment.post_id, settings.TRENDING_COMMENT_WEIGHT)
+        activity.record(comment.post.author_id, Activity.Kinds.COMMENT, comment.author_id, comment.post_id)
+        sync.record(comment)
 
     def perform_destroy(self, instance):
         if instance.author != self.request.user:
             raise PermissionDenied("Вы не являетесь автором этого комментария.")
-        instance.delete()
+        # после delete() у экземпляра нет pk, поэтому надгробие пишется до
+        # удаления, в одной с ним транзакции
+        with transaction.atomic():
+            sync.record(instance, deleted=True)
+            instance.delete()
 
-class ReactionViewSet(CreateModelMixin, GenericViewSet):
+class ReactionViewSet(QueryBudgetMixin, CreateModelMixin, GenericViewSet):
     permission_classes = [IsAuthenticated,]
     serializer_class = ReactionSerializer
+    query_budgets = {
+        "create": 7,
+    }
 
 class ChatViewSet(
+    QueryBudgetMixin,
+    ReplicaReadMixin,
     CreateModelMixin,
     ListModelMixin,
     DestroyModelMixin,
@@ -126,6 +328,28 @@ class ChatViewSet(
 ):
     permission_classes = [IsAuthenticated]
 
+    query_budgets = {
+        "list": 3,
+        "create": 5,
+        "destroy": 6,
+        "messages": 3,
+    }
+    # на шардах без таблицы пользователей: чаты с удалёнными и attach_users
+    shard_query_budgets = {
+        "list": 2,
+        "destroy": 1,
+        "messages": 1,
+    }
+
+    def perform_create(self, serializer):
+        chat = serializer.save()
+        sync.record(chat)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic(using=sharding.shard_for_chat(instance.pk)):
+            sync.record(instance, deleted=True)
+            instance.delete()
+
     def get_serializer_class(self):
         if self.action == "list":
             return ChatListSerializer
@@ -134,6 +358,32 @@ class ChatViewSet(
         return ChatSerializer
 
     def get_queryset(self):
+        deleted_chats = self.deleted_chats()
+        querysets = [self.shard_queryset(alias, deleted_chats) for alias in sharding.shards()]
+        if sharding.shards() == [DEFAULT_DB_ALIAS]:
+            return querysets[0]
+        return sharding.MergedQuerySet(
+            querysets,
+            key=lambda chat: (chat.last_message_datetime, chat.pk),
+            reverse=True,
+            prepare=sharding.attach_users,
+        )
+
+    def deleted_chats(self):
+        # пользователи и каталог пар живут в основной базе: с других шардов
+        # к ним нет JOIN-а, и чаты с удалёнными собеседниками отсеиваются по
+        # списку id, одному на все шарды. Список — из чатов самого
+        # пользователя, а не всех удалённых, поэтому не растёт с их числом
+        user = self.request.user
+        deleted_chats = ChatPair.objects.filter(
+            Q(user_low=user, user_high__deleted_at__isnull=False)
+            | Q(user_high=user, user_low__deleted_at__isnull=False),
+        ).values("pk")
+        if sharding.shards() == [DEFAULT_DB_ALIAS]:
+            return deleted_chats
+        return list(deleted_chats.values_list("pk", flat=True))
+
+    def shard_queryset(self, alias, deleted_chats):
         user = self.request.user
 
         last_message_subquery = Message.objects.filter(
@@ -142,34 +392,46 @@ class ChatViewSet(
         last_message_content_subquery = Message.objects.filter(
             chat=OuterRef('pk')
         ).order_by('-created_at').values('content')[:1]
-
-        qs = Chat.objects.filter(
+        qs = sharding.on_shard(Chat.objects, alias).filter(
             Q(user_1=user) | Q(user_2=user),
             messages__isnull=False,
+        ).exclude(
+            pk__in=deleted_chats,
         ).annotate(
             last_message_datetime=Subquery(last_message_subquery),
             last_message_content=Subquery(last_message_content_subquery),
-        ).select_related(
-            "user_1",
-            "user_2",
-        ).order_by("-last_message_datetime").distinct()
+        ).order_by("-last_message_datetime", "-pk").distinct()
+        if alias == DEFAULT_DB_ALIAS:
+            qs = qs.select_related("user_1", "user_2")
         return qs
 
+    def get_object(self):
+        try:
+            chat_id = int(self.kwargs["pk"])
+        except ValueError:
+            raise Http404
+        queryset = self.shard_queryset(sharding.shard_for_chat(chat_id), self.deleted_chats())
+        chat = get_object_or_404(queryset, pk=chat_id)
+        sharding.attach_users([chat])
+        self.check_object_permissions(self.request, chat)
+        return chat
+
     @action(detail=True, methods=["get"])
     def messages(self, request, pk=None):
-        messages = self.get_object().messages.filter(chat__id=pk).annotate(
-            message_author=Case(
-                When(author=self.request.user, then=Value("Вы")),
-                default=F("author__first_name"),
-                output_field=CharField(),
+        chat = self.get_object()
+        # авторы сообщений — участники чата, их имена уже есть в chat
+        companion = chat.user_2 if chat.user_1_id == request.user.pk else chat.user_1
+        messages = list(chat.messages.order_by("-created_at"))
+        for message in messages:
+            message.message_author = (
+                "Вы" if message.author_id == request.user.pk else companion.first_name
             )
-        ).order_by("-created_at")
         serializer = self.get_serializer(messages, many=True)
         return Response(serializer.data)
 
 
-
 class MessageViewSet(
+    QueryBudgetMixin,
     CreateModelMixin,
     DestroyModelMixin,
     GenericViewSet,
@@ -177,8 +439,141 @@ class MessageViewSet(
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated]
     queryset = Message.objects.all().order_by("-id")
+    query_budgets = {
+        "create": 5,
+        "destroy": 6,
+    }
+    shard_query_budgets = {
+        "destroy": 1,
+    }
+
+    def perform_create(self, serializer):
+        message = serializer.save()
+        chat = message.chat
+        recipient_id = chat.user_2_id if chat.user_1_id == message.author_id else chat.user_1_id
+        # событие пишется в основную базу отдельно от сообщения на шарде
+        activity.record(recipient_id, Activity.Kinds.MESSAGE, message.author_id, chat.pk)
+        sync.record(message)
+
+    def get_object(self):
+        try:
+            message_id = int(self.kwargs["pk"])
+        except ValueError:
+            raise Http404
+        # id сообщений уникальны на всех шардах, но шард по id не вычислить
+        for alias in sharding.shards():
+            message = sharding.on_shard(self.get_queryset(), alias).filter(pk=message_id).first()
+            if message is not None:
+                self.check_object_permissions(self.request, message)
+                return message
+        raise Http404
 
     def perform_destroy(self, instance):
-        if instance.author != self.request.user:
+        if instance.author_id != self.request.user.pk:
             raise PermissionDenied("Вы не являетесь автором этого сообщения.")
-        instance.delete()
\ No newline at end of file
+        with transaction.atomic(using=sharding.shard_for_chat(instance.chat_id)):
+            sync.record(instance, deleted=True)
+            instance.delete()
+
+
+class ActivityViewSet(QueryBudgetMixin, ReplicaReadMixin, ListModelMixin, GenericViewSet):
+    """
+    Лента уведомлений текущего пользователя (general.activity). Клиент
+    опрашивает её с ?after=<cursor> из прошлого ответа: опрос — один
+    запрос по индексу activity_inbox_idx.
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = ActivitySerializer
+    pagination_class = ActivityPagination
+    # пользователь, если его нет в кэше аутентификации, и сама лента
+    query_budgets = {
+        "list": 2,
+    }
+
+    def get_queryset(self):
+        # события удалённого автора скрыты до очистки, которая снимает его
+        # со склеенных строк (general.deletion)
+        return Activity.objects.filter(
+            Q(actor__isnull=True) | Q(actor__deleted_at__isnull=True),
+            recipient_id=self.request.user.pk,
+        ).select_related("actor")
+
+
+class SyncViewSet(QueryBudgetMixin, ReplicaReadMixin, GenericViewSet):
+    """
+    Дельта-синхронизация (general.sync): ?since=<token> отдаёт изменённые
+    строки и id удалённых после токена и новый токен. Без since — только
+    текущий токен, от которого клиент начнёт после полной загрузки.
+    """
+
+    permission_classes = [IsAuthenticated]
+    # строк журнала с каждой базы за запрос; остальное — следующим запросом
+    page_size = 500
+    kind_serializers = {
+        SyncChange.Kinds.POST: ("posts", SyncPostSerializer),
+        SyncChange.Kinds.COMMENT: ("comments", SyncCommentSerializer),
+        SyncChange.Kinds.REACTION: ("reactions", SyncReactionSerializer),
+        SyncChange.Kinds.CHAT: ("chats", SyncChatSerializer),
+        SyncChange.Kinds.MESSAGE: ("messages", SyncMessageSerializer),
+        SyncChange.Kinds.USER: ("users", None),
+    }
+    # пользователь (если его нет в кэше аутентификации), журнал и по
+    # запросу на каждый вид изменённых строк
+    query_budgets = {
+        "list": 7,
+    }
+    shard_query_budgets = {
+        "list": 3,
+    }
+
+    def list(self, request):
+        since = request.query_params.get("since")
+        if not since:
+            token = sync.encode_token(sync.current_positions())
+            return Response({"token": token, "has_more": False, "changed": {}, "deleted": {}})
+        try:
+            positions = sync.decode_token(since)
+        except ValueError:
+            raise ValidationError({"since": "Неверный токен синхронизации."})
+        changed, deleted, positions, has_more = sync.changes_since(
+            request.user.pk, positions, self.page_size,
+        )
+        context = self.get_serializer_context()
+        return Response({
+            "token": sync.encode_token(positions),
+            "has_more": has_more,
+            "changed": {
+                name: serializer(changed[kind], many=True, context=context).data
+                for kind, (name, serializer) in self.kind_serializers.items()
+                if changed.get(kind)
+            },
+            "deleted": {
+                name: deleted[kind]
+                for kind, (name, serializer) in self.kind_serializers.items()
+                if deleted.get(kind)
+            },
+        })
+
+
+class BatchViewSet(QueryBudgetMixin, GenericViewSet):
+    """
+    Несколько запросов к API за один HTTP-запрос (general.api.batch).
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = BatchSerializer
+    # общего бюджета нет: каждый подзапрос проверяет бюджет своего вьюсета
+    query_budgets = {
+        "create": None,
+    }
+
+    def create(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        responses = batch.run(
+            request,
+            serializer.validated_data["requests"],
+            parallel=serializer.validated_data["parallel"],
+        )
+        return Response({"responses": responses})
@@ -0,0 +1,99 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from general.models import User
+
+
+class UserCache:
+    """
+    Ограниченный LRU-кэш пользователей с TTL по ключу (user_id, jti).
+
+    Кэш живёт в памяти процесса: сигналы сбрасывают его только в текущем
+    процессе, в остальных запись устаревает не позже чем через TTL.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.keys_by_user = {}
+        self.lock = threading.Lock()
+
+    def get(self, user_id, jti):
+        key = (user_id, jti)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+        return copy.copy(user)
+
+    def set(self, user_id, jti, user):
+        key = (user_id, jti)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, copy.copy(user))
+            self.entries.move_to_end(key)
+            self.keys_by_user.setdefault(user_id, set()).add(key)
+            while len(self.entries) > self.max_size:
+                self._remove(next(iter(self.entries)))
+
+    def invalidate(self, user_id):
+        with self.lock:
+            for key in self.keys_by_user.pop(user_id, ()):
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.keys_by_user.clear()
+
+    def _remove(self, key):
+        self.entries.pop(key, None)
+        keys = self.keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.keys_by_user[key[0]]
+
+
+user_cache = UserCache(
+    max_size=settings.JWT_USER_CACHE_SIZE,
+    ttl=settings.JWT_USER_CACHE_TTL,
+)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication, который не делает SELECT пользователя на каждый
+    запрос, а берёт его из user_cache.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        if user_id is None or jti is None:
+            return super().get_user(validated_token)
+
+        user = user_cache.get(user_id, jti)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, jti, user)
+        return user
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(getattr(instance, api_settings.USER_ID_FIELD))
@@ -0,0 +1,63 @@
+"""
+Helpers shared by the benchmark management commands: a throwaway test
+database and a small seeded dataset to drive the API with.
+"""
+
+from contextlib import contextmanager
+
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+@contextmanager
+def temporary_database():
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+
+def authenticated_client(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+    return client
+
+
+def seed_sample(messages=20, posts=20, comments=20):
+    """
+    Returns the user the sample was built for and the GET urls that
+    cover the main list and detail endpoints for them.
+    """
+    from general.factories import (
+        ChatFactory,
+        CommentFactory,
+        MessageFactory,
+        PostFactory,
+        UserFactory,
+    )
+
+    user = UserFactory()
+    user_posts = PostFactory.create_batch(posts, author=user)
+    CommentFactory.create_batch(comments, post=user_posts[0])
+    chat = ChatFactory(user_1=user)
+    MessageFactory.create_batch(messages, chat=chat, author=user)
+
+    urls = [
+        "/api/posts/",
+        f"/api/posts/{user_posts[0].pk}/",
+        "/api/users/",
+        "/api/users/me/",
+        "/api/chats/",
+        f"/api/chats/{chat.pk}/messages/",
+        f"/api/comments/?post__id={user_posts[0].pk}",
+    ]
+    return user, urls
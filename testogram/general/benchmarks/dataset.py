@@ -0,0 +1,60 @@
+"""
+Reproducible benchmark dataset: the same volumes and seed always produce
+the same rows, so runs on different commits are comparable.
+"""
+
+from dataclasses import dataclass, field
+
+from general.models import User
+from general.seeding import BulkSeeder
+
+
+@dataclass
+class Volumes:
+    users: int = 1000
+    friends: int = 5000
+    posts: int = 5000
+    comments: int = 20000
+    reactions: int = 20000
+    chats: int = 500
+    messages: int = 50000
+
+
+@dataclass
+class Dataset:
+    """The user requests are made as, plus ids to build detail urls from."""
+
+    user: User
+    post_ids: list = field(default_factory=list)
+    user_ids: list = field(default_factory=list)
+    chat_ids: list = field(default_factory=list)
+
+
+def seed_dataset(volumes, seed=0):
+    """
+    A tenth of the friendships and chats, and the first post, belong to
+    the benchmark user, so every detail route has something to return.
+    """
+    seeder = BulkSeeder(seed=seed)
+    user_ids = seeder.users(max(volumes.users, 2))
+    me = user_ids[0]
+
+    my_friends = volumes.friends // 10
+    seeder.friendships(my_friends, with_user=me)
+    seeder.friendships(volumes.friends - my_friends)
+
+    post_ids = seeder.posts(1, authors=[me]) + seeder.posts(max(volumes.posts - 1, 0))
+    seeder.comments(volumes.comments)
+    seeder.reactions(volumes.reactions)
+
+    my_chats = seeder.chats(max(volumes.chats // 10, 1), with_user=me)
+    seeder.chats(max(volumes.chats - len(my_chats), 0))
+    # чаты без сообщений API не показывает
+    seeder.messages(volumes.messages, every_chat=True)
+
+    return Dataset(
+        user=User.objects.get(pk=me),
+        post_ids=post_ids,
+        user_ids=user_ids[1:],
+        chat_ids=[chat[0] for chat in my_chats],
+    )
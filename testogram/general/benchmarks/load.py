@@ -0,0 +1,104 @@
+"""
+In-process load driver: runs every GET route of the API router at a fixed
+concurrency and reports latency percentiles, throughput and query counts.
+"""
+
+import statistics
+import threading
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+from django.urls import reverse
+
+from general.api.budgets import QueryCounter
+from general.api.urls import router
+
+
+def get_routes(dataset):
+    """(url name, url) for every GET action registered on the API router."""
+    pks = {
+        "posts": dataset.post_ids[0],
+        "users": dataset.user_ids[0],
+        "chats": dataset.chat_ids[0],
+    }
+    params = {
+        ("posts", "reactions_batch"): "?post_ids=" + ",".join(map(str, dataset.post_ids[:20])),
+        ("comments", "list"): f"?post__id={pks['posts']}",
+    }
+    for prefix, viewset, basename in router.registry:
+        for route in router.get_routes(viewset):
+            action = router.get_method_map(viewset, route.mapping).get("get")
+            if action is None:
+                continue
+            name = route.name.format(basename=basename)
+            kwargs = {"pk": pks[basename]} if route.detail else {}
+            yield name, reverse(name, kwargs=kwargs) + params.get((basename, action), "")
+    # the trending feed is served by its own index and paginator
+    yield "posts-list-trending", reverse("posts-list") + "?ordering=trending"
+
+
+def measure(url, concurrency, requests, make_client):
+    latencies = []
+    queries = []
+    statuses = {}
+    lock = threading.Lock()
+    remaining = iter(range(requests))
+
+    def worker():
+        client = make_client()
+        counter = QueryCounter()
+        thread_latencies = []
+        thread_queries = []
+        thread_statuses = []
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(counter))
+                while True:
+                    with lock:
+                        if next(remaining, None) is None:
+                            break
+                    before = counter.count
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    if response.streaming:
+                        for _ in response.streaming_content:
+                            pass
+                    thread_latencies.append(time.perf_counter() - started)
+                    thread_queries.append(counter.count - before)
+                    thread_statuses.append(response.status_code)
+        finally:
+            connections.close_all()
+        with lock:
+            latencies.extend(thread_latencies)
+            queries.extend(thread_queries)
+            for status in thread_statuses:
+                statuses[status] = statuses.get(status, 0) + 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    if len(latencies) > 1:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        # quantiles() needs two points; a single sample is every percentile
+        p50 = p95 = p99 = latencies[0]
+    return {
+        "url": url,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "statuses": statuses,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(p50 * 1000, 2),
+        "p95_ms": round(p95 * 1000, 2),
+        "p99_ms": round(p99 * 1000, 2),
+        "queries_mean": round(statistics.fmean(queries), 2),
+        "queries_max": max(queries),
+    }
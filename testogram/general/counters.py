@@ -0,0 +1,111 @@
+"""
+Счётчик просмотров постов, буферизованный в памяти процесса.
+
+Открытие поста не пишет в базу: просмотр копится в ViewCounter, а после
+ответа (request_finished) не чаще раза в flush_interval секунд накопленное
+записывается пачкой UPDATE ... SET views = views + n, по одному запросу на
+каждое n. Повторный просмотр того же поста тем же пользователем в пределах
+window секунд не считается. При штатном завершении процесса несброшенный
+остаток записывается из atexit; при аварийном он теряется, что для счётчика
+просмотров допустимо.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import router, transaction
+from django.db.models import F
+from django.dispatch import receiver
+
+from general.models import Post
+
+logger = logging.getLogger("general.counters")
+
+
+class ViewCounter:
+    def __init__(self, window, flush_interval, max_viewers):
+        self.window = window
+        self.flush_interval = flush_interval
+        self.max_viewers = max_viewers
+        self.pending = Counter()
+        # (post_id, viewer_id) -> время, до которого повтор не считается
+        self.viewers = OrderedDict()
+        self.flushed_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add(self, post_id, viewer_id):
+        """Учитывает просмотр; возвращает False для повтора внутри окна."""
+        key = (post_id, viewer_id)
+        now = time.monotonic()
+        with self.lock:
+            expires_at = self.viewers.get(key)
+            if expires_at is not None and expires_at > now:
+                return False
+            self.viewers[key] = now + self.window
+            self.viewers.move_to_end(key)
+            # самые старые записи вытесняются первыми: их окно кончится раньше
+            while len(self.viewers) > self.max_viewers:
+                self.viewers.popitem(last=False)
+            self.pending[post_id] += 1
+        return True
+
+    def clear(self):
+        with self.lock:
+            self.pending.clear()
+            self.viewers.clear()
+
+    def pending_views(self, post_id):
+        with self.lock:
+            return self.pending[post_id]
+
+    def flush_if_due(self):
+        if time.monotonic() - self.flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Записывает накопленные просмотры; возвращает число UPDATE."""
+        with self.lock:
+            pending, self.pending = self.pending, Counter()
+            self.flushed_at = time.monotonic()
+        if not pending:
+            return 0
+        by_count = defaultdict(list)
+        for post_id, count in pending.items():
+            by_count[count].append(post_id)
+        using = router.db_for_write(Post)
+        try:
+            with transaction.atomic(using=using):
+                for count, post_ids in by_count.items():
+                    Post.all_objects.using(using).filter(pk__in=post_ids).update(
+                        views=F("views") + count,
+                    )
+        except Exception:
+            # просмотры возвращаются в буфер и уйдут со следующей записью
+            with self.lock:
+                self.pending.update(pending)
+            logger.exception("failed to flush %d post views", sum(pending.values()))
+            raise
+        return len(by_count)
+
+
+post_views = ViewCounter(
+    window=settings.POST_VIEWS_WINDOW,
+    flush_interval=settings.POST_VIEWS_FLUSH_INTERVAL,
+    max_viewers=settings.POST_VIEWS_MAX_VIEWERS,
+)
+
+atexit.register(post_views.flush)
+
+
+@receiver(request_finished)
+def flush_post_views(sender, **kwargs):
+    try:
+        post_views.flush_if_due()
+    except Exception:
+        # ошибка уже в логе, а ответ отправлен
+        pass
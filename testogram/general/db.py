@@ -0,0 +1,78 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+_read_from_replica = ContextVar("read_from_replica", default=False)
+_wrote = ContextVar("wrote", default=False)
+
+
+# отметка «читать с основной базы» после записи едет у клиента в
+# подписанной куке: её видит любой процесс API без общего хранилища
+STICKY_COOKIE = "db_sticky"
+
+
+def begin_request():
+    return _read_from_replica.set(False), _wrote.set(False)
+
+
+def end_request(tokens):
+    read_token, wrote_token = tokens
+    _read_from_replica.reset(read_token)
+    _wrote.reset(wrote_token)
+
+
+def has_written():
+    return _wrote.get()
+
+
+def mark_sticky(response, user_id):
+    response.set_signed_cookie(
+        STICKY_COOKIE,
+        user_id,
+        salt=STICKY_COOKIE,
+        max_age=settings.DATABASE_REPLICA_STICKY_SECONDS,
+        httponly=True,
+        samesite="Lax",
+    )
+
+
+def is_sticky(request):
+    # подпись не даёт подделать куку, а max_age проверяется по её времени
+    # подписи, а не по сроку, который назначил браузер
+    user_id = request.get_signed_cookie(
+        STICKY_COOKIE,
+        default=None,
+        salt=STICKY_COOKIE,
+        max_age=settings.DATABASE_REPLICA_STICKY_SECONDS,
+    )
+    return user_id is not None and user_id == str(request.user.pk)
+
+
+def read_from_replica(enabled=True):
+    _read_from_replica.set(enabled)
+
+
+class ReplicaRouter:
+    """
+    Чтения, явно разрешённые для реплик, уходят на одну из
+    DATABASE_REPLICAS, всё остальное на основную базу. После первой записи
+    в рамках запроса чтения возвращаются на основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if replicas and _read_from_replica.get() and not _wrote.get():
+            return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
@@ -0,0 +1,176 @@
+"""
+Фоновое удаление мягко удалённых пользователей и постов.
+
+soft_delete() только помечает строку, и менеджер по умолчанию сразу её
+скрывает. Зависимые строки удаляются здесь пачками, каждая пачка — в своей
+короткой транзакции: размер пачки подстраивается так, чтобы блокировка
+записи держалась не дольше DELETION_MAX_LOCK_SECONDS. Каждая таблица
+начинает с маленькой пачки: стоимость строки у таблиц и шардов разная. Каждый шаг удаляет
+то, что осталось, поэтому прерванное удаление продолжается при следующем
+запуске с того же места.
+"""
+
+import logging
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import F, Q
+
+from general import sharding, sync
+from general.models import Activity, Chat, ChatPair, Comment, Message, Post, Reaction, SyncChange, User
+
+logger = logging.getLogger("general.deletion")
+
+
+def log_progress(label, done, total):
+    logger.info("%s: %d/%d", label, done, total)
+
+
+class BatchDeleter:
+    def __init__(
+        self,
+        max_lock_seconds=None,
+        batch_size=50,
+        max_batch_size=10_000,
+        pause=0.0,
+        progress=log_progress,
+    ):
+        if max_lock_seconds is None:
+            max_lock_seconds = settings.DELETION_MAX_LOCK_SECONDS
+        self.max_lock_seconds = max_lock_seconds
+        self.start_batch_size = batch_size
+        self.batch_size = batch_size
+        self.max_batch_size = max_batch_size
+        self.size_limit = max_batch_size
+        self.pause = pause
+        self.progress = progress
+        self.longest_batch = 0.0
+        self.deleted = 0
+
+    def adapt(self, elapsed):
+        # целимся в половину потолка: время пачки скачет, и рост пачки
+        # сразу до потолка заканчивался бы его превышением
+        self.longest_batch = max(self.longest_batch, elapsed)
+        scale = min(2.0, self.max_lock_seconds / 2 / max(elapsed, 1e-6))
+        if elapsed > self.max_lock_seconds:
+            # пачка превысила потолок: до конца таблицы пачки не больше
+            # половины её размера
+            self.size_limit = min(self.size_limit, max(1, self.batch_size // 2))
+            scale = min(scale, 0.5)
+        self.batch_size = max(1, min(self.size_limit, int(self.batch_size * scale)))
+
+    def delete(self, label, queryset, before_delete=None):
+        """
+        Удаляет строки queryset пачками по pk; before_delete(ids)
+        выполняется в транзакции пачки перед удалением.
+        """
+        model = queryset.model
+        # шард, выбранный через on_shard(), сохраняется
+        using = queryset._db or router.db_for_write(model)
+        queryset = queryset.using(using).order_by("pk")
+        total = queryset.count()
+        done = 0
+        # размер, подобранный на другой таблице или шарде, здесь не годится
+        self.batch_size = self.start_batch_size
+        self.size_limit = self.max_batch_size
+        while True:
+            # выборка id — вне транзакции: она не держит блокировку записи,
+            # а её время не зависит от размера пачки и не должно его уменьшать
+            ids = list(queryset.values_list("pk", flat=True)[:self.batch_size])
+            if not ids:
+                break
+            started = time.monotonic()
+            with transaction.atomic(using=using):
+                if before_delete is not None:
+                    before_delete(ids)
+                # зависимые строки к этому моменту уже удалены предыдущими
+                # шагами, так что Collector не каскадирует ничего крупного
+                model._base_manager.using(using).filter(pk__in=ids).delete()
+            self.adapt(time.monotonic() - started)
+            done += len(ids)
+            self.deleted += len(ids)
+            self.progress(label, done, max(total, done))
+            if self.pause:
+                time.sleep(self.pause)
+        return done
+
+
+def decrement_reactions_count(reaction_ids):
+    counts = Counter(
+        Reaction.objects.filter(pk__in=reaction_ids, value__isnull=False)
+        .values_list("post_id", flat=True)
+    )
+    for post_id, count in counts.items():
+        Post.all_objects.filter(pk=post_id).update(reactions_count=F("reactions_count") - count)
+
+
+def purge_post(post_id, deleter):
+    label = f"post {post_id}"
+    deleter.delete(f"{label}: reactions", Reaction.objects.filter(post_id=post_id))
+    deleter.delete(f"{label}: comments", Comment.objects.filter(post_id=post_id))
+    deleter.delete(label, Post.all_objects.filter(pk=post_id))
+
+
+def purge_user(user_id, deleter):
+    label = f"user {user_id}"
+    chats = Q(user_1_id=user_id) | Q(user_2_id=user_id)
+    Friendship = User.friends.through
+
+    # реакции на чужих постах: счётчики этих постов правятся в той же пачке
+    deleter.delete(
+        f"{label}: reactions",
+        Reaction.objects.filter(author_id=user_id).exclude(post__author_id=user_id),
+        before_delete=decrement_reactions_count,
+    )
+    deleter.delete(f"{label}: post reactions", Reaction.objects.filter(post__author_id=user_id))
+    deleter.delete(f"{label}: post comments", Comment.objects.filter(post__author_id=user_id))
+    deleter.delete(f"{label}: comments", Comment.objects.filter(author_id=user_id))
+    deleter.delete(f"{label}: posts", Post.all_objects.filter(author_id=user_id))
+    for alias in sharding.shards():
+        shard_chats = sharding.on_shard(Chat.objects, alias).filter(chats)
+        # два шага вместо OR: каждый идёт по своему индексу
+        deleter.delete(
+            f"{label}: chat messages",
+            sharding.on_shard(Message.objects, alias).filter(chat__in=shard_chats.values("pk")),
+        )
+        deleter.delete(
+            f"{label}: messages",
+            sharding.on_shard(Message.objects, alias).filter(author_id=user_id),
+        )
+        deleter.delete(f"{label}: chats", shard_chats)
+    deleter.delete(
+        f"{label}: chat pairs",
+        ChatPair.objects.filter(Q(user_low_id=user_id) | Q(user_high_id=user_id)),
+    )
+    for alias in sync.aliases():
+        deleter.delete(
+            f"{label}: sync log",
+            sharding.on_shard(SyncChange.objects, alias).filter(audience=user_id),
+        )
+    deleter.delete(f"{label}: activity", Activity.objects.filter(recipient_id=user_id))
+    # склеенные строки остаются за остальными авторами: без его события и
+    # без последнего автора; строки только из его события удаляются
+    Activity.objects.filter(actor_id=user_id, events__gt=1).update(actor=None, events=F("events") - 1)
+    deleter.delete(f"{label}: activity as actor", Activity.objects.filter(actor_id=user_id))
+    deleter.delete(
+        f"{label}: friendships",
+        Friendship.objects.filter(Q(from_user_id=user_id) | Q(to_user_id=user_id)),
+    )
+    deleter.delete(label, User.all_objects.filter(pk=user_id))
+
+
+def purge_deleted(deleter=None):
+    """
+    Удаляет всех мягко удалённых пользователей и посты; возвращает
+    использованный BatchDeleter (число удалённых строк, самая долгая пачка).
+    """
+    deleter = deleter or BatchDeleter()
+    user_ids = User.all_objects.filter(deleted_at__isnull=False).order_by("deleted_at", "pk")
+    for user_id in user_ids.values_list("pk", flat=True):
+        purge_user(user_id, deleter)
+    post_ids = Post.all_objects.filter(deleted_at__isnull=False).order_by("deleted_at", "pk")
+    for post_id in post_ids.values_list("pk", flat=True):
+        purge_post(post_id, deleter)
+    return deleter
@@ -7,7 +7,8 @@ class UserFactory(DjangoModelFactory):
     class Meta:
         model = User
 
-    username = factory.Faker("user_name")
+    # Faker повторяет user_name уже на сотнях пользователей
+    username = factory.Sequence(lambda n: f"user_{n}")
     first_name = factory.Faker("first_name")
     last_name = factory.Faker("last_name")
     email = factory.Faker("email")
@@ -37,6 +38,11 @@ class ReactionFactory(DjangoModelFactory):
     author = factory.SubFactory(UserFactory)
     post = factory.SubFactory(PostFactory)
 
+    @classmethod
+    def _create(cls, model_class, *args, **kwargs):
+        # через toggle, чтобы счётчик реакций поста оставался согласованным
+        return model_class.objects.toggle(*args, **kwargs)
+
 class ChatFactory(DjangoModelFactory):
     class Meta:
         model = Chat
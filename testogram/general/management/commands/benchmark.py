@@ -0,0 +1,76 @@
+import json
+import time
+from dataclasses import asdict, fields
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from config.schema import code_version
+from general.benchmarks import authenticated_client, temporary_database
+from general.benchmarks.dataset import Volumes, seed_dataset
+from general.benchmarks.load import get_routes, measure
+
+
+class Command(BaseCommand):
+    help = (
+        "Засевает временную тестовую базу воспроизводимым набором данных "
+        "заданного объёма, гоняет все GET-маршруты API in-process клиентом "
+        "на заданных уровнях конкурентности и печатает JSON с p50/p95/p99, "
+        "пропускной способностью и числом запросов к БД. Для сравнения "
+        "коммитов запускать с TESTOGRAM_ENV=prod и одинаковыми параметрами."
+    )
+
+    def add_arguments(self, parser):
+        for volume in fields(Volumes):
+            parser.add_argument(f"--{volume.name}", type=int, default=volume.default)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--concurrency", default="1,4,16")
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--warmup", type=int, default=10)
+        parser.add_argument("--route", action="append", default=[],
+                            help="Только маршруты с этим именем (можно несколько раз).")
+        parser.add_argument("--output", help="Файл для JSON вместо stdout.")
+
+    def handle(self, *args, **options):
+        if options["requests"] < 2:
+            raise CommandError("--requests должно быть не меньше 2, иначе перцентили не посчитать.")
+        if options["warmup"] < 0:
+            raise CommandError("--warmup не может быть отрицательным.")
+        with temporary_database():
+            report = self.run(options)
+        content = json.dumps(report, indent=2, ensure_ascii=False)
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                output.write(content + "\n")
+        else:
+            self.stdout.write(content)
+
+    def run(self, options):
+        volumes = Volumes(**{volume.name: options[volume.name] for volume in fields(Volumes)})
+        started = time.perf_counter()
+        dataset = seed_dataset(volumes, seed=options["seed"])
+        seed_seconds = time.perf_counter() - started
+
+        def make_client():
+            return authenticated_client(dataset.user)
+
+        routes = [
+            (name, url) for name, url in get_routes(dataset)
+            if not options["route"] or name in options["route"]
+        ]
+        results = []
+        for name, url in routes:
+            if options["warmup"]:
+                measure(url, 1, options["warmup"], make_client)
+            for concurrency in map(int, options["concurrency"].split(",")):
+                result = measure(url, concurrency, options["requests"], make_client)
+                results.append({"route": name, **result})
+
+        return {
+            "code_version": code_version(),
+            "debug": settings.DEBUG,
+            "seed": options["seed"],
+            "volumes": asdict(volumes),
+            "seed_seconds": round(seed_seconds, 2),
+            "results": results,
+        }
@@ -0,0 +1,18 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from config.schema import code_version, generate_schema, schema_path
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует OpenAPI-схему для текущей версии кода и сохраняет её в "
+        "SCHEMA_CACHE_DIR, чтобы /api/schema/ не строил её при запросах."
+    )
+
+    def handle(self, *args, **options):
+        path = schema_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(generate_schema(), ensure_ascii=False))
+        self.stdout.write(f"{code_version()}: {path}")
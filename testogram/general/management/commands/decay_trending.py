@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from general import trending
+
+
+class Command(BaseCommand):
+    help = (
+        "Старит рейтинги ленты ?ordering=trending на время, прошедшее с "
+        "прошлого запуска, и обнуляет слишком малые. Запускать раз в "
+        "несколько минут из cron или с --loop отдельным процессом."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--half-life", type=float,
+                            help="Период полураспада в секундах, по умолчанию TRENDING_HALF_LIFE.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--pause-ms", type=float, default=0,
+                            help="Пауза между пачками, чтобы пропустить других писателей.")
+        parser.add_argument("--loop", action="store_true")
+        parser.add_argument("--interval", type=float, default=300.0)
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            changed = trending.decay(
+                half_life=options["half_life"],
+                batch_size=options["batch_size"],
+                pause=options["pause_ms"] / 1000,
+            )
+            self.stdout.write(f"decayed {changed} posts in {time.perf_counter() - started:.2f}s")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,71 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from general.benchmarks import authenticated_client, temporary_database
+from general.models import User
+from general.seeding import BulkSeeder
+
+
+class Command(BaseCommand):
+    help = (
+        "Засевает во временную тестовую базу пользователя с заданным числом "
+        "сообщений и выгружает его данные через /api/users/me/export/: "
+        "печатает время, объём ответа и пик памяти Python во время выгрузки."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=1_000_000)
+        parser.add_argument("--chats", type=int, default=100)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--gzip", action="store_true")
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            self.run(options)
+
+    def run(self, options):
+        started = time.perf_counter()
+        user = self.seed(options)
+        self.stdout.write(
+            f"seeded messages={options['messages']} "
+            f"seconds={time.perf_counter() - started:.1f}"
+        )
+
+        client = authenticated_client(user)
+        headers = {"HTTP_ACCEPT_ENCODING": "gzip"} if options["gzip"] else {}
+
+        started = time.perf_counter()
+        size = self.export(client, headers)
+        elapsed = time.perf_counter() - started
+
+        # отдельный проход: tracemalloc сам замедляет выгрузку в разы
+        tracemalloc.start()
+        self.export(client, headers)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f"gzip={options['gzip']} "
+            f"seconds={elapsed:.1f} "
+            f"rows_per_second={options['messages'] / elapsed:.0f} "
+            f"size_mb={size / 2**20:.1f} "
+            f"peak_memory_mb={peak / 2**20:.1f}"
+        )
+
+    def seed(self, options):
+        seeder = BulkSeeder(batch_size=options["batch_size"])
+        (user_id,) = seeder.users(1)
+        seeder.users(options["chats"])
+        chats = seeder.chats(options["chats"], with_user=user_id)
+        seeder.messages(options["messages"], chats=chats, authors=[user_id])
+        return User.objects.get(pk=user_id)
+
+    def export(self, client, headers):
+        response = client.get("/api/users/me/export/", **headers)
+        assert response.status_code == 200, response.status_code
+        size = 0
+        for chunk in response.streaming_content:
+            size += len(chunk)
+        return size
@@ -0,0 +1,55 @@
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Импортирует модуль в новом интерпретаторе с -X importtime и печатает "
+        "самые дорогие по суммарному времени импорты."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "target",
+            nargs="?",
+            default="config.wsgi",
+            help="Что импортировать, например config.wsgi или config.urls.",
+        )
+        parser.add_argument("--top", type=int, default=25)
+
+    def handle(self, *args, **options):
+        code = (
+            "import django; django.setup()"
+            if options["target"] == "django"
+            else f"import django; django.setup(); import {options['target']}"
+        )
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode:
+            # строки -X importtime перемешаны с трейсбеком, оставляем только его
+            error = "\n".join(
+                line for line in result.stderr.splitlines() if not line.startswith("import time:")
+            )
+            raise CommandError(f"Импорт {options['target']} завершился с ошибкой:\n{error}")
+
+        rows = []
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+
+        total = sum(self_us for _, self_us, _ in rows)
+        self.stdout.write(
+            f"{options['target']}: {len(rows)} modules, {total / 1000:.1f} ms"
+        )
+        self.stdout.write(f"{'cumulative ms':>14} {'self ms':>8}  module")
+        for cumulative_us, self_us, name in sorted(rows, reverse=True)[:options["top"]]:
+            self.stdout.write(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>8.1f}  {name}")
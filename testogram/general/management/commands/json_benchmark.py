@@ -0,0 +1,48 @@
+import io
+import timeit
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from general.api.parsers import FastJSONParser
+from general.api.renderers import FastJSONRenderer
+from general.benchmarks import authenticated_client, seed_sample, temporary_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает JSONRenderer/JSONParser из DRF с FastJSONRenderer/"
+        "FastJSONParser на ответах реальных эндпоинтов и проверяет, что вывод "
+        "совпадает байт в байт."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=1000)
+        parser.add_argument("--number", type=int, default=200)
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            user, urls = seed_sample(messages=options["messages"])
+            client = authenticated_client(user)
+            payloads = {url: client.get(url).data for url in urls}
+
+        self.stdout.write(
+            f"{'endpoint':<40} {'bytes':>8} {'render x':>9} {'parse x':>8}"
+        )
+        for url, data in payloads.items():
+            expected = JSONRenderer().render(data)
+            rendered = FastJSONRenderer().render(data)
+            assert rendered == expected, url
+
+            render_std = self.time(lambda: JSONRenderer().render(data), options)
+            render_fast = self.time(lambda: FastJSONRenderer().render(data), options)
+            parse_std = self.time(lambda: JSONParser().parse(io.BytesIO(expected)), options)
+            parse_fast = self.time(lambda: FastJSONParser().parse(io.BytesIO(expected)), options)
+            self.stdout.write(
+                f"{url:<40} {len(expected):>8} "
+                f"{render_std / render_fast:>8.1f}x {parse_std / parse_fast:>7.1f}x"
+            )
+
+    def time(self, func, options):
+        return min(timeit.repeat(func, number=options["number"], repeat=3))
@@ -0,0 +1,52 @@
+import gzip
+import io
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from general.api.parsers import FastJSONParser, MessagePackParser
+from general.api.renderers import FastJSONRenderer, MessagePackRenderer
+from general.benchmarks import authenticated_client, seed_sample, temporary_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает размер (сырой и gzip) и время кодирования/декодирования "
+        "ответов реальных эндпоинтов в JSON и MessagePack."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=1000)
+        parser.add_argument("--number", type=int, default=200)
+
+    def handle(self, *args, **options):
+        formats = {
+            "application/json": (FastJSONRenderer(), FastJSONParser()),
+            "application/msgpack": (MessagePackRenderer(), MessagePackParser()),
+        }
+        with temporary_database():
+            user, urls = seed_sample(messages=options["messages"])
+            client = authenticated_client(user)
+            payloads = {
+                (url, media_type): client.get(url, HTTP_ACCEPT=media_type).data
+                for url in urls
+                for media_type in formats
+            }
+
+        self.stdout.write(
+            f"{'endpoint':<32} {'format':<20} {'bytes':>8} {'gzip':>7} "
+            f"{'encode us':>10} {'decode us':>10}"
+        )
+        for (url, media_type), data in payloads.items():
+            renderer, parser = formats[media_type]
+            content = renderer.render(data)
+            encode = self.time(lambda: renderer.render(data), options)
+            decode = self.time(lambda: parser.parse(io.BytesIO(content)), options)
+            self.stdout.write(
+                f"{url:<32} {media_type:<20} {len(content):>8} "
+                f"{len(gzip.compress(content)):>7} {encode:>10.1f} {decode:>10.1f}"
+            )
+
+    def time(self, func, options):
+        best = min(timeit.repeat(func, number=options["number"], repeat=3))
+        return best / options["number"] * 1_000_000
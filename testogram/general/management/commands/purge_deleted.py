@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from general.deletion import BatchDeleter, purge_deleted
+
+
+class Command(BaseCommand):
+    help = (
+        "Пачками удаляет мягко удалённых пользователей и посты вместе с "
+        "зависимыми строками. Можно прервать и запустить снова: удаление "
+        "продолжится с того же места. Обычно его запускает задача "
+        "general.purge_deleted в run_tasks; с --loop команда работает "
+        "как отдельный фоновый процесс."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-lock-ms", type=float,
+                            help="Потолок транзакции пачки, по умолчанию DELETION_MAX_LOCK_SECONDS.")
+        parser.add_argument("--pause-ms", type=float, default=0,
+                            help="Пауза между пачками, чтобы пропустить других писателей.")
+        parser.add_argument("--loop", action="store_true")
+        parser.add_argument("--interval", type=float, default=10.0)
+
+    def handle(self, *args, **options):
+        while True:
+            deleter = BatchDeleter(
+                max_lock_seconds=(
+                    options["max_lock_ms"] / 1000 if options["max_lock_ms"] is not None else None
+                ),
+                pause=options["pause_ms"] / 1000,
+                progress=self.progress,
+            )
+            started = time.perf_counter()
+            purge_deleted(deleter)
+            if deleter.deleted:
+                self.stdout.write(
+                    f"deleted {deleter.deleted} rows in {time.perf_counter() - started:.1f}s, "
+                    f"longest batch {deleter.longest_batch * 1000:.1f}ms"
+                )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+    def progress(self, label, done, total):
+        self.stdout.write(f"{label}: {done}/{total}")
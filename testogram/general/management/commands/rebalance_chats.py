@@ -0,0 +1,43 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from general import sharding
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит чаты с сообщениями на шарды, которые им назначает текущий "
+        "CHAT_SHARDS. Запускать после изменения числа шардов; с --from "
+        "дополнительно освобождает алиасы, которых больше нет в CHAT_SHARDS "
+        "(например, default при переходе на отдельные файлы). Пока чат не "
+        "перенесён, его сообщения на новом шарде видны не полностью."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="sources", action="append", default=[],
+                            help="Алиас базы, с которой нужно забрать все чаты.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Только посчитать чаты, которые нужно перенести.")
+
+    def handle(self, *args, **options):
+        unknown = [alias for alias in options["sources"] if alias not in connections]
+        if unknown:
+            raise CommandError(f"Нет баз {', '.join(unknown)} в DATABASES.")
+
+        sources = list(dict.fromkeys([*sharding.shards(), *options["sources"]]))
+        for source in sources:
+            chats = Counter()
+            messages = Counter()
+            for chat_id, target in sharding.misplaced_chats(source, options["batch_size"]):
+                chats[target] += 1
+                if not options["dry_run"]:
+                    messages[target] += sharding.move_chat(
+                        chat_id, source, target, options["batch_size"],
+                    )
+            for target in sorted(chats):
+                self.stdout.write(
+                    f"{source} -> {target}: {chats[target]} chats, {messages[target]} messages"
+                )
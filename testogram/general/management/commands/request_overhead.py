@@ -0,0 +1,54 @@
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from general.benchmarks import authenticated_client, seed_sample, temporary_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Гоняет запросы к API во временной тестовой базе и печатает среднее "
+        "время запроса и прирост памяти для текущих настроек. Запускать с "
+        "TESTOGRAM_ENV=dev и TESTOGRAM_ENV=prod и сравнивать."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--warmup", type=int, default=100)
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            self.run(options)
+
+    def run(self, options):
+        user, urls = seed_sample()
+        client = authenticated_client(user)
+
+        for i in range(options["warmup"]):
+            client.get(urls[i % len(urls)])
+
+        started = time.perf_counter()
+        self.drive(client, urls, options["requests"])
+        elapsed = time.perf_counter() - started
+
+        # отдельный проход: tracemalloc сам замедляет запросы в разы
+        tracemalloc.start()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        self.drive(client, urls, options["requests"])
+        memory_after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f"DEBUG={settings.DEBUG} "
+            f"requests={options['requests']} "
+            f"per_request_ms={elapsed / options['requests'] * 1000:.3f} "
+            f"memory_growth_kb={(memory_after - memory_before) / 1024:.0f}"
+        )
+
+    def drive(self, client, urls, count):
+        for i in range(count):
+            url = urls[i % len(urls)]
+            response = client.get(url)
+            assert response.status_code == 200, (url, response.status_code)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from general.queue import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Воркер очереди фоновых задач (general.queue): забирает готовые "
+        "задачи из базы и выполняет их в пуле потоков."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--interval", type=float, default=1.0,
+                            help="Пауза между опросами пустой очереди, в секундах.")
+        parser.add_argument("--once", action="store_true",
+                            help="Выполнить готовые задачи и выйти.")
+
+    def handle(self, *args, **options):
+        worker = Worker(threads=options["threads"], batch_size=options["batch_size"])
+        if not options["once"]:
+            worker.run(interval=options["interval"])
+            return
+        try:
+            done = 0
+            while count := worker.run_once():
+                done += count
+        finally:
+            worker.shutdown()
+        self.stdout.write(f"tasks: {done}")
@@ -0,0 +1,53 @@
+import time
+from dataclasses import fields
+
+from django.core.management.base import BaseCommand
+
+from general.benchmarks.dataset import Volumes
+from general.seeding import BulkSeeder
+
+
+class Command(BaseCommand):
+    help = (
+        "Массово заполняет текущую базу через BulkSeeder и печатает скорость "
+        "записи по таблицам. Новые строки ссылаются и на уже существующих "
+        "пользователей, посты и чаты."
+    )
+
+    def add_arguments(self, parser):
+        for volume in fields(Volumes):
+            parser.add_argument(f"--{volume.name}", type=int, default=0)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        seeder = BulkSeeder(seed=options["seed"], batch_size=options["batch_size"])
+        methods = {
+            "users": seeder.users,
+            "friends": seeder.friendships,
+            "posts": seeder.posts,
+            "comments": seeder.comments,
+            "reactions": seeder.reactions,
+            "chats": seeder.chats,
+            "messages": seeder.messages,
+        }
+        total_rows = 0
+        total_seconds = 0.0
+        for volume in fields(Volumes):
+            count = options[volume.name]
+            if not count:
+                continue
+            started = time.perf_counter()
+            rows = len(methods[volume.name](count))
+            if volume.name == "friends":
+                # пара друзей — две строки, по одной на направление
+                rows *= 2
+            elapsed = time.perf_counter() - started
+            total_rows += rows
+            total_seconds += elapsed
+            self.stdout.write(
+                f"{volume.name:>9}: {rows:>9} rows in {elapsed:6.2f}s "
+                f"({rows / elapsed:,.0f} rows/s)"
+            )
+        if total_seconds:
+            self.stdout.write(f"{'total':>9}: {total_rows:>9} rows ({total_rows / total_seconds:,.0f} rows/s)")
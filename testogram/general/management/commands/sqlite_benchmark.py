@@ -0,0 +1,138 @@
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает пропускную способность SQLite при конкурентных чтениях и "
+        "записях: настройки по умолчанию с новым соединением на каждый запрос "
+        "против продакшен-профиля (WAL, прагмы, постоянные соединения)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument("--seconds", type=float, default=5.0)
+        parser.add_argument("--rows", type=int, default=50_000)
+
+    def handle(self, *args, **options):
+        profiles = (
+            ("default", "", False, "BEGIN"),
+            (
+                "production",
+                settings.SQLITE_PRODUCTION_OPTIONS["init_command"],
+                True,
+                "BEGIN IMMEDIATE",
+            ),
+        )
+        for name, init_command, persistent, begin in profiles:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = Path(tmp) / "bench.sqlite3"
+                self.seed(path, init_command, options["rows"])
+                result = self.run_profile(
+                    path, init_command, persistent, begin, options
+                )
+            self.stdout.write(
+                f"{name:>10}: reads {result['reads']:>8.0f}/s  "
+                f"writes {result['writes']:>7.0f}/s  "
+                f"errors {result['errors']}"
+            )
+
+    def connect(self, path, init_command):
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+        if init_command:
+            conn.executescript(init_command)
+        return conn
+
+    def seed(self, path, init_command, rows):
+        conn = self.connect(path, init_command)
+        conn.execute(
+            "CREATE TABLE message ("
+            "id INTEGER PRIMARY KEY, chat_id INTEGER NOT NULL, "
+            "content TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX message_chat ON message (chat_id, created_at)")
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT INTO message (chat_id, content, created_at) VALUES (?, ?, ?)",
+            (
+                (i % 1000, "x" * random.randint(20, 200), time.time())
+                for i in range(rows)
+            ),
+        )
+        conn.execute("COMMIT")
+        conn.close()
+
+    def run_profile(self, path, init_command, persistent, begin, options):
+        counters = {"reads": 0, "writes": 0, "errors": 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options["seconds"]
+
+        def worker(operation):
+            conn = self.connect(path, init_command) if persistent else None
+            done = errors = 0
+            while time.perf_counter() < deadline:
+                current = conn or self.connect(path, init_command)
+                try:
+                    operation(current)
+                    done += 1
+                except sqlite3.OperationalError:
+                    errors += 1
+                finally:
+                    if not persistent:
+                        current.close()
+            if conn:
+                conn.close()
+            return done, errors
+
+        def read(conn):
+            conn.execute(
+                "SELECT id, content, created_at FROM message "
+                "WHERE chat_id = ? ORDER BY created_at DESC LIMIT 20",
+                (random.randrange(1000),),
+            ).fetchall()
+
+        def write(conn):
+            conn.execute(begin)
+            try:
+                conn.execute(
+                    "INSERT INTO message (chat_id, content, created_at) "
+                    "VALUES (?, ?, ?)",
+                    (random.randrange(1000), "new message", time.time()),
+                )
+                conn.execute("COMMIT")
+            except sqlite3.OperationalError:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+        def run(kind, operation):
+            done, errors = worker(operation)
+            with lock:
+                counters[kind] += done
+                counters["errors"] += errors
+
+        threads = [
+            threading.Thread(target=run, args=("reads", read))
+            for _ in range(options["readers"])
+        ] + [
+            threading.Thread(target=run, args=("writes", write))
+            for _ in range(options["writers"])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return {
+            "reads": counters["reads"] / options["seconds"],
+            "writes": counters["writes"] / options["seconds"],
+            "errors": counters["errors"],
+        }
@@ -0,0 +1,93 @@
+import logging
+import random
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from general import db, timing
+
+logger = logging.getLogger("general.timing")
+
+
+class ServerTimingMiddleware:
+    """
+    Для доли запросов SERVER_TIMING_SAMPLE_RATE добавляет заголовок
+    Server-Timing (БД, сериализация, рендеринг, всего) и пишет ту же
+    разбивку в лог general.timing с вьюсетом и действием.
+
+    Время БД входит и в время сериализации, если запросы делает сериализатор.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        timings = timing.Timings()
+        token = timing.activate(timings)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            timing.deactivate(token)
+        timings.finish()
+
+        response["Server-Timing"] = timings.header()
+        fields = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            **timings.as_dict(),
+        }
+        logger.info(
+            " ".join(f"{key}={value}" for key, value in fields.items()),
+            extra={"timing": fields},
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = timing.current()
+        if timings is None:
+            return None
+        cls = getattr(view_func, "cls", None)
+        timings.view = cls.__name__ if cls is not None else view_func.__name__
+        method = request.method.lower()
+        actions = getattr(view_func, "actions", None) or {}
+        timings.action = actions.get(method, method)
+        return None
+
+    def process_template_response(self, request, response):
+        # рендерим здесь, чтобы замерить; повторный render() у Django — no-op
+        timings = timing.current()
+        if timings is not None:
+            with timings.measure("render"):
+                response.render()
+        return response
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Сбрасывает маршрутизацию БД в начале запроса и, если запрос что-то
+    записал, на DATABASE_REPLICA_STICKY_SECONDS направляет чтения
+    пользователя на основную базу, чтобы он видел свои изменения: ответ
+    на запись ставит подписанную куку db.STICKY_COOKIE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        tokens = db.begin_request()
+        try:
+            response = self.get_response(request)
+            user = getattr(request, "user", None)
+            if db.has_written() and user is not None and user.is_authenticated:
+                db.mark_sticky(response, user.pk)
+        finally:
+            db.end_request(tokens)
+        return response
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.15 on 2026-10-19 13:58
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_reactions_count(apps, schema_editor):
+    Post = apps.get_model('general', 'Post')
+    Reaction = apps.get_model('general', 'Reaction')
+    counts = Reaction.objects.filter(
+        post=OuterRef('pk'),
+        value__isnull=False,
+    ).values('post').annotate(count=Count('id')).values('count')
+    Post.objects.update(reactions_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('general', '0002_message_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='reactions_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_reactions_count, migrations.RunPython.noop),
+    ]
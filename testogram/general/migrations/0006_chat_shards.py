@@ -0,0 +1,73 @@
+# Generated by Django 5.1.15 on 2026-10-19 15:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models, router
+from django.db.models import Max
+
+
+def fill_directory(apps, schema_editor):
+    """Существующие чаты попадают в каталог пар под своими id."""
+    alias = schema_editor.connection.alias
+    Chat = apps.get_model("general", "Chat")
+    ChatPair = apps.get_model("general", "ChatPair")
+    IdSequence = apps.get_model("general", "IdSequence")
+    Message = apps.get_model("general", "Message")
+    if not router.allow_migrate_model(alias, IdSequence):
+        return
+    last_message = 0
+    # до включения шардов чаты и сообщения живут в основной базе
+    if router.allow_migrate_model(alias, Chat):
+        ChatPair.objects.using(alias).bulk_create(
+            [
+                ChatPair(id=pk, user_low_id=min(user_1, user_2), user_high_id=max(user_1, user_2))
+                for pk, user_1, user_2 in Chat.objects.using(alias).values_list("id", "user_1_id", "user_2_id")
+            ],
+            batch_size=1000,
+        )
+        last_message = Message.objects.using(alias).aggregate(last=Max("id"))["last"] or 0
+    IdSequence.objects.using(alias).create(name="message", value=last_message)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('general', '0005_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdSequence',
+            fields=[
+                ('name', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='chat',
+            name='user_1',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='chats_as_user1', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='chat',
+            name='user_2',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='chats_as_user2', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='author',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='messages', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='ChatPair',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_high', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user_low', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(models.F('user_low'), models.F('user_high'), name='chat_pair_unique')],
+            },
+        ),
+        migrations.RunPython(fill_directory, migrations.RunPython.noop),
+    ]
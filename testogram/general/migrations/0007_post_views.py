@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-19 15:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('general', '0006_chat_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='views',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
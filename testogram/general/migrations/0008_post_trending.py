@@ -0,0 +1,29 @@
+# Generated by Django 5.1.15 on 2026-10-19 15:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('general', '0007_post_views'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobRun',
+            fields=[
+                ('name', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('last_run_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='trending_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(models.F('deleted_at'), models.OrderBy(models.F('trending_score'), descending=True), models.OrderBy(models.F('id'), descending=True), condition=models.Q(('trending_score__gt', 0)), name='post_trending_idx'),
+        ),
+    ]
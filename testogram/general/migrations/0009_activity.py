@@ -0,0 +1,32 @@
+# Generated by Django 5.1.15 on 2026-10-19 15:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('general', '0008_post_trending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Activity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('comment', 'Комментарий к посту'), ('reaction', 'Реакция на пост'), ('friend', 'Добавление в друзья'), ('message', 'Сообщение в чате')], max_length=8)),
+                ('target_id', models.BigIntegerField(default=0)),
+                ('count', models.PositiveIntegerField(default=1)),
+                ('seq', models.BigIntegerField(unique=True)),
+                ('updated_at', models.DateTimeField()),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activities', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['recipient', 'seq'], name='activity_inbox_idx')],
+                'constraints': [models.UniqueConstraint(models.F('recipient'), models.F('kind'), models.F('target_id'), name='activity_target_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.15 on 2026-10-19 15:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('general', '0009_activity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.BigIntegerField(unique=True)),
+                ('kind', models.CharField(choices=[('post', 'Пост'), ('comment', 'Комментарий'), ('reaction', 'Реакция'), ('chat', 'Чат'), ('message', 'Сообщение'), ('user', 'Пользователь')], max_length=8)),
+                ('object_id', models.BigIntegerField()),
+                ('audience', models.BigIntegerField(default=0)),
+                ('deleted', models.BooleanField(default=False)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['audience', 'seq'], name='sync_change_audience_idx')],
+                'constraints': [models.UniqueConstraint(models.F('kind'), models.F('object_id'), models.F('audience'), name='sync_change_object_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('general', '0010_sync_change'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='activity',
+            old_name='count',
+            new_name='events',
+        ),
+        migrations.AlterField(
+            model_name='activity',
+            name='actor',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
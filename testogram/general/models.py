@@ -1,6 +1,30 @@
-from django.db import models
-from django.contrib.auth.models import AbstractUser
-from django.db.models import UniqueConstraint, F, functions
+import threading
+
+from django.db import connections, models, router, transaction
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.conf import settings
+from django.db.models import UniqueConstraint, F, Q, functions
+from django.utils import timezone
+
+
+class AliveUserManager(UserManager):
+    """
+    Менеджер по умолчанию без мягко удалённых пользователей: они сразу
+    пропадают из API, аутентификации и связанных выборок, а строки
+    удаляет general.deletion.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class AlivePostManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(
+            deleted_at__isnull=True,
+            author__deleted_at__isnull=True,
+        )
+
 
 class User(AbstractUser):
     friends = models.ManyToManyField(
@@ -8,6 +32,15 @@ class User(AbstractUser):
         symmetrical=True,
         blank=True,
     )
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    objects = AliveUserManager()
+    all_objects = UserManager()
+
+    def soft_delete(self):
+        self.deleted_at = timezone.now()
+        self.is_active = False
+        self.save(update_fields=["deleted_at", "is_active"])
 
 class Post(models.Model):
     author = models.ForeignKey(
@@ -18,10 +51,36 @@ class Post(models.Model):
     title = models.CharField(max_length=64)
     body = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    reactions_count = models.PositiveIntegerField(default=0)
+    # пишется пачками из буфера general.counters
+    views = models.PositiveBigIntegerField(default=0)
+    # см. general.trending
+    trending_score = models.FloatField(default=0)
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    objects = AlivePostManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            # deleted_at IS NULL — условие равенства по первому столбцу,
+            # иначе SQLite выбирает индекс deleted_at и сортирует отдельно
+            models.Index(
+                "deleted_at",
+                F("trending_score").desc(),
+                F("id").desc(),
+                name="post_trending_idx",
+                condition=Q(trending_score__gt=0),
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    def soft_delete(self):
+        self.deleted_at = timezone.now()
+        Post.all_objects.filter(pk=self.pk).update(deleted_at=self.deleted_at)
+
 class Comment(models.Model):
     body = models.TextField()
     author = models.ForeignKey(
@@ -39,6 +98,73 @@ class Comment(models.Model):
     def __str__(self):
         return self.body
 
+class ReactionManager(models.Manager):
+    def toggle(self, author, post, value):
+        """
+        Ставит реакцию или снимает её, если она совпадает с текущей.
+
+        Переключение выполняется одним upsert-запросом, а счётчик реакций
+        и рейтинг поста (general.trending) обновляются в той же транзакции
+        до него, пока старое значение ещё видно.
+        """
+        using = router.db_for_write(self.model)
+        weight = settings.TRENDING_REACTION_WEIGHT
+        reaction_table = self.model._meta.db_table
+        post_table = Post._meta.db_table
+        with transaction.atomic(using=using):
+            with connections[using].cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    UPDATE {post_table}
+                    SET (reactions_count, trending_score) = (
+                        SELECT
+                            reactions_count + delta,
+                            -- рейтинг успел состариться и не уходит ниже нуля
+                            CASE WHEN trending_score + delta * %s > 0
+                                THEN trending_score + delta * %s ELSE 0 END
+                        FROM (
+                            SELECT
+                                CASE WHEN %s IS NOT NULL
+                                    AND (old.value IS NULL OR old.value <> %s)
+                                    THEN 1 ELSE 0 END
+                                - CASE WHEN old.value IS NOT NULL THEN 1 ELSE 0 END
+                                AS delta
+                            FROM (
+                                SELECT (
+                                    SELECT value FROM {reaction_table}
+                                    WHERE author_id = %s AND post_id = %s
+                                ) AS value
+                            ) AS old
+                        ) AS change
+                    )
+                    WHERE id = %s
+                    """,
+                    [weight, weight, value, value, author.pk, post.pk, post.pk],
+                )
+                cursor.execute(
+                    f"""
+                    INSERT INTO {reaction_table} (author_id, post_id, value)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (author_id, post_id) DO UPDATE SET value =
+                        CASE WHEN {reaction_table}.value = excluded.value
+                        THEN NULL ELSE excluded.value END
+                    RETURNING id, value
+                    """,
+                    [author.pk, post.pk, value],
+                )
+                pk, new_value = cursor.fetchone()
+
+        reaction = self.model(pk=pk, post=post, value=new_value)
+        # author может быть TokenUser из токена, а не пользователем из БД
+        if isinstance(author, User):
+            reaction.author = author
+        else:
+            reaction.author_id = author.pk
+        reaction._state.adding = False
+        reaction._state.db = using
+        return reaction
+
+
 class Reaction(models.Model):
     class Values(models.TextChoices):
         SMILE = "smile", "Улыбка"
@@ -59,6 +185,8 @@ class Reaction(models.Model):
         related_name="reactions",
     )
 
+    objects = ReactionManager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -68,17 +196,36 @@ class Reaction(models.Model):
             ),
         ]
 
+class ShardedQuerySet(models.QuerySet):
+    def create(self, **kwargs):
+        if self._db is not None:
+            return super().create(**kwargs)
+        # без явного using шард выбирает роутер по сохраняемому экземпляру,
+        # а не по подсказкам queryset, в которых экземпляра ещё нет
+        obj = self.model(**kwargs)
+        obj.save(force_insert=True)
+        return obj
+
+
 class Chat(models.Model):
+    # чат может жить на шарде без таблицы пользователей (general.sharding):
+    # без ограничения в БД и без каскада, чаты удалённого пользователя
+    # удаляет general.deletion
     user_1 = models.ForeignKey(
         to=User,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
         related_name="chats_as_user1",
     )
     user_2 = models.ForeignKey(
         to=User,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
         related_name="chats_as_user2",
     )
+
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         constraints = [
             UniqueConstraint(
@@ -88,12 +235,117 @@ class Chat(models.Model):
             ),
         ]
 
+    def save(self, *args, **kwargs):
+        if self.pk is None:
+            # id выдаёт каталог пар в основной базе, по id выбирается шард
+            self.pk = ChatPair.objects.create(
+                user_low_id=min(self.user_1_id, self.user_2_id),
+                user_high_id=max(self.user_1_id, self.user_2_id),
+            ).pk
+            kwargs["force_insert"] = True
+        super().save(*args, **kwargs)
+
+
+class ChatPair(models.Model):
+    """
+    Каталог чатов в основной базе: выдаёт id новым чатам и не даёт завести
+    второй чат той же пары пользователей на другом шарде.
+    """
+
+    user_low = models.ForeignKey(to=User, on_delete=models.CASCADE, related_name="+")
+    user_high = models.ForeignKey(to=User, on_delete=models.CASCADE, related_name="+")
+
+    class Meta:
+        constraints = [
+            UniqueConstraint("user_low", "user_high", name="chat_pair_unique"),
+        ]
+
+
+class IdSequenceManager(models.Manager):
+    def reserve(self, name, count):
+        """Резервирует count id подряд и возвращает первый из них."""
+        using = router.db_for_write(self.model)
+        table = self.model._meta.db_table
+        # UPDATE ... RETURNING атомарен сам по себе: значение, записанное
+        # этим запросом, не перепишет конкурент между UPDATE и SELECT
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET value = value + %s WHERE name = %s RETURNING value",
+                [count, name],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            self.using(using).bulk_create([self.model(name=name)], ignore_conflicts=True)
+            return self.reserve(name, count)
+        return row[0] - count + 1
+
+
+class IdSequence(models.Model):
+    """Счётчики id в основной базе для строк, которые пишутся на разные шарды."""
+
+    name = models.CharField(max_length=32, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    objects = IdSequenceManager()
+
+
+class IdBlocks:
+    """
+    Выдаёт id из блоков по block_size, зарезервированных в IdSequence
+    (hi/lo): одна запись в основную базу на блок, а не на строку.
+
+    Резерв пишется в транзакции вызывающего кода и откатывается вместе с
+    ней, поэтому блок свой у каждого потока (соединения) и годится, только
+    пока его резерв зафиксирован или ещё ждёт фиксации: блок из откаченной
+    транзакции выдал бы id, которые зарезервирует кто-то другой.
+    """
+
+    def __init__(self, name, block_size=1000):
+        self.name = name
+        self.block_size = block_size
+        self.local = threading.local()
+
+    def available(self, connection):
+        """Есть ли у потока свободные id в блоке, резерв которого не откачен."""
+        local = self.local
+        if getattr(local, "next_id", 1) > getattr(local, "last_id", 0):
+            return False
+        # откат транзакции или точки сохранения убирает из run_on_commit
+        # всё, что было зарегистрировано внутри неё
+        return local.committed or any(func is local.marker for _, func, _ in connection.run_on_commit)
+
+    def __call__(self):
+        using = router.db_for_write(IdSequence)
+        if not self.available(connections[using]):
+            self.reserve(using)
+        value = self.local.next_id
+        self.local.next_id += 1
+        return value
+
+    def reserve(self, using):
+        local = self.local
+        local.next_id = IdSequence.objects.reserve(self.name, self.block_size)
+        local.last_id = local.next_id + self.block_size - 1
+        local.committed = False
+
+        def marker():
+            if local.marker is marker:
+                local.committed = True
+
+        local.marker = marker
+        # вне транзакции вызывается сразу
+        transaction.on_commit(marker, using=using)
+
+
+message_ids = IdBlocks("message")
+
 
 class Message(models.Model):
     content = models.TextField()
     author = models.ForeignKey(
         to=User,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
         related_name="messages",
     )
     chat = models.ForeignKey(
@@ -102,3 +354,160 @@ class Message(models.Model):
         related_name="messages",
     )
     created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ShardedQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        if self.pk is None:
+            # id уникален на всех шардах и не меняется при переносе чата
+            self.pk = message_ids()
+            kwargs["force_insert"] = True
+        super().save(*args, **kwargs)
+
+
+class Activity(models.Model):
+    """
+    Событие ленты уведомлений пользователя (general.activity). Однотипные
+    события об одном объекте склеиваются в одну строку со счётчиком событий.
+    """
+
+    class Kinds(models.TextChoices):
+        COMMENT = "comment", "Комментарий к посту"
+        REACTION = "reaction", "Реакция на пост"
+        FRIEND = "friend", "Добавление в друзья"
+        MESSAGE = "message", "Сообщение в чате"
+
+    recipient = models.ForeignKey(
+        to=User,
+        on_delete=models.CASCADE,
+        related_name="activities",
+    )
+    kind = models.CharField(max_length=8, choices=Kinds.choices)
+    # id поста для комментариев и реакций, чата — для сообщений, 0 — для друзей
+    target_id = models.BigIntegerField(default=0)
+    # последний из склеенных авторов события; пусто, если он удалён, а
+    # строка склеивает и события других авторов
+    actor = models.ForeignKey(
+        to=User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="+",
+    )
+    # число склеенных событий, а не людей: один автор может дать несколько
+    events = models.PositiveIntegerField(default=1)
+    # курсор опроса: растёт при каждом новом или склеенном событии
+    seq = models.BigIntegerField(unique=True)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                "recipient",
+                "kind",
+                "target_id",
+                name="activity_target_unique",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["recipient", "seq"], name="activity_inbox_idx"),
+        ]
+
+
+class SyncChangeManager(models.Manager):
+    def log(self, using, entries):
+        """
+        Отмечает в журнале базы using изменения entries — кортежи
+        (kind, object_id, audience, deleted) — одним upsert-запросом.
+        """
+        if not entries:
+            return
+        table = self.model._meta.db_table
+        # seq берётся как MAX(seq) + n в том же запросе: записи в базу SQLite
+        # идут по одной, поэтому seq растёт в порядке фиксации и изменение не
+        # окажется позади уже выданного клиенту курсора
+        rows = ", ".join(
+            f"(%s, %s, %s, %s, (SELECT COALESCE(MAX(seq), 0) FROM {table}) + {number})"
+            for number in range(1, len(entries) + 1)
+        )
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (kind, object_id, audience, deleted, seq)
+                VALUES {rows}
+                ON CONFLICT (kind, object_id, audience) DO UPDATE SET
+                    seq = excluded.seq,
+                    deleted = excluded.deleted
+                """,
+                [value for entry in entries for value in entry],
+            )
+
+
+class SyncChange(models.Model):
+    """
+    Журнал изменений для /api/sync/ (general.sync): последняя запись или
+    удаление объекта. Есть в каждой базе, где живут синхронизируемые
+    строки, — в основной и на шардах чатов.
+    """
+
+    class Kinds(models.TextChoices):
+        POST = "post", "Пост"
+        COMMENT = "comment", "Комментарий"
+        REACTION = "reaction", "Реакция"
+        CHAT = "chat", "Чат"
+        MESSAGE = "message", "Сообщение"
+        USER = "user", "Пользователь"
+
+    # растёт с каждой записью в журнал этой базы; курсор синхронизации
+    seq = models.BigIntegerField(unique=True)
+    kind = models.CharField(max_length=8, choices=Kinds.choices)
+    object_id = models.BigIntegerField()
+    # кому видно изменение: id пользователя или 0 — всем
+    audience = models.BigIntegerField(default=0)
+    deleted = models.BooleanField(default=False)
+
+    objects = SyncChangeManager()
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                "kind",
+                "object_id",
+                "audience",
+                name="sync_change_object_unique",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["audience", "seq"], name="sync_change_audience_idx"),
+        ]
+
+
+class JobRun(models.Model):
+    """Время последнего прохода периодического задания, например general.trending.decay."""
+
+    name = models.CharField(max_length=64, primary_key=True)
+    last_run_at = models.DateTimeField()
+
+
+class Task(models.Model):
+    """Фоновая задача очереди general.queue; выполненные задачи удаляются."""
+
+    class Statuses(models.TextChoices):
+        PENDING = "pending", "В очереди"
+        FAILED = "failed", "Ошибка"
+
+    name = models.CharField(max_length=128)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=8, choices=Statuses.choices, default=Statuses.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_at"], name="task_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk}"
@@ -0,0 +1,136 @@
+import hashlib
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+
+
+def estimate_count(queryset):
+    """
+    Оценка числа строк таблицы по статистике БД (sqlite_stat1 после
+    ANALYZE, pg_class.reltuples) или None, если оценки нет.
+    """
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+            )
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+            row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator для больших таблиц в админке: до exact_count_limit строк
+    считает точно, но COUNT(*) ограничен LIMIT-ом; больше — берёт оценку
+    по статистике БД для выборки без фильтров, иначе точный COUNT(*)
+    один раз на count_cache_timeout секунд для каждого запроса.
+    """
+
+    exact_count_limit = 10_000
+    count_cache_timeout = 300
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, "query"):
+            return super().count
+
+        # values("pk"): аннотации страницы (подзапросы-счётчики) в COUNT не нужны
+        bounded = queryset.order_by().values("pk")[:self.exact_count_limit + 1].count()
+        if bounded <= self.exact_count_limit:
+            return bounded
+
+        sql, params = queryset.order_by().query.sql_with_params()
+        key = "admin-count:" + hashlib.sha1(repr((queryset.db, sql, params)).encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            # фильтр менеджера по умолчанию (мягкое удаление) оценку не отменяет
+            unfiltered = queryset.model._default_manager.using(queryset.db).all()
+            if queryset.query.where == unfiltered.query.where:
+                count = estimate_count(queryset)
+            if count is None:
+                count = queryset.count()
+            # оценка может отставать от таблицы, но страниц не меньше, чем видно
+            count = max(count, bounded)
+            cache.set(key, count, self.count_cache_timeout)
+        return count
+
+
+class TrendingCursorPagination(CursorPagination):
+    """
+    Курсор по (trending_score, id) для ленты ?ordering=trending: страница —
+    диапазон по индексу post_trending_idx без OFFSET по всей ленте. Старение
+    рейтингов между запросами может сдвинуть посты относительно курсора.
+    """
+
+    ordering = ("-trending_score", "-id")
+
+
+class ActivityPagination(BasePagination):
+    """
+    Опрос ленты уведомлений по seq. Без ?after= — последние page_size
+    событий, с ?after=<cursor> — события новее курсора. Ответ отдаёт cursor
+    для следующего опроса и has_more, если новых событий больше страницы.
+    Страница — один диапазонный запрос, без COUNT(*).
+    """
+
+    page_size = 50
+    cursor_query_param = "after"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        after = request.query_params.get(self.cursor_query_param)
+        if after is None:
+            rows = list(queryset.order_by("-seq")[:self.page_size])[::-1]
+            self.has_more = False
+        else:
+            try:
+                after = int(after)
+            except ValueError:
+                raise ValidationError({self.cursor_query_param: "Ожидается целое число."})
+            rows = list(queryset.filter(seq__gt=after).order_by("seq")[:self.page_size + 1])
+            self.has_more = len(rows) > self.page_size
+            rows = rows[:self.page_size]
+        self.cursor = rows[-1].seq if rows else after or 0
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            "cursor": self.cursor,
+            "has_more": self.has_more,
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["cursor", "has_more", "results"],
+            "properties": {
+                "cursor": {"type": "integer"},
+                "has_more": {"type": "boolean"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            "name": self.cursor_query_param,
+            "required": False,
+            "in": "query",
+            "description": "cursor из предыдущего ответа",
+            "schema": {"type": "integer"},
+        }]
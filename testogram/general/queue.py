@@ -0,0 +1,210 @@
+"""
+Очередь фоновых задач в основной базе, без внешнего брокера.
+
+enqueue() пишет задачу только после коммита текущей транзакции
+(transaction.on_commit): откаченный запрос задач не оставляет, а воркер не
+увидит задачу раньше данных, которые она обрабатывает. Команда run_tasks
+забирает готовые задачи, выполняет их в пуле потоков и удаляет
+выполненные; упавшие повторяются с экспоненциальной задержкой, пока не
+кончатся попытки, после чего остаются в базе со статусом failed.
+
+Задачи объявляются декоратором task в модулях <app>.tasks. Задачи с
+batch=True принимают по одному аргументу на enqueue, а воркер выполняет все
+готовые задачи такого типа одним вызовом со списком аргументов.
+"""
+
+import datetime
+import json
+import logging
+import time
+import traceback
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.db import DatabaseError, connections, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from general.models import Task
+
+logger = logging.getLogger("general.queue")
+
+registry = {}
+
+
+class TaskFunction:
+    def __init__(self, func, name, batch, max_attempts, retry_delay):
+        self.func = func
+        self.name = name
+        self.batch = batch
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def __repr__(self):
+        return f"<TaskFunction {self.name}>"
+
+    def enqueue(self, *args, **kwargs):
+        if self.batch and (len(args) != 1 or kwargs):
+            raise TypeError(f"Пакетная задача {self.name} принимает ровно один аргумент.")
+        enqueue(self.name, *args, **kwargs)
+
+    def execute(self, tasks):
+        if self.batch:
+            self.func([task.payload["args"][0] for task in tasks])
+        else:
+            (task,) = tasks
+            self.func(*task.payload["args"], **task.payload["kwargs"])
+
+    def retry_at(self, attempts):
+        delay = self.retry_delay * 2 ** (attempts - 1)
+        return timezone.now() + datetime.timedelta(seconds=delay)
+
+
+def task(name=None, batch=False, max_attempts=5, retry_delay=10):
+    """
+    Регистрирует функцию как задачу очереди под именем name (по умолчанию
+    module.function). retry_delay — задержка перед первым повтором в
+    секундах, дальше она удваивается.
+    """
+    def decorator(func):
+        function = TaskFunction(
+            func,
+            name or f"{func.__module__}.{func.__name__}",
+            batch,
+            max_attempts,
+            retry_delay,
+        )
+        registry[function.name] = function
+        return function
+    return decorator
+
+
+def enqueue(name, *args, **kwargs):
+    payload = {"args": list(args), "kwargs": kwargs}
+    # ошибка сериализации должна случиться здесь, а не в on_commit после ответа
+    json.dumps(payload)
+    using = router.db_for_write(Task)
+    transaction.on_commit(
+        lambda: Task.objects.using(using).create(name=name, payload=payload),
+        using=using,
+    )
+
+
+class Worker:
+    """
+    Забирает до batch_size готовых задач, выполняет их в пуле из threads
+    потоков и записывает результат. Задача, которую воркер не завершил за
+    lease секунд (например, процесс убит), снова становится готовой.
+    """
+
+    def __init__(self, threads=4, batch_size=100, lease=300, using=None):
+        self.batch_size = batch_size
+        self.lease = lease
+        self.using = using or router.db_for_write(Task)
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix="task")
+        autodiscover_modules("tasks")
+
+    def claim(self):
+        now = timezone.now()
+        tasks = Task.objects.using(self.using)
+        # на SQLite конкурирующий воркер не захватит те же задачи: его UPDATE
+        # после чужой записи получит SQLITE_BUSY, а не перезапишет захват
+        with transaction.atomic(using=self.using):
+            claimed = list(
+                tasks.select_for_update(skip_locked=True)
+                .filter(status=Task.Statuses.PENDING, run_at__lte=now)
+                .filter(Q(locked_until__isnull=True) | Q(locked_until__lt=now))
+                .order_by("run_at", "pk")[:self.batch_size]
+            )
+            tasks.filter(pk__in=[task.pk for task in claimed]).update(
+                locked_until=now + datetime.timedelta(seconds=self.lease),
+            )
+        return claimed
+
+    def groups(self, claimed):
+        by_name = defaultdict(list)
+        for task in claimed:
+            by_name[task.name].append(task)
+        for name, tasks in by_name.items():
+            function = registry.get(name)
+            if function is None or function.batch:
+                yield function, tasks
+            else:
+                for task in tasks:
+                    yield function, [task]
+
+    def execute(self, function, tasks):
+        if function is None:
+            raise LookupError(f"Задача {tasks[0].name} не зарегистрирована.")
+        try:
+            function.execute(tasks)
+        finally:
+            # соединения этого потока; следующая задача откроет свои
+            connections.close_all()
+
+    def run_once(self):
+        """Выполняет одну порцию готовых задач; возвращает их число."""
+        claimed = self.claim()
+        futures = {
+            self.executor.submit(self.execute, function, tasks): (function, tasks)
+            for function, tasks in self.groups(claimed)
+        }
+        wait(futures)
+        done = []
+        for future, (function, tasks) in futures.items():
+            error = future.exception()
+            if error is None:
+                done += [task.pk for task in tasks]
+            else:
+                self.fail(function, tasks, error)
+        if done:
+            Task.objects.using(self.using).filter(pk__in=done).delete()
+        return len(claimed)
+
+    def fail(self, function, tasks, error):
+        message = "".join(traceback.format_exception(error))
+        for task in tasks:
+            task.attempts += 1
+            task.last_error = message
+            task.locked_until = None
+            if function is None or task.attempts >= function.max_attempts:
+                task.status = Task.Statuses.FAILED
+                logger.error("task %s failed: %s", task, error)
+            else:
+                task.run_at = function.retry_at(task.attempts)
+                logger.warning("task %s will be retried: %s", task, error)
+        Task.objects.using(self.using).bulk_update(
+            tasks, ["attempts", "last_error", "locked_until", "status", "run_at"],
+        )
+
+    def run(self, interval=1.0, max_backoff=60.0):
+        """
+        Выполняет задачи, пока не прервут; без задач ждёт interval секунд.
+
+        Ошибка базы (на SQLite с несколькими писателями — обычное «database
+        is locked») не останавливает воркер: порция повторяется с
+        нарастающей паузой. Задачи, захваченные упавшей порцией, снова
+        станут готовыми по истечении lease.
+        """
+        errors = 0
+        try:
+            while True:
+                try:
+                    count = self.run_once()
+                except DatabaseError:
+                    logger.exception("task batch failed")
+                    errors += 1
+                    time.sleep(min(interval * 2 ** (errors - 1), max_backoff))
+                    continue
+                errors = 0
+                if not count:
+                    time.sleep(interval)
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,268 @@
+"""
+Массовое заполнение базы для бенчмарков и больших наборов данных.
+
+Фабрики из general.factories создают объекты по одному через ORM, а
+MessageFactory ещё и новый чат с пользователем на каждое сообщение. Здесь
+тексты берутся из заранее сгенерированного Faker-пула, строки собираются
+пачками через random.choices по пулам уже созданных пользователей, постов и
+чатов и пишутся одним executemany на пачку.
+"""
+
+import datetime
+import random
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Max
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+from faker import Faker
+
+from general import sharding
+from general.models import Chat, ChatPair, Comment, IdSequence, Message, Post, Reaction, User
+
+
+class BulkSeeder:
+    def __init__(self, seed=0, batch_size=10_000, using=None, text_pool_size=1000):
+        self.rng = random.Random(seed)
+        self.faker = Faker()
+        self.faker.seed_instance(seed)
+        self.batch_size = batch_size
+        self.using = using or router.db_for_write(User)
+        self.text_pool_size = text_pool_size
+        self._texts = {}
+        self.user_pool = []
+        self.post_pool = []
+        self.chat_pool = []
+        # время created_at растёт от строки к строке, как при обычной записи
+        self.clock = timezone.now().astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+    # пулы
+
+    def texts(self, kind):
+        """Пул из text_pool_size значений Faker-провайдера kind."""
+        if kind not in self._texts:
+            provider = getattr(self.faker, kind)
+            self._texts[kind] = [provider() for _ in range(self.text_pool_size)]
+        return self._texts[kind]
+
+    def choices(self, kind, count):
+        return self.rng.choices(self.texts(kind), k=count)
+
+    def pool(self, name, model, fields, aliases=None):
+        pool = getattr(self, name)
+        if not pool:
+            for alias in aliases or [self.using]:
+                pool.extend(model.objects.using(alias).values_list(*fields, flat=len(fields) == 1))
+        if not pool:
+            raise ValueError(f"Нет строк {model._meta.label} для пула {name}.")
+        return pool
+
+    def timestamps(self, count):
+        # наивные datetime в UTC, как их хранит Django при USE_TZ; без
+        # adapt_datetimefield_value на каждую строку, его цена заметна
+        start = self.clock
+        self.clock += datetime.timedelta(milliseconds=count)
+        step = datetime.timedelta(milliseconds=1)
+        return [start + step * i for i in range(count)]
+
+    # запись
+
+    def insert(self, model, fields, rows, ignore_conflicts=False, using=None):
+        """
+        Пишет rows пачками по batch_size и возвращает id новых строк по
+        порядку вставки.
+        """
+        using = using or self.using
+        connection = connections[using]
+        qn = connection.ops.quote_name
+        table = qn(model._meta.db_table)
+        columns = [model._meta.get_field(name).column for name in fields]
+        on_conflict = OnConflict.IGNORE if ignore_conflicts else None
+        sql = "%s %s (%s) VALUES (%s) %s" % (
+            connection.ops.insert_statement(on_conflict=on_conflict),
+            table,
+            ", ".join(map(qn, columns)),
+            ", ".join(["%s"] * len(columns)),
+            connection.ops.on_conflict_suffix_sql(
+                [model._meta.get_field(name) for name in fields], on_conflict, None, None,
+            ),
+        )
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+            (last_id,) = cursor.fetchone()
+            for start in range(0, len(rows), self.batch_size):
+                cursor.executemany(sql, rows[start:start + self.batch_size])
+            cursor.execute(f"SELECT id FROM {table} WHERE id > %s ORDER BY id", [last_id])
+            return [row[0] for row in cursor.fetchall()]
+
+    def pairs(self, ids, count, with_id=None):
+        """До count различных неупорядоченных пар из ids (с with_id в каждой)."""
+        if with_id is not None:
+            others = [other for other in ids if other != with_id]
+            return [(with_id, other) for other in self.rng.sample(others, min(count, len(others)))]
+        limit = min(count, len(ids) * (len(ids) - 1) // 2)
+        pairs = {}
+        while len(pairs) < limit:
+            for a, b in zip(self.rng.choices(ids, k=limit), self.rng.choices(ids, k=limit)):
+                if a != b:
+                    pairs.setdefault((min(a, b), max(a, b)), (a, b))
+        return list(pairs.values())[:limit]
+
+    # модели
+
+    def users(self, count):
+        first_names = self.choices("first_name", count)
+        last_names = self.choices("last_name", count)
+        emails = self.choices("email", count)
+        joined = self.timestamps(count)
+        # уникальность username обеспечивает номер после последнего id, а не Faker
+        start = (User.objects.using(self.using).aggregate(last=Max("id"))["last"] or 0) + 1
+        rows = [
+            # пароль "!" — неиспользуемый, как у set_unusable_password()
+            ("!", f"seed_{start + i}", first_names[i], last_names[i], emails[i],
+             False, False, True, joined[i])
+            for i in range(count)
+        ]
+        ids = self.insert(User, (
+            "password", "username", "first_name", "last_name", "email",
+            "is_superuser", "is_staff", "is_active", "date_joined",
+        ), rows)
+        self.user_pool.extend(ids)
+        return ids
+
+    def friendships(self, count, users=None, with_user=None):
+        users = users or self.pool("user_pool", User, ("id",))
+        pairs = self.pairs(users, count, with_id=with_user)
+        # связь симметричная: в таблице по строке на каждое направление
+        rows = [row for a, b in pairs for row in ((a, b), (b, a))]
+        self.insert(User.friends.through, ("from_user", "to_user"), rows, ignore_conflicts=True)
+        return pairs
+
+    def posts(self, count, authors=None):
+        authors = authors or self.pool("user_pool", User, ("id",))
+        titles = self.choices("sentence", count)
+        bodies = self.choices("text", count)
+        created = self.timestamps(count)
+        rows = [
+            (author, titles[i][:64], bodies[i], created[i], 0, 0, 0)
+            for i, author in enumerate(self.rng.choices(authors, k=count))
+        ]
+        fields = ("author", "title", "body", "created_at", "reactions_count", "views", "trending_score")
+        ids = self.insert(Post, fields, rows)
+        self.post_pool.extend(ids)
+        return ids
+
+    def comments(self, count, posts=None, authors=None):
+        posts = posts or self.pool("post_pool", Post, ("id",))
+        authors = authors or self.pool("user_pool", User, ("id",))
+        bodies = self.choices("text", count)
+        created = self.timestamps(count)
+        rows = list(zip(
+            bodies,
+            self.rng.choices(authors, k=count),
+            self.rng.choices(posts, k=count),
+            created,
+        ))
+        ids = self.insert(Comment, ("body", "author", "post", "created_at"), rows)
+        counts = Counter(post for _, _, post, _ in rows)
+        table = connections[self.using].ops.quote_name(Post._meta.db_table)
+        with connections[self.using].cursor() as cursor:
+            cursor.executemany(
+                f"UPDATE {table} SET trending_score = trending_score + %s WHERE id = %s",
+                [
+                    (counts[post_id] * settings.TRENDING_COMMENT_WEIGHT, post_id)
+                    for post_id in sorted(counts)
+                ],
+            )
+        return ids
+
+    def reactions(self, count, posts=None, authors=None):
+        posts = posts or self.pool("post_pool", Post, ("id",))
+        authors = authors or self.pool("user_pool", User, ("id",))
+        limit = min(count, len(posts) * len(authors))
+        pairs = {}
+        while len(pairs) < limit:
+            pairs.update(dict.fromkeys(
+                zip(self.rng.choices(authors, k=limit), self.rng.choices(posts, k=limit))
+            ))
+        pairs = list(pairs)[:limit]
+        values = self.rng.choices(Reaction.Values.values, k=len(pairs))
+        rows = [(author, post, value) for (author, post), value in zip(pairs, values)]
+        ids = self.insert(Reaction, ("author", "post", "value"), rows, ignore_conflicts=True)
+        self.update_reactions_count(ids)
+        return ids
+
+    def update_reactions_count(self, reaction_ids):
+        if not reaction_ids:
+            return
+        counts = Counter(
+            Reaction.objects.using(self.using)
+            .filter(id__gte=reaction_ids[0], id__lte=reaction_ids[-1], value__isnull=False)
+            .values_list("post_id", flat=True)
+        )
+        table = connections[self.using].ops.quote_name(Post._meta.db_table)
+        with connections[self.using].cursor() as cursor:
+            cursor.executemany(
+                f"UPDATE {table} SET reactions_count = reactions_count + %s, "
+                f"trending_score = trending_score + %s WHERE id = %s",
+                [
+                    (counts[post_id], counts[post_id] * settings.TRENDING_REACTION_WEIGHT, post_id)
+                    for post_id in sorted(counts)
+                ],
+            )
+
+    def chats(self, count, users=None, with_user=None):
+        users = users or self.pool("user_pool", User, ("id",))
+        pairs = self.pairs(users, count, with_id=with_user)
+        # id выдаёт каталог пар (см. Chat.save), повторные пары он отбрасывает
+        ids = self.insert(ChatPair, ("user_low", "user_high"), [
+            (min(a, b), max(a, b)) for a, b in pairs
+        ], ignore_conflicts=True)
+        oriented = {(min(a, b), max(a, b)): (a, b) for a, b in pairs}
+        chats = [
+            (pk, *oriented[low, high])
+            for pk, low, high in ChatPair.objects.using(self.using)
+            .filter(id__in=ids).order_by("id").values_list("id", "user_low_id", "user_high_id")
+        ] if ids else []
+        for alias, rows in self.by_shard(chats, key=lambda chat: chat[0]).items():
+            self.insert(Chat, ("id", "user_1", "user_2"), rows, using=alias)
+        self.chat_pool.extend(chats)
+        return chats
+
+    def messages(self, count, chats=None, authors=None, every_chat=False):
+        """
+        chats — кортежи (id, user_1_id, user_2_id), как их возвращает
+        chats(); автор по умолчанию — случайный участник чата. С every_chat
+        первые сообщения идут по одному в каждый чат пула.
+        """
+        chats = chats or self.pool(
+            "chat_pool", Chat, ("id", "user_1_id", "user_2_id"), aliases=sharding.shards(),
+        )
+        covered = chats[:count] if every_chat else []
+        picked = covered + self.rng.choices(chats, k=count - len(covered))
+        if authors:
+            author_ids = self.rng.choices(authors, k=count)
+        else:
+            sides = self.rng.choices((1, 2), k=count)
+            author_ids = [chat[side] for chat, side in zip(picked, sides)]
+        contents = self.choices("sentence", count)
+        created = self.timestamps(count)
+        # id сообщений общие для всех шардов, как у Message.save()
+        first_id = IdSequence.objects.reserve("message", count)
+        rows = [
+            (first_id + i, contents[i], author_ids[i], chat[0], created[i])
+            for i, chat in enumerate(picked)
+        ]
+        ids = []
+        for alias, shard_rows in self.by_shard(rows, key=lambda row: row[3]).items():
+            self.insert(Message, ("id", "content", "author", "chat", "created_at"), shard_rows, using=alias)
+            ids += [row[0] for row in shard_rows]
+        return sorted(ids)
+
+    def by_shard(self, rows, key):
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(sharding.shard_for_chat(key(row)), []).append(row)
+        return grouped
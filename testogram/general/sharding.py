@@ -0,0 +1,256 @@
+"""
+Шардирование чатов и сообщений по нескольким базам.
+
+Chat и его сообщения живут на одном из алиасов CHAT_SHARDS, который
+выбирается jump consistent hash от id чата: при добавлении шарда в конец
+списка переезжает только ~1/N чатов, остальные остаются на месте. Id чатов
+выдаёт каталог ChatPair в основной базе, id сообщений — блоки IdSequence,
+поэтому они уникальны на всех шардах и не меняются при переносе.
+
+ShardRouter сам находит шард, если у запроса есть подсказка-экземпляр
+(chat.messages, message.chat, сохранение); выборки без неё идут через
+on_shard() по каждому шарду. После изменения CHAT_SHARDS чаты переносит
+команда rebalance_chats.
+"""
+
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.db.models.constants import OnConflict
+
+from general.models import Chat, ChatPair, Message, SyncChange, User
+
+SHARDED_MODELS = {("general", "chat"), ("general", "message")}
+# есть в каждой базе: журнал пишется рядом с изменёнными строками
+EVERYWHERE_MODELS = {("general", "syncchange")}
+
+
+def jump_hash(key, buckets):
+    """Jump consistent hash (Lamping, Veach, 2014)."""
+    bucket, j = -1, 0
+    while j < buckets:
+        bucket = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shards():
+    return settings.CHAT_SHARDS
+
+
+def shard_for_chat(chat_id):
+    aliases = shards()
+    return aliases[jump_hash(int(chat_id), len(aliases))]
+
+
+def is_sharded(model):
+    return (model._meta.app_label, model._meta.model_name) in SHARDED_MODELS
+
+
+def chat_id_of(instance):
+    if isinstance(instance, Chat):
+        return instance.pk
+    if isinstance(instance, Message):
+        return instance.chat_id
+    return None
+
+
+def on_shard(queryset, alias):
+    """
+    queryset на шарде alias. Основная база остаётся за роутерами, чтобы
+    чтения чатов по-прежнему могли идти на реплики.
+    """
+    return queryset.all() if alias == DEFAULT_DB_ALIAS else queryset.using(alias)
+
+
+def get_or_create_chat(user_1, user_2):
+    pair = ChatPair.objects.filter(
+        user_low_id=min(user_1.pk, user_2.pk),
+        user_high_id=max(user_1.pk, user_2.pk),
+    ).first()
+    if pair is None:
+        # Chat.save() заводит пару и по её id выбирает шард
+        chat = Chat(user_1=user_1, user_2=user_2)
+        chat.save()
+        return chat
+    chat = on_shard(Chat.objects, shard_for_chat(pair.pk)).filter(pk=pair.pk).first()
+    if chat is None:
+        # пара без чата остаётся после удаления чата: он создаётся заново под тем же id
+        chat = Chat(pk=pair.pk, user_1=user_1, user_2=user_2)
+        chat.save(force_insert=True)
+    return chat
+
+
+def attach_users(chats):
+    """
+    Подгружает user_1 и user_2 одним запросом в основную базу для чатов с
+    шардов, где select_related к таблице пользователей невозможен.
+    """
+    fields = (Chat._meta.get_field("user_1"), Chat._meta.get_field("user_2"))
+    missing = {
+        getattr(chat, field.attname)
+        for chat in chats
+        for field in fields
+        if not field.is_cached(chat)
+    }
+    if not missing:
+        return
+    users = User.objects.in_bulk(missing)
+    for chat in chats:
+        for field in fields:
+            if not field.is_cached(chat):
+                field.set_cached_value(chat, users.get(getattr(chat, field.attname)))
+
+
+class MergedQuerySet:
+    """
+    Отсортированные по key выборки с нескольких шардов как один список для
+    пагинатора. Срез читает с каждого шарда только первые stop строк и
+    сливает их; prepare(objects) вызывается для строк среза.
+    """
+
+    ordered = True
+
+    def __init__(self, querysets, key, reverse=False, prepare=None):
+        self.querysets = querysets
+        self.key = key
+        self.reverse = reverse
+        self.prepare = prepare
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        start, stop = item.start or 0, item.stop
+        parts = [queryset if stop is None else queryset[:stop] for queryset in self.querysets]
+        objects = list(islice(heapq.merge(*parts, key=self.key, reverse=self.reverse), start, stop))
+        if self.prepare is not None:
+            self.prepare(objects)
+        return objects
+
+
+def copy_rows(model, ids, source, target):
+    """
+    Копирует строки model с id из ids с source на target как есть. Не через
+    bulk_create: он заново проставил бы auto_now_add (Message.created_at).
+    Уже скопированные строки пропускаются.
+    """
+    connection = connections[target]
+    qn = connection.ops.quote_name
+    fields = model._meta.concrete_fields
+    table = qn(model._meta.db_table)
+    columns = ", ".join(qn(field.column) for field in fields)
+    with connections[source].cursor() as cursor:
+        cursor.execute(
+            f"SELECT {columns} FROM {table} WHERE {qn(model._meta.pk.column)} IN "
+            f"({', '.join(['%s'] * len(ids))})",
+            list(ids),
+        )
+        rows = cursor.fetchall()
+    sql = "%s %s (%s) VALUES (%s) %s" % (
+        connection.ops.insert_statement(on_conflict=OnConflict.IGNORE),
+        table,
+        columns,
+        ", ".join(["%s"] * len(fields)),
+        connection.ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, None),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def move_sync_changes(kind, ids, audiences, source, target):
+    """
+    Переносит строки журнала синхронизации (general.sync) вместе со
+    строками: на target они получают новые seq, иначе клиент, уже
+    прочитавший журнал target дальше, пропустил бы их изменения.
+    """
+    SyncChange.objects.log(
+        target, [(kind, object_id, audience, False) for object_id in ids for audience in audiences],
+    )
+    SyncChange.objects.using(source).filter(kind=kind, object_id__in=ids).delete()
+
+
+def move_chat(chat_id, source, target, batch_size=1000):
+    """
+    Копирует чат с сообщениями с source на target и удаляет их с source;
+    возвращает число перенесённых сообщений. Копирование идемпотентно, так
+    что прерванный перенос можно просто повторить.
+    """
+    copy_rows(Chat, [chat_id], source, target)
+    chat = Chat.objects.using(target).get(pk=chat_id)
+    audiences = (chat.user_1_id, chat.user_2_id)
+    move_sync_changes(SyncChange.Kinds.CHAT, [chat_id], audiences, source, target)
+    messages = Message.objects.using(source).filter(chat_id=chat_id).order_by("pk")
+    messages = messages.values_list("pk", flat=True)
+    moved = last_id = 0
+    while ids := list(messages.filter(pk__gt=last_id)[:batch_size]):
+        with transaction.atomic(using=target):
+            copy_rows(Message, ids, source, target)
+            move_sync_changes(SyncChange.Kinds.MESSAGE, ids, audiences, source, target)
+        with transaction.atomic(using=source):
+            Message.objects.using(source).filter(pk__in=ids).delete()
+        moved += len(ids)
+        last_id = ids[-1]
+    Chat.objects.using(source).filter(pk=chat_id).delete()
+    return moved
+
+
+def misplaced_chats(alias, chunk_size=1000):
+    """Id чатов на alias, которым по текущим CHAT_SHARDS место на другом шарде."""
+    chats = Chat.objects.using(alias).order_by("pk").values_list("pk", flat=True)
+    last_id = 0
+    # постранично по pk, а не iterator(): чаты удаляются по ходу обхода
+    while chunk := list(chats.filter(pk__gt=last_id)[:chunk_size]):
+        for chat_id in chunk:
+            target = shard_for_chat(chat_id)
+            if target != alias:
+                yield chat_id, target
+        last_id = chunk[-1]
+
+
+class ShardRouter:
+    """
+    Чтения и записи чатов и сообщений с подсказкой-экземпляром идут на их
+    шард. Связанные с ними несшардированные модели (chat.user_1) — туда же,
+    куда без подсказки, а не на шард экземпляра. Основная база как шард
+    остаётся за ReplicaRouter.
+    """
+
+    def db_for_read(self, model, **hints):
+        return self.route(model, hints, router.db_for_read)
+
+    def db_for_write(self, model, **hints):
+        return self.route(model, hints, router.db_for_write)
+
+    def route(self, model, hints, fallback):
+        instance = hints.get("instance")
+        if is_sharded(model):
+            chat_id = chat_id_of(instance)
+            if chat_id is None:
+                return None
+            alias = shard_for_chat(chat_id)
+            return None if alias == DEFAULT_DB_ALIAS else alias
+        if instance is not None and chat_id_of(instance) is not None:
+            return fallback(model)
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if model_name is None:
+            return None
+        shard_only = set(shards()) - {DEFAULT_DB_ALIAS}
+        if (app_label, model_name) in EVERYWHERE_MODELS:
+            return None
+        if (app_label, model_name) in SHARDED_MODELS:
+            return None if DEFAULT_DB_ALIAS in shards() else db in shard_only
+        return False if db in shard_only else None
@@ -0,0 +1,134 @@
+"""
+Дельта-синхронизация для офлайн-клиентов (/api/sync/).
+
+Каждая запись и удаление поста, комментария, реакции, чата и сообщения
+отмечается в журнале SyncChange той базы, где лежит строка (record): одна
+строка журнала на объект и получателя, каждое изменение выдаёт ей новый
+seq, удаление оставляет надгробие (deleted). Токен клиента — позиции
+журналов всех баз, и синхронизация читает только строки журнала после
+них: её стоимость зависит от числа изменений, а не от всей истории.
+
+Без токена клиент получает текущий токен, загружает данные обычными
+списками и дальше синхронизируется от него. Изменения между токеном и
+загрузкой придут повторно, но клиент применяет их как upsert по id.
+
+Посты, комментарии, реакции и удаление пользователя видны всем (audience
+0), чаты и сообщения пишутся в журнал по строке на каждого участника.
+Комментарии и реакции удалённого поста и всё содержимое удалённого
+пользователя клиент удаляет сам по надгробию поста или пользователя.
+"""
+
+import base64
+import json
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS, router
+from django.db.models import Max, Q
+
+from general import sharding
+from general.models import Chat, Comment, Message, Post, Reaction, SyncChange, User
+
+Kinds = SyncChange.Kinds
+
+KIND_MODELS = {
+    Kinds.POST: Post,
+    Kinds.COMMENT: Comment,
+    Kinds.REACTION: Reaction,
+    Kinds.CHAT: Chat,
+    Kinds.MESSAGE: Message,
+    Kinds.USER: User,
+}
+MODEL_KINDS = {model: kind for kind, model in KIND_MODELS.items()}
+
+# как в списках API: без строк удалённых постов и авторов, чтобы поздно
+# пришедшее изменение не вернуло клиенту уже удалённое надгробием
+VISIBLE = {
+    Kinds.COMMENT: Q(
+        author__deleted_at__isnull=True,
+        post__deleted_at__isnull=True,
+        post__author__deleted_at__isnull=True,
+    ),
+    Kinds.REACTION: Q(
+        value__isnull=False,
+        author__deleted_at__isnull=True,
+        post__deleted_at__isnull=True,
+        post__author__deleted_at__isnull=True,
+    ),
+}
+
+
+def aliases():
+    """Базы с журналом: основная и шарды чатов."""
+    return [DEFAULT_DB_ALIAS, *(alias for alias in sharding.shards() if alias != DEFAULT_DB_ALIAS)]
+
+
+def record(instance, deleted=False):
+    """Отмечает в журнале запись или удаление instance."""
+    if isinstance(instance, Chat):
+        using = sharding.shard_for_chat(instance.pk)
+        audiences = (instance.user_1_id, instance.user_2_id)
+    elif isinstance(instance, Message):
+        using = sharding.shard_for_chat(instance.chat_id)
+        audiences = (instance.chat.user_1_id, instance.chat.user_2_id)
+    else:
+        using = router.db_for_write(type(instance))
+        audiences = (0,)
+    kind = MODEL_KINDS[type(instance)]
+    SyncChange.objects.log(using, [(kind, instance.pk, audience, deleted) for audience in audiences])
+
+
+def encode_token(positions):
+    data = json.dumps(positions, separators=(",", ":"), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_token(token):
+    """Позиции журналов по базам; ValueError для испорченного токена."""
+    positions = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    if not isinstance(positions, dict) or not all(
+        isinstance(seq, int) and not isinstance(seq, bool) for seq in positions.values()
+    ):
+        raise ValueError("invalid sync token")
+    return positions
+
+
+def current_positions():
+    return {
+        alias: sharding.on_shard(SyncChange.objects, alias).aggregate(seq=Max("seq"))["seq"] or 0
+        for alias in aliases()
+    }
+
+
+def changes_since(user_id, positions, limit):
+    """
+    Изменения, видные user_id, после positions: не больше limit строк
+    журнала с каждой базы. Возвращает (changed, deleted, новые позиции,
+    has_more), где changed — {вид: [объекты]}, deleted — {вид: [id]}.
+    """
+    changed, deleted = defaultdict(list), defaultdict(list)
+    positions = dict(positions)
+    has_more = False
+    for alias in aliases():
+        entries = list(
+            sharding.on_shard(SyncChange.objects, alias)
+            .filter(audience__in=[0, user_id], seq__gt=positions.get(alias, 0))
+            .order_by("seq")
+            .values_list("seq", "kind", "object_id", "deleted")[:limit + 1]
+        )
+        if len(entries) > limit:
+            has_more = True
+            entries = entries[:limit]
+        if not entries:
+            continue
+        positions[alias] = entries[-1][0]
+        object_ids = defaultdict(list)
+        for seq, kind, object_id, is_deleted in entries:
+            (deleted[kind] if is_deleted else object_ids[kind]).append(object_id)
+        for kind, ids in object_ids.items():
+            # строки, которых здесь уже нет, пропускаются: чат переехал на
+            # другой шард и записан в его журнал, а содержимое удалённых
+            # постов и пользователей убирают их надгробия
+            queryset = sharding.on_shard(KIND_MODELS[kind].objects, alias)
+            queryset = queryset.filter(VISIBLE.get(kind, Q()), pk__in=ids)
+            changed[kind].extend(queryset.order_by("pk"))
+    return changed, deleted, positions, has_more
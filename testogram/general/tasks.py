@@ -0,0 +1,11 @@
+from general import deletion
+from general.queue import task
+
+
+@task(name="general.purge_deleted", batch=True, max_attempts=10)
+def purge_deleted(objects):
+    """
+    Дочищает мягко удалённые строки. Один проход purge_deleted удаляет всё
+    помеченное, поэтому все задачи из очереди выполняются одним вызовом.
+    """
+    deletion.purge_deleted()
@@ -0,0 +1,76 @@
+"""
+Разбивка времени запроса для заголовка Server-Timing и логов: число и
+время запросов к БД, время сериализации и рендеринга.
+
+Замеры собирает ServerTimingMiddleware только для сэмплированных
+запросов; у остальных current() возвращает None и хуки ничего не делают.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_timings = ContextVar("timings", default=None)
+
+
+class Timings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.durations = {"db": 0.0, "serialize": 0.0, "render": 0.0}
+        self.queries = 0
+        self.serializing = False
+        self.view = None
+        self.action = None
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper для всех соединений
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.durations["db"] += time.perf_counter() - started
+            self.queries += 1
+
+    @contextmanager
+    def measure(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] += time.perf_counter() - started
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def header(self):
+        metrics = [
+            f'db;dur={self.durations["db"] * 1000:.1f};desc="{self.queries} queries"',
+            f'serialize;dur={self.durations["serialize"] * 1000:.1f}',
+            f'render;dur={self.durations["render"] * 1000:.1f}',
+            f'total;dur={self.total * 1000:.1f}',
+        ]
+        return ", ".join(metrics)
+
+    def as_dict(self):
+        return {
+            "view": self.view,
+            "action": self.action,
+            "queries": self.queries,
+            "db_ms": round(self.durations["db"] * 1000, 1),
+            "serialize_ms": round(self.durations["serialize"] * 1000, 1),
+            "render_ms": round(self.durations["render"] * 1000, 1),
+            "total_ms": round(self.total * 1000, 1),
+        }
+
+
+def current():
+    return _timings.get()
+
+
+def activate(timings):
+    return _timings.set(timings)
+
+
+def deactivate(token):
+    _timings.reset(token)
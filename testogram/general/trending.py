@@ -0,0 +1,64 @@
+"""
+Рейтинг «в тренде» для постов.
+
+Post.trending_score хранится в самой строке поста и меняется вместе с
+событием: реакция прибавляет TRENDING_REACTION_WEIGHT (снятая — вычитает,
+ReactionManager.toggle), комментарий — TRENDING_COMMENT_WEIGHT. Старение
+делает decay(): раз в несколько минут (команда decay_trending) все
+ненулевые рейтинги умножаются на 0.5 ** (прошедшее время / период
+полураспада), а слишком малые обнуляются. Лента ?ordering=trending читает
+только посты с рейтингом больше нуля по частичному индексу
+post_trending_idx, поэтому её размер ограничен недавно активными постами,
+а не всей таблицей.
+"""
+
+import time
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from general.models import JobRun, Post
+
+
+def bump(post_id, weight):
+    Post.all_objects.filter(pk=post_id).update(trending_score=F("trending_score") + weight)
+
+
+def decay(half_life=None, min_score=None, batch_size=1000, pause=0.0):
+    """
+    Уменьшает рейтинги на время, прошедшее с прошлого вызова; возвращает
+    число изменённых постов. Первый вызов только запоминает время. Посты
+    обновляются пачками по batch_size, каждая — своей короткой транзакцией.
+    """
+    half_life = half_life or settings.TRENDING_HALF_LIFE
+    min_score = settings.TRENDING_MIN_SCORE if min_score is None else min_score
+    using = router.db_for_write(JobRun)
+    now = timezone.now()
+    with transaction.atomic(using=using):
+        run, created = JobRun.objects.using(using).select_for_update().get_or_create(
+            name="trending_decay", defaults={"last_run_at": now},
+        )
+        if created:
+            return 0
+        elapsed = (now - run.last_run_at).total_seconds()
+        # время фиксируется до прохода: параллельный вызов не уменьшит
+        # рейтинги второй раз, а прерванный проход лишь оставит часть
+        # постов без одного шага старения
+        JobRun.objects.using(using).filter(name=run.name).update(last_run_at=now)
+    factor = 0.5 ** (max(elapsed, 0) / half_life)
+
+    # id берутся из частичного индекса: рейтинг есть только у недавно
+    # активных постов, таблицу целиком проход не читает
+    ids = list(
+        Post.objects.using(using).filter(trending_score__gt=0).values_list("pk", flat=True)
+    )
+    for start in range(0, len(ids), batch_size):
+        with transaction.atomic(using=using):
+            batch = Post.all_objects.using(using).filter(pk__in=ids[start:start + batch_size])
+            batch.update(trending_score=F("trending_score") * factor)
+            batch.filter(trending_score__lt=min_score).update(trending_score=0)
+        if pause:
+            time.sleep(pause)
+    return len(ids)